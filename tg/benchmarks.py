@@ -0,0 +1,499 @@
+"""
+Performance benchmarks for graph.py.
+
+Run from the tg directory:
+
+    python benchmarks.py load
+    python benchmarks.py roundtrip
+    python benchmarks.py storage
+    python benchmarks.py floyd
+    python benchmarks.py allpairs
+    python benchmarks.py kpaths
+    python benchmarks.py dijkstra
+    python benchmarks.py flow
+    python benchmarks.py mst
+"""
+import argparse
+from collections import Counter
+from itertools import islice
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+import graph as graph_module
+from graph import Graph
+from graph_visualizer.graph_app.spanning_forest import PRIM_MIN_DEGREE
+
+
+def write_random_graph(file, node_count, edge_count, directed=True, weighted=True, seed=42):
+    """Write a random graph in the from_file text format."""
+    rng = random.Random(seed)
+    file.write(f"{directed}\n{weighted}\n")
+    for _ in range(edge_count):
+        u, v = rng.randrange(node_count), rng.randrange(node_count)
+        if u == v and not directed:
+            v = (v + 1) % node_count
+        if weighted:
+            file.write(f"{u} {v} {rng.randint(1, 100)}\n")
+        else:
+            file.write(f"{u} {v}\n")
+
+
+def legacy_from_file(filename):
+    """The previous from_file: add_node/add_edge per line."""
+    with open(filename, 'r') as file:
+        directed = file.readline().strip().lower() == 'true'
+        weighted = file.readline().strip().lower() == 'true'
+        graph = Graph(directed, weighted)
+        for line in file:
+            parts = line.split()
+            if len(parts) == 1:
+                graph.add_node(parts[0])
+            elif len(parts) == 2:
+                graph.add_edge(parts[0], parts[1])
+            elif len(parts) == 3:
+                graph.add_edge(parts[0], parts[1], int(parts[2]))
+    return graph
+
+
+def legacy_save_to_file(graph, filename):
+    """The previous save_to_file: scans all nodes for incoming edges of every sink."""
+    with open(filename, 'w') as file:
+        file.write("True\n" if graph.directed else "False\n")
+        file.write("True\n" if graph.weighted else "False\n")
+        for node_value, node in graph.nodes.items():
+            if node.neighbors:
+                for neighbor, weight in node.neighbors.items():
+                    if graph.weighted:
+                        file.write(f"{node_value} {neighbor.value} {weight}\n")
+                    else:
+                        file.write(f"{node_value} {neighbor.value}\n")
+            elif all(node not in other.neighbors for other in graph.nodes.values()):
+                file.write(f"{node_value}\n")
+
+
+def legacy_dijkstra(graph, u):
+    """The previous dijkstra: linear scans for the next node and every shortest path as a list."""
+    distances = {node: float('inf') for node in graph.nodes}
+    path_counts = {node: 0 for node in graph.nodes}
+    paths = {node: [] for node in graph.nodes}
+    distances[u] = 0
+    path_counts[u] = 1
+    paths[u] = [[u]]
+    unvisited = list(graph.nodes)
+    while unvisited:
+        current_node = min(unvisited, key=distances.__getitem__)
+        if distances[current_node] == float('inf'):
+            break
+        unvisited.remove(current_node)
+        for neighbor, weight in graph._neighbors(current_node):
+            new_distance = distances[current_node] + weight
+            if new_distance < distances[neighbor]:
+                distances[neighbor] = new_distance
+                path_counts[neighbor] = path_counts[current_node]
+                paths[neighbor] = [path + [neighbor] for path in paths[current_node]]
+            elif new_distance == distances[neighbor]:
+                path_counts[neighbor] += path_counts[current_node]
+                paths[neighbor].extend(path + [neighbor] for path in paths[current_node])
+    return distances, path_counts, paths
+
+
+def grid_graph(side):
+    """Undirected side x side grid with unit weights: the number of shortest paths grows exponentially."""
+    graph = Graph(False, True)
+    for i in range(side):
+        for j in range(side):
+            if i + 1 < side:
+                graph.add_edge(f"{i},{j}", f"{i + 1},{j}", 1)
+            if j + 1 < side:
+                graph.add_edge(f"{i},{j}", f"{i},{j + 1}", 1)
+    return graph
+
+
+def legacy_bellman_ford(graph, u, v, k):
+    """The previous bellman_ford: every walk of up to V-1 edges, deduplicated each round."""
+    all_paths = [(0, (u,))]
+    for _ in range(len(graph.nodes) - 1):
+        new_paths = []
+        for path_cost, path in all_paths:
+            for neighbor_value, weight in graph._neighbors(path[-1]):
+                new_paths.append((path_cost + weight, path + (neighbor_value,)))
+        all_paths.extend(new_paths)
+        all_paths = list(set(all_paths))
+    valid_paths = sorted((cost, path) for cost, path in all_paths if path[-1] == v)
+    return [(cost, list(path)) for cost, path in valid_paths[:k]]
+
+
+def legacy_prim_mst(graph):
+    """The previous prim_mst: every visited node's neighbors are rescanned for each added node."""
+    mst_edges = []
+    total_weight = 0
+    visited = {next(iter(graph.nodes))}
+    while len(visited) < len(graph.nodes):
+        min_edge = None
+        min_weight = float('inf')
+        for node in visited:
+            for neighbor, weight in graph._neighbors(node):
+                if neighbor not in visited and weight < min_weight:
+                    min_edge = (node, neighbor)
+                    min_weight = weight
+        if min_edge is None:
+            raise ValueError("The graph is not connected.")
+        mst_edges.append((min_edge[0], min_edge[1], min_weight))
+        total_weight += min_weight
+        visited.add(min_edge[1])
+    return mst_edges, total_weight
+
+
+def same_graph(first, second):
+    """True if both graphs have the same nodes, edges and weights."""
+    if (first.directed, first.weighted) != (second.directed, second.weighted) or first.nodes.keys() != second.nodes.keys():
+        return False
+    for value, node in first.nodes.items():
+        edges = {neighbor.value: weight for neighbor, weight in node.neighbors.items()}
+        if edges != {neighbor.value: weight for neighbor, weight in second.nodes[value].neighbors.items()}:
+            return False
+    return True
+
+
+def _timed(func, *args, **kwargs):
+    started = time.perf_counter()
+    func(*args, **kwargs)
+    return time.perf_counter() - started
+
+
+def bench_load(sizes, workers, parallel_min_bytes, seed):
+    """
+    from_file before and after the rewrite, then with workers processes. Files up to
+    parallel_min_bytes are read sequentially even with workers > 1, so their parallel
+    columns show '-'; lower it to time the parallel path on small files.
+    """
+    graph_module.PARALLEL_LOAD_MIN_BYTES = parallel_min_bytes
+    print(f"{'edges':>10} {'size':>8} {'before, s':>10} {'after, s':>9} {'edges/s':>10} "
+          f"{f'{workers} workers, s':>13} {'edges/s':>10}")
+    for edge_count in sizes:
+        with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as file:
+            write_random_graph(file, max(2, edge_count // 4), edge_count, seed=seed)
+        try:
+            size = os.path.getsize(file.name)
+            before = _timed(legacy_from_file, file.name)
+            started = time.perf_counter()
+            graph = Graph.from_file(file.name)
+            after = time.perf_counter() - started
+            parallel = parallel_rate = '-'
+            if workers > 1 and size > parallel_min_bytes:
+                started = time.perf_counter()
+                parallel_graph = Graph.from_file(file.name, workers=workers)
+                elapsed = time.perf_counter() - started
+                if not same_graph(graph, parallel_graph):
+                    raise AssertionError(f"Parallel load changed the graph ({edge_count} edges)")
+                parallel, parallel_rate = f"{elapsed:.2f}", f"{edge_count / elapsed:.0f}"
+            print(f"{edge_count:>10} {size >> 20:>7}M {before:10.2f} {after:9.2f} {edge_count / after:10.0f} "
+                  f"{parallel:>13} {parallel_rate:>10}")
+        finally:
+            os.unlink(file.name)
+
+
+def bench_roundtrip(sizes, legacy_limit, seed):
+    """
+    save_to_file followed by from_file on random graphs with many sinks; the old writer
+    is quadratic there, so it only runs up to legacy_limit edges.
+    """
+    print(f"{'graph':>16} {'old save, s':>11} {'save, s':>8} {'load, s':>8} "
+          f"{'.gz save, s':>11} {'.gz load, s':>11} {'size':>8} {'.gz size':>8}")
+    with tempfile.TemporaryDirectory() as directory:
+        source = os.path.join(directory, 'source.txt')
+        plain = os.path.join(directory, 'graph.txt')
+        compressed = os.path.join(directory, 'graph.txt.gz')
+        for edge_count in sizes:
+            for directed in (True, False):
+                with open(source, 'w') as file:
+                    write_random_graph(file, max(2, edge_count // 2), edge_count, directed=directed, seed=seed)
+                graph = Graph.from_file(source)
+                unique = not directed
+
+                old_save = '-'
+                if edge_count <= legacy_limit:
+                    old_save = f"{_timed(legacy_save_to_file, graph, plain):.2f}"
+                save = _timed(graph.save_to_file, plain, unique_edges=unique)
+                started = time.perf_counter()
+                loaded = Graph.from_file(plain)
+                load = time.perf_counter() - started
+                gz_save = _timed(graph.save_to_file, compressed, unique_edges=unique)
+                started = time.perf_counter()
+                gz_loaded = Graph.from_file(compressed)
+                gz_load = time.perf_counter() - started
+                if not (same_graph(graph, loaded) and same_graph(graph, gz_loaded)):
+                    raise AssertionError(f"Round trip changed the graph ({edge_count} edges, directed={directed})")
+
+                name = f"{edge_count} {'dir' if directed else 'undir'}"
+                print(f"{name:>16} {old_save:>11} {save:8.2f} {load:8.2f} {gz_save:11.2f} {gz_load:11.2f} "
+                      f"{os.path.getsize(plain) >> 10:>7}K {os.path.getsize(compressed) >> 10:>7}K")
+
+
+def bench_storage(sizes, seed):
+    """Memory, load time and neighbor scan time of the 'objects' and 'compact' storages and of freeze()."""
+    print(f"{'edges':>10} {'storage':>8} {'load, s':>8} {'memory, MB':>10} {'bytes/edge':>10} {'scan, s':>8}")
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, 'graph.txt')
+        for edge_count in sizes:
+            with open(filename, 'w') as file:
+                write_random_graph(file, max(2, edge_count // 4), edge_count, seed=seed)
+            for storage in ('objects', 'compact', 'frozen'):
+                if storage == 'frozen':
+                    # "load" is the freeze() time of the loaded graph
+                    source = Graph.from_file(filename, storage='compact')
+                    load = _timed(source.freeze)
+                    source = Graph.from_file(filename, storage='compact')
+                    tracemalloc.start()
+                    graph = source.freeze()
+                else:
+                    load = _timed(Graph.from_file, filename, storage=storage)
+                    tracemalloc.start()
+                    graph = Graph.from_file(filename, storage=storage)
+                memory = tracemalloc.get_traced_memory()[0]
+                tracemalloc.stop()
+                started = time.perf_counter()
+                for value in graph.nodes:
+                    for _ in graph._neighbors(value):
+                        pass
+                scan = time.perf_counter() - started
+                print(f"{edge_count:>10} {storage:>8} {load:8.2f} {memory / 2 ** 20:10.1f} "
+                      f"{memory / edge_count:10.1f} {scan:8.2f}")
+                del graph
+                source = None
+
+
+def random_weighted_graph(node_count, edge_count, low=-20, high=100, seed=42, storage='objects', directed=True):
+    """Random graph with integer weights in [low, high]; negative weights create negative cycles."""
+    rng = random.Random(seed)
+    graph = Graph(directed, True, storage=storage)
+    for value in range(node_count):
+        graph.add_node(str(value))
+    for _ in range(edge_count):
+        u, v = rng.randrange(node_count), rng.randrange(node_count)
+        if u == v and not directed:
+            v = (v + 1) % node_count
+        graph.add_edge(str(u), str(v), rng.randint(low, high))
+    return graph
+
+
+def bench_floyd(sizes, legacy_limit, density, seed):
+    """floyd_warshall (NumPy, float64 and float32) against the plain Python loops."""
+    print(f"{'nodes':>7} {'edges':>8} {'python, s':>10} {'float64, s':>11} {'float32, s':>11} {'pairs':>10}")
+    for node_count in sizes:
+        graph = random_weighted_graph(node_count, density * node_count, seed=seed)
+        started = time.perf_counter()
+        pairs = graph.floyd_warshall()
+        vectorized = time.perf_counter() - started
+        single = _timed(graph.floyd_warshall, dtype='float32')
+        python = '-'
+        if node_count <= legacy_limit:
+            started = time.perf_counter()
+            expected = graph._floyd_warshall_python()
+            python = f"{time.perf_counter() - started:.2f}"
+            if expected != pairs:
+                raise AssertionError(f"floyd_warshall differs from the Python loops on {node_count} nodes")
+        print(f"{node_count:>7} {density * node_count:>8} {python:>10} {vectorized:11.2f} {single:11.2f} {len(pairs):>10}")
+
+
+def bench_all_pairs(cases, workers, seed):
+    """Johnson against Floyd-Warshall, and what method='auto' picks, for (nodes, edges) cases."""
+    print(f"{'nodes':>7} {'edges':>8} {'auto':>15} {'johnson, s':>11} {f'{workers} workers, s':>13} "
+          f"{'floyd, s':>9} {'neg. johnson, s':>16} {'neg. floyd, s':>14}")
+    for node_count, edge_count in cases:
+        graph = random_weighted_graph(node_count, edge_count, low=0, seed=seed)
+        auto = graph._choose_all_pairs_method('auto', node_count, edge_count)
+        johnson = _timed(graph.all_pairs_shortest_paths, 'johnson')
+        parallel = _timed(graph.all_pairs_shortest_paths, 'johnson', workers=workers)
+        floyd = _timed(graph.all_pairs_shortest_paths, 'floyd_warshall')
+        graph = random_weighted_graph(node_count, edge_count, seed=seed)
+        negative_johnson = _timed(graph.negative_cycle_pairs, 'johnson')
+        negative_floyd = _timed(graph.negative_cycle_pairs, 'floyd_warshall')
+        print(f"{node_count:>7} {edge_count:>8} {auto:>15} {johnson:11.2f} {parallel:13.2f} "
+              f"{floyd:9.2f} {negative_johnson:16.2f} {negative_floyd:14.2f}")
+
+
+def bench_k_paths(cases, k, legacy_nodes, seed):
+    """k_shortest_paths (simple paths and walks) on random graphs, and the old bellman_ford on a tiny one."""
+    graph = random_weighted_graph(legacy_nodes, 2 * legacy_nodes, low=1, high=20, seed=seed)
+    u, v = '0', str(legacy_nodes - 1)
+    started = time.perf_counter()
+    expected = legacy_bellman_ford(graph, u, v, k)
+    legacy = time.perf_counter() - started
+    walks = _timed(graph.bellman_ford, u, v, k)
+    print(f"old bellman_ford on {legacy_nodes} nodes: {legacy:.2f} s, walks: {walks:.4f} s")
+    if [cost for cost, _ in graph.bellman_ford(u, v, k)] != [cost for cost, _ in expected]:
+        raise AssertionError("bellman_ford costs differ from the old version")
+
+    print(f"{'nodes':>7} {'edges':>8} {'k':>6} {'first, s':>9} {'paths, s':>9} {'walks, s':>9} {'memory, MiB':>12}")
+    for node_count, edge_count in cases:
+        graph = random_weighted_graph(node_count, edge_count, low=1, high=100, seed=seed)
+        u, v = '0', str(node_count - 1)
+        first = _timed(lambda: next(graph.k_shortest_paths(u, v), None))
+        tracemalloc.start()
+        started = time.perf_counter()
+        paths = list(islice(graph.k_shortest_paths(u, v), k))
+        simple = time.perf_counter() - started
+        memory = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        tracemalloc.stop()
+        walks = _timed(graph.bellman_ford, u, v, k)
+        costs = [cost for cost, _ in paths]
+        if costs != sorted(costs):
+            raise AssertionError("k_shortest_paths is not in increasing cost order")
+        print(f"{node_count:>7} {edge_count:>8} {len(paths):>6} {first:9.2f} {simple:9.2f} {walks:9.2f} {memory:12.1f}")
+
+
+def bench_dijkstra(sides, legacy_limit):
+    """dijkstra on grids against the old version, and the first shortest path to the far corner."""
+    print(f"{'side':>6} {'edges':>9} {'old, s':>8} {'dijkstra, s':>12} {'first path, s':>14} {'digits in path count':>21}")
+    for side in sides:
+        graph = grid_graph(side)
+        corner = f"{side - 1},{side - 1}"
+        edge_count = 2 * side * (side - 1)
+        started = time.perf_counter()
+        distances, path_counts, predecessors = graph.dijkstra('0,0')
+        elapsed = time.perf_counter() - started
+        first = _timed(lambda: next(graph.iter_shortest_paths('0,0', corner, predecessors)))
+        legacy = '-'
+        if side <= legacy_limit:
+            started = time.perf_counter()
+            expected = legacy_dijkstra(graph, '0,0')
+            legacy = f"{time.perf_counter() - started:.2f}"
+            if expected[:2] != (distances, path_counts):
+                raise AssertionError(f"dijkstra differs from the old version on a {side} x {side} grid")
+        print(f"{side:>6} {edge_count:>9} {legacy:>8} {elapsed:12.2f} {first:14.4f} {len(str(path_counts[corner])):>21}")
+
+
+def bench_flow(cases, seed):
+    """max_flow methods between the busiest source and sink of random graphs."""
+    print(f"{'nodes':>7} {'edges':>8} {'edmonds_karp, s':>16} {'dinic, s':>9} {'push_relabel, s':>16} {'flow':>8}")
+    for node_count, edge_count in cases:
+        graph = random_weighted_graph(node_count, edge_count, low=1, high=100, seed=seed)
+        source = max(graph.nodes, key=graph._out_degree)
+        in_degrees = Counter(neighbor for node in graph.nodes for neighbor, _ in graph._neighbors(node))
+        sink = max((node for node in graph.nodes if node != source), key=in_degrees.__getitem__)
+        values = {}
+        times = {}
+        for method in ('edmonds_karp', 'dinic', 'push_relabel'):
+            started = time.perf_counter()
+            values[method] = graph.max_flow(source, sink, method)[0]
+            times[method] = time.perf_counter() - started
+        if len(set(values.values())) != 1:
+            raise AssertionError(f"max_flow methods disagree: {values}")
+        print(f"{node_count:>7} {edge_count:>8} {times['edmonds_karp']:16.2f} {times['dinic']:9.2f} "
+              f"{times['push_relabel']:16.2f} {values['dinic']:>8}")
+
+
+def bench_mst(cases, legacy_nodes, seed):
+    """minimum_spanning_forest methods on random undirected graphs, and the old prim_mst on small ones."""
+    print(f"{'nodes':>7} {'edges':>8} {'old, s':>8} {'prim, s':>8} {'kruskal, s':>11} {'auto':>8} {'trees':>6} {'weight':>12}")
+    for node_count, edge_count in cases:
+        graph = random_weighted_graph(node_count, edge_count, low=1, high=1_000_000, seed=seed, directed=False)
+        results = {}
+        times = {}
+        for method in ('prim', 'kruskal'):
+            started = time.perf_counter()
+            results[method] = graph.minimum_spanning_forest(method)
+            times[method] = time.perf_counter() - started
+        weights = {method: total for method, (_, total) in results.items()}
+        legacy = '-'
+        if node_count <= legacy_nodes and len(results['prim'][0]) == node_count - 1:
+            started = time.perf_counter()
+            weights['old'] = legacy_prim_mst(graph)[1]
+            legacy = f"{time.perf_counter() - started:.2f}"
+        if len(set(weights.values())) != 1:
+            raise AssertionError(f"MST methods disagree: {weights}")
+        degrees = sum(map(graph._out_degree, graph.nodes))
+        auto = 'prim' if degrees >= PRIM_MIN_DEGREE * node_count else 'kruskal'
+        trees = len(graph.nodes) - len(results['kruskal'][0])
+        print(f"{node_count:>7} {edge_count:>8} {legacy:>8} {times['prim']:8.2f} {times['kruskal']:11.2f} "
+              f"{auto:>8} {trees:>6} {weights['kruskal']:>12}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="graph.py benchmarks")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    load = subparsers.add_parser('load', help="Graph.from_file throughput")
+    load.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    load.add_argument('--workers', type=int, default=max(2, os.cpu_count() or 1))
+    load.add_argument('--parallel-min-bytes', type=int, default=graph_module.PARALLEL_LOAD_MIN_BYTES,
+                      help="files up to this size are read sequentially even with --workers > 1")
+    load.add_argument('--seed', type=int, default=42)
+
+    roundtrip = subparsers.add_parser('roundtrip', help="Graph.save_to_file and from_file round trip")
+    roundtrip.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    roundtrip.add_argument('--legacy-limit', type=int, default=20_000,
+                           help="largest graph to save with the old quadratic writer")
+    roundtrip.add_argument('--seed', type=int, default=42)
+
+    storage = subparsers.add_parser('storage', help="memory use of the graph storages")
+    storage.add_argument('--sizes', type=int, nargs='+', default=[100_000, 1_000_000])
+    storage.add_argument('--seed', type=int, default=42)
+
+    floyd = subparsers.add_parser('floyd', help="floyd_warshall scaling")
+    floyd.add_argument('--sizes', type=int, nargs='+', default=[100, 200, 500, 1000, 2000, 4000])
+    floyd.add_argument('--legacy-limit', type=int, default=200,
+                       help="largest graph to check against the plain Python loops")
+    floyd.add_argument('--density', type=int, default=3, help="edges per node")
+    floyd.add_argument('--seed', type=int, default=42)
+
+    all_pairs = subparsers.add_parser('allpairs', help="all_pairs_shortest_paths and negative_cycle_pairs methods")
+    all_pairs.add_argument('--cases', type=lambda text: tuple(map(int, text.split(':'))), nargs='+',
+                           default=[(300, 900), (300, 30000), (800, 2400), (800, 64000), (2000, 6000)],
+                           help="nodes:edges pairs")
+    all_pairs.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    all_pairs.add_argument('--seed', type=int, default=42)
+
+    k_paths = subparsers.add_parser('kpaths', help="k_shortest_paths and bellman_ford")
+    k_paths.add_argument('--cases', type=lambda text: tuple(map(int, text.split(':'))), nargs='+',
+                         default=[(1000, 10_000), (10_000, 100_000)], help="nodes:edges pairs")
+    k_paths.add_argument('-k', type=int, default=1000)
+    k_paths.add_argument('--legacy-nodes', type=int, default=9,
+                         help="nodes in the graph checked against the old exponential bellman_ford")
+    k_paths.add_argument('--seed', type=int, default=42)
+
+    dijkstra = subparsers.add_parser('dijkstra', help="dijkstra and iter_shortest_paths on grids")
+    dijkstra.add_argument('--sides', type=int, nargs='+', default=[8, 12, 100, 300, 500])
+    dijkstra.add_argument('--legacy-limit', type=int, default=12,
+                          help="largest grid side to run the old path-listing dijkstra on")
+
+    max_flow = subparsers.add_parser('flow', help="max_flow methods")
+    max_flow.add_argument('--cases', type=lambda text: tuple(map(int, text.split(':'))), nargs='+',
+                          default=[(1000, 10_000), (10_000, 100_000), (1000, 100_000)], help="nodes:edges pairs")
+    max_flow.add_argument('--seed', type=int, default=42)
+
+    mst = subparsers.add_parser('mst', help="minimum_spanning_forest methods")
+    mst.add_argument('--cases', type=lambda text: tuple(map(int, text.split(':'))), nargs='+',
+                     default=[(1000, 10_000), (100_000, 1_000_000), (20_000, 1_000_000), (3000, 1_000_000)],
+                     help="nodes:edges pairs")
+    mst.add_argument('--legacy-nodes', type=int, default=1000,
+                     help="largest graph to run the old O(V * E) prim_mst on")
+    mst.add_argument('--seed', type=int, default=42)
+
+    args = parser.parse_args(argv)
+    if args.command == 'load':
+        bench_load(args.sizes, args.workers, args.parallel_min_bytes, args.seed)
+    elif args.command == 'roundtrip':
+        bench_roundtrip(args.sizes, args.legacy_limit, args.seed)
+    elif args.command == 'storage':
+        bench_storage(args.sizes, args.seed)
+    elif args.command == 'floyd':
+        bench_floyd(args.sizes, args.legacy_limit, args.density, args.seed)
+    elif args.command == 'allpairs':
+        bench_all_pairs(args.cases, args.workers, args.seed)
+    elif args.command == 'kpaths':
+        bench_k_paths(args.cases, args.k, args.legacy_nodes, args.seed)
+    elif args.command == 'dijkstra':
+        bench_dijkstra(args.sides, args.legacy_limit)
+    elif args.command == 'flow':
+        bench_flow(args.cases, args.seed)
+    elif args.command == 'mst':
+        bench_mst(args.cases, args.legacy_nodes, args.seed)
+
+
+if __name__ == '__main__':
+    main()
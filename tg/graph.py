@@ -1,4 +1,462 @@
+from array import array
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+import gc
+import gzip
+import heapq
+import io
+from itertools import accumulate, islice, repeat
+import locale
+import os
+import weakref
+
+from graph_visualizer.graph_app import flow, snapshot, spanning_forest, traversal
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Graph.from_file(..., workers=N) only splits files larger than this across processes
+PARALLEL_LOAD_MIN_BYTES = 1 << 24
+# Target size of the row blocks relaxed at once by Graph.floyd_warshall
+FLOYD_BLOCK_BYTES = 1 << 20
+
+# all_pairs_shortest_paths and negative_cycle_pairs use Floyd-Warshall with method='auto'
+# if nodes + edges >= DENSE_GRAPH_RATIO * n^2 and n <= FLOYD_MAX_NODES (the NumPy O(n^3)
+# loop and the Python O(n * m log n) Dijkstras break even near n^2 / 200, see benchmarks.py allpairs)
+DENSE_GRAPH_RATIO = 0.005
+FLOYD_MAX_NODES = 4000
+
+# Write buffer of Graph.save_to_file for plain text files
+SAVE_BUFFER_SIZE = 1 << 20
+
+GZIP_MAGIC = b'\x1f\x8b'
+
+# Graph(..., storage=...): Node objects with neighbor dicts, or CompactGraph arrays
+STORAGES = ('objects', 'compact')
+
+
+def _open_text(filename):
+    # from_file accepts both plain and gzip-compressed files, whatever their extension
+    with open(filename, 'rb') as file:
+        compressed = file.read(2) == GZIP_MAGIC
+    if compressed:
+        return gzip.open(filename, 'rt'), True
+    return open(filename, 'r'), False
+
+
+def _read_line_blocks(file, chunk_size):
+    tail = ''
+    while True:
+        chunk = file.read(chunk_size)
+        if not chunk:
+            break
+        lines = (tail + chunk).split('\n')
+        tail = lines.pop()
+        yield lines
+    if tail:
+        yield [tail]
+
+
+def _parse_block(task):
+    # Runs in a worker process: parses one newline-aligned byte range of the file and
+    # groups its edges by source node, so the parent process can attach each node's
+    # neighbors with a single dict.update. Labels are numbered in order of first appearance.
+    filename, start, end, directed, weighted = task
+    with open(filename, 'rb') as file:
+        file.seek(start)
+        text = file.read(end - start).decode(locale.getpreferredencoding(False))
+    lines = text.replace('\r\n', '\n').replace('\r', '\n').split('\n')
+    if lines and lines[-1] == '':
+        lines.pop()
+
+    index = {}
+    labels = []
+    node_lines = []
+    adjacency = {}
+
+    def label_id(value):
+        i = index.get(value)
+        if i is None:
+            i = index[value] = len(labels)
+            labels.append(value)
+        return i
+
+    def add(source, target, weight):
+        entry = adjacency.get(source)
+        if entry is None:
+            entry = adjacency[source] = (array('I'), [])
+        entry[0].append(target)
+        entry[1].append(weight)
+
+    for local_line, line in enumerate(lines, 1):
+        parts = line.split()
+        try:
+            if len(parts) == 3:
+                value1, value2, weight = parts
+                weight = int(weight)
+                if not weighted:
+                    weight = None
+            elif len(parts) == 2:
+                value1, value2 = parts
+                weight = None
+            elif len(parts) == 1:
+                if parts[0] in index:
+                    raise ValueError(f"Node {parts[0]} already exists.")
+                node_lines.append((label_id(parts[0]), local_line))
+                continue
+            elif not parts:
+                continue
+            else:
+                raise ValueError(f"Invalid line format: {line.strip()}")
+            if value1 == value2 and not directed:
+                raise ValueError("Loops are not allowed in undirected graphs.")
+            source, target = label_id(value1), label_id(value2)
+            add(source, target, weight)
+            if not directed:
+                add(target, source, weight)
+        except ValueError as e:
+            return None, None, None, None, (local_line, str(e))
+
+    sources = list(adjacency)
+    offsets = [0]
+    targets = array('I')
+    weights = []
+    for entry_targets, entry_weights in adjacency.values():
+        targets.extend(entry_targets)
+        weights.extend(entry_weights)
+        offsets.append(len(targets))
+    return labels, node_lines, (sources, offsets, targets, weights), len(lines), None
+
+
+def _strongly_connected_components(n, offsets, targets):
+    # Iterative Tarjan; returns (component of each node, number of components)
+    index = [-1] * n
+    low = [0] * n
+    component = [-1] * n
+    stack = []
+    counter = 0
+    component_count = 0
+    for root in range(n):
+        if index[root] != -1:
+            continue
+        work = [(root, offsets[root])]
+        index[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        while work:
+            node, edge = work[-1]
+            if edge < offsets[node + 1]:
+                work[-1] = (node, edge + 1)
+                neighbor = targets[edge]
+                if index[neighbor] == -1:
+                    index[neighbor] = low[neighbor] = counter
+                    counter += 1
+                    stack.append(neighbor)
+                    work.append((neighbor, offsets[neighbor]))
+                elif component[neighbor] == -1 and index[neighbor] < low[node]:
+                    low[node] = index[neighbor]
+                continue
+            work.pop()
+            if work and low[node] < low[work[-1][0]]:
+                low[work[-1][0]] = low[node]
+            if low[node] == index[node]:
+                while True:
+                    member = stack.pop()
+                    component[member] = component_count
+                    if member == node:
+                        break
+                component_count += 1
+    return component, component_count
+
+
+def _check_snapshot_rows(offsets):
+    # Row offsets of a snapshot must start at 0 and never decrease
+    if offsets[0] != 0 or any(start > end for start, end in zip(offsets, islice(offsets, 1, None))):
+        raise ValueError("Row offsets are out of order.")
+
+
+def _queue_bellman_ford(nodes, offsets, targets, weights, allowed=None):
+    # Queue-based Bellman-Ford from a virtual source joined to every node in nodes with
+    # weight 0. Only edges into nodes with allowed(node) true are used. Returns
+    # {node: distance}, or None if there is a negative cycle.
+    dist = dict.fromkeys(nodes, 0)
+    length = dict.fromkeys(nodes, 0)
+    limit = len(dist)
+    queue = deque(dist)
+    queued = set(dist)
+    while queue:
+        node = queue.popleft()
+        queued.discard(node)
+        distance = dist[node]
+        for edge in range(offsets[node], offsets[node + 1]):
+            neighbor = targets[edge]
+            if allowed is not None and not allowed(neighbor):
+                continue
+            new_distance = distance + weights[edge]
+            if new_distance < dist[neighbor]:
+                dist[neighbor] = new_distance
+                # A shortest path can have at most limit edges without repeating a node
+                length[neighbor] = length[node] + 1
+                if length[neighbor] >= limit:
+                    return None
+                if neighbor not in queued:
+                    queued.add(neighbor)
+                    queue.append(neighbor)
+    return dist
+
+
+def _bellman_ford_potentials(n, offsets, targets, weights):
+    dist = _queue_bellman_ford(range(n), offsets, targets, weights)
+    return None if dist is None else [dist[node] for node in range(n)]
+
+
+def _has_negative_cycle(members, component, offsets, targets, weights):
+    if len(members) == 1:
+        node = members[0]
+        return any(targets[edge] == node and weights[edge] < 0
+                   for edge in range(offsets[node], offsets[node + 1]))
+    c = component[members[0]]
+    return _queue_bellman_ford(members, offsets, targets, weights,
+                               allowed=lambda node: component[node] == c) is None
+
+
+def _reverse_csr(n, offsets, targets):
+    counts = [0] * (n + 1)
+    for target in targets:
+        counts[target + 1] += 1
+    reverse_offsets = list(accumulate(counts))
+    positions = reverse_offsets[:-1]
+    reverse_targets = [0] * len(targets)
+    for node in range(n):
+        for edge in range(offsets[node], offsets[node + 1]):
+            target = targets[edge]
+            reverse_targets[positions[target]] = node
+            positions[target] += 1
+    return reverse_offsets, reverse_targets
+
+
+def _reachable(start, offsets, targets):
+    seen = {start}
+    stack = [start]
+    while stack:
+        node = stack.pop()
+        for edge in range(offsets[node], offsets[node + 1]):
+            neighbor = targets[edge]
+            if neighbor not in seen:
+                seen.add(neighbor)
+                stack.append(neighbor)
+    return seen
+
+
+def _johnson_dijkstra(offsets, targets, weights, potentials, source):
+    # Heap Dijkstra on the reweighted edges w + h[u] - h[v] >= 0; returns the real distances
+    dist = {source: 0}
+    done = set()
+    heap = [(0, source)]
+    while heap:
+        distance, node = heapq.heappop(heap)
+        if node in done:
+            continue
+        done.add(node)
+        shift = distance + potentials[node]
+        for edge in range(offsets[node], offsets[node + 1]):
+            neighbor = targets[edge]
+            new_distance = shift + weights[edge] - potentials[neighbor]
+            if new_distance < dist.get(neighbor, new_distance + 1):
+                dist[neighbor] = new_distance
+                heapq.heappush(heap, (new_distance, neighbor))
+    source_potential = potentials[source]
+    return {node: distance - source_potential + potentials[node] for node, distance in dist.items()}
+
+
+class _PathSearch:
+    # Shared state of Graph.k_shortest_paths on CSR lists. Edge costs are reduced with the
+    # potential p = Johnson potential - distance to the target, so they are non-negative,
+    # zero along shortest paths to the target, and a path's real cost is its reduced cost
+    # plus a constant. Nodes that are not on any source-target walk are left out.
+
+    def __init__(self, n, offsets, targets, weights, source, target):
+        self.offsets = offsets
+        self.targets = targets
+        self.source = source
+        self.target = target
+
+        reverse_offsets, reverse_targets = _reverse_csr(n, offsets, targets)
+        relevant = _reachable(source, offsets, targets) & _reachable(target, reverse_offsets, reverse_targets)
+        potentials = [0] * n
+        if any(weight < 0 for weight in weights):
+            dist = _queue_bellman_ford(relevant, offsets, targets, weights, allowed=relevant.__contains__)
+            if dist is None:
+                raise ValueError("The graph contains a negative cycle on the way between the nodes.")
+            potentials = [dist.get(node, 0) for node in range(n)]
+
+        # Distances to the target over the reduced weights, on the reverse graph
+        reverse_edges = [0] * len(targets)
+        positions = reverse_offsets[:-1]
+        for node in range(n):
+            for edge in range(offsets[node], offsets[node + 1]):
+                reverse_edges[positions[targets[edge]]] = edge
+                positions[targets[edge]] += 1
+        to_target = {target: 0}
+        heap = [(0, target)]
+        while heap:
+            distance, node = heapq.heappop(heap)
+            if distance > to_target[node]:
+                continue
+            for position in range(reverse_offsets[node], reverse_offsets[node + 1]):
+                previous = reverse_targets[position]
+                if previous not in relevant:
+                    continue
+                edge = reverse_edges[position]
+                new_distance = distance + weights[edge] + potentials[previous] - potentials[node]
+                if new_distance < to_target.get(previous, new_distance + 1):
+                    to_target[previous] = new_distance
+                    heapq.heappush(heap, (new_distance, previous))
+
+        # reduced[edge] is None for edges that leave the relevant nodes
+        reduced = [None] * len(targets)
+        for node in relevant:
+            for edge in range(offsets[node], offsets[node + 1]):
+                neighbor = targets[edge]
+                if neighbor in relevant:
+                    reduced[edge] = (weights[edge] + potentials[node] - potentials[neighbor]
+                                     + to_target[neighbor] - to_target[node])
+        self.reduced = reduced
+        self.relevant = relevant
+        # real cost = reduced cost + offset
+        self.offset = to_target.get(source, 0) - potentials[source] + potentials[target]
+
+    def walks(self, k=None, max_edges=None):
+        if self.source not in self.relevant:
+            return
+        offsets, targets, reduced, target = self.offsets, self.targets, self.reduced, self.target
+        # Walks are kept as (node, parent record, edge count) records instead of lists.
+        # With max_edges the pop limit is per (node, edge count): the cheapest walks to a
+        # node may be too long to be extended.
+        records = [(self.source, -1, 0)]
+        pops = {}
+        found = 0
+        heap = [(0, 0)]
+        while heap:
+            cost, record = heapq.heappop(heap)
+            node, _, length = records[record]
+            state = node if max_edges is None else (node, length)
+            count = pops.get(state, 0) + 1
+            if k is not None and count > k:
+                continue
+            pops[state] = count
+            if node == target:
+                path = []
+                step = record
+                while step != -1:
+                    path.append(records[step][0])
+                    step = records[step][1]
+                path.reverse()
+                yield cost + self.offset, path
+                found += 1
+                if found == k:
+                    return
+            if length == max_edges:
+                continue
+            for edge in range(offsets[node], offsets[node + 1]):
+                edge_cost = reduced[edge]
+                if edge_cost is not None:
+                    records.append((targets[edge], record, length + 1))
+                    heapq.heappush(heap, (cost + edge_cost, len(records) - 1))
+
+    def _spur_path(self, start, banned_nodes, banned_edges):
+        # Cheapest reduced-cost path from start to the target avoiding the banned nodes and edges
+        offsets, targets, reduced, target = self.offsets, self.targets, self.reduced, self.target
+        dist = {start: 0}
+        parent = {start: None}
+        done = set()
+        heap = [(0, start)]
+        while heap:
+            distance, node = heapq.heappop(heap)
+            if node in done:
+                continue
+            if node == target:
+                path = []
+                while node is not None:
+                    path.append(node)
+                    node = parent[node]
+                path.reverse()
+                return distance, path
+            done.add(node)
+            for edge in range(offsets[node], offsets[node + 1]):
+                edge_cost = reduced[edge]
+                neighbor = targets[edge]
+                if edge_cost is None or neighbor in banned_nodes or edge in banned_edges:
+                    continue
+                new_distance = distance + edge_cost
+                if new_distance < dist.get(neighbor, new_distance + 1):
+                    dist[neighbor] = new_distance
+                    parent[neighbor] = node
+                    heapq.heappush(heap, (new_distance, neighbor))
+        return None
+
+    def _edge(self, node, neighbor):
+        for edge in range(self.offsets[node], self.offsets[node + 1]):
+            if self.targets[edge] == neighbor:
+                return edge
+
+    def simple_paths(self, k=None):
+        # Yen's algorithm with Lawler's shortcut: a path is only spurred from the node where it
+        # left its parent path, earlier spur nodes were already tried for the parent. The found
+        # paths are kept in a prefix tree, so the edges to ban at a spur node are the children
+        # of the root path's tree node.
+        if self.source not in self.relevant:
+            return
+        cost, path = self._spur_path(self.source, set(), set())
+        tree = {}
+        candidates = [(cost, path, 0)]
+        queued = {tuple(path)}
+        while candidates and k != 0:
+            cost, path, deviation = heapq.heappop(candidates)
+            yield cost + self.offset, path
+            if k is not None:
+                k -= 1
+
+            branch = tree
+            for node in path:
+                branch = branch.setdefault(node, {})
+            branch = tree
+            root_cost = 0
+            for i in range(len(path) - 1):
+                spur = path[i]
+                branch = branch[spur]
+                if i >= deviation:
+                    banned_edges = {self._edge(spur, neighbor) for neighbor in branch}
+                    result = self._spur_path(spur, set(path[:i]), banned_edges)
+                    if result is not None:
+                        new_path = path[:i] + result[1]
+                        key = tuple(new_path)
+                        if key not in queued:
+                            queued.add(key)
+                            heapq.heappush(candidates, (root_cost + result[0], new_path, i))
+                root_cost += self.reduced[self._edge(spur, path[i + 1])]
+
+
+_johnson_state = None
+
+
+def _init_johnson_worker(frozen_graph, potentials):
+    # Runs once per worker process; the frozen graph arrives as a shared memory mapping
+    global _johnson_state
+    _, offsets, targets, weights = frozen_graph._csr()
+    _johnson_state = (frozen_graph, offsets.tolist(), targets.tolist(), weights.tolist(), potentials)
+
+
+def _johnson_rows(sources):
+    _, offsets, targets, weights, potentials = _johnson_state
+    return [_johnson_dijkstra(offsets, targets, weights, potentials, source) for source in sources]
+
+
 class Node:
+    __slots__ = ('value', 'neighbors')
+
     def __init__(self, value):
         self.value = value
         self.neighbors = {}
@@ -14,10 +472,32 @@ class Node:
 
 
 class Graph:
-    def __init__(self, directed=False, weighted=False):
+    # Graph(..., storage='compact') creates a CompactGraph instead, and freeze() returns a
+    # read-only FrozenGraph. The algorithms below only use the accessors (nodes as a mapping
+    # of node values, _neighbors, _out_degree, _has_edge, _csr), so they work on all of them.
+    __slots__ = ('nodes', 'directed', 'weighted', '_version', '_frozen')
+    storage = 'objects'
+
+    def __new__(cls, directed=False, weighted=False, storage='objects'):
+        if storage not in STORAGES:
+            raise ValueError(f"Unknown graph storage '{storage}', expected one of: {', '.join(STORAGES)}.")
+        if storage == 'compact' and not issubclass(cls, CompactGraph):
+            cls = CompactGraph
+        return super().__new__(cls)
+
+    def __init__(self, directed=False, weighted=False, storage='objects'):
         self.nodes = {}
         self.directed = directed
         self.weighted = weighted
+        # Incremented by every change, so freeze() knows when to rebuild
+        self._version = 0
+        self._frozen = None
+
+    def __contains__(self, value):
+        return value in self.nodes
+
+    def __len__(self):
+        return len(self.nodes)
 
     def __copy__(self):
         new_graph = Graph(self.directed, self.weighted)
@@ -27,39 +507,152 @@ class Graph:
                 new_graph.nodes[node_value].add_neighbor(new_graph.nodes[neighbor.value], weight)
         return new_graph
 
+    def _neighbors(self, value):
+        # (neighbor value, weight) pairs of the outgoing edges of a node
+        return ((neighbor.value, weight) for neighbor, weight in self.nodes[value].neighbors.items())
+
+    def _out_degree(self, value):
+        return len(self.nodes[value].neighbors)
+
+    def _has_edge(self, value1, value2):
+        return self.nodes[value2] in self.nodes[value1].neighbors
+
+    def _csr(self):
+        # Node values, row offsets, target indexes and weights in adjacency order
+        node_list = list(self.nodes.values())
+        index = {node: i for i, node in enumerate(node_list)}
+        row_offsets = [0]
+        targets = []
+        weights = []
+        for node in node_list:
+            targets.extend(index[neighbor] for neighbor in node.neighbors)
+            weights.extend(node.neighbors.values())
+            row_offsets.append(len(targets))
+        return list(self.nodes), row_offsets, targets, weights if self.weighted else None
+
     @classmethod
-    def from_file(cls, filename):
-        graph = None
+    def from_file(cls, filename, workers=1, chunk_size=1 << 22, storage='objects'):
         try:
-            with open(filename, 'r') as file:
+            file, compressed = _open_text(filename)
+            with file:
                 directed = file.readline().strip().lower() == 'true'
                 weighted = file.readline().strip().lower() == 'true'
-                graph = cls(directed, weighted)
-                for line in file:
-                    line = line.strip()
-                    if line:
-                        parts = line.split()
-
-                        if len(parts) == 1:
-                            node_value = parts[0]
-                            graph.add_node(node_value)
-                        elif len(parts) == 2:
-                            node1, node2 = parts
-                            graph.add_edge(node1, node2)
-                        elif len(parts) == 3:
-                            node1, node2, weight = parts
-                            graph.add_edge(node1, node2, int(weight))
-                        else:
-                            raise ValueError(f"Invalid line format: {line}")
+                graph = cls(directed, weighted, storage=storage)
+                data_start = file.tell()
+                # The cyclic GC only slows down building millions of Nodes and dicts
+                gc_enabled = gc.isenabled()
+                gc.disable()
+                try:
+                    # Compressed files cannot be split into byte ranges, so they are read sequentially
+                    if workers > 1 and not compressed and os.path.getsize(filename) - data_start > PARALLEL_LOAD_MIN_BYTES:
+                        graph._load_parallel(filename, data_start, workers)
+                    else:
+                        line_number = 2
+                        for lines in _read_line_blocks(file, chunk_size):
+                            graph._load_lines(lines, line_number, filename)
+                            line_number += len(lines)
+                    graph._finish_load()
+                finally:
+                    if gc_enabled:
+                        gc.enable()
         except FileNotFoundError:
             raise FileNotFoundError(f"File '{filename}' not found.")
-        except ValueError:
+        except (UnicodeDecodeError, gzip.BadGzipFile, EOFError):
             raise ValueError(f"Invalid data format in file '{filename}'.")
         return graph
 
+    def _load_lines(self, lines, line_number, filename):
+        nodes = self.nodes
+        get_node = nodes.get
+        directed = self.directed
+        weighted = self.weighted
+        for line in lines:
+            line_number += 1
+            parts = line.split()
+            try:
+                if len(parts) == 3:
+                    value1, value2, weight = parts
+                    weight = int(weight)
+                    if not weighted:
+                        weight = None
+                elif len(parts) == 2:
+                    value1, value2 = parts
+                    weight = None
+                elif len(parts) == 1:
+                    if parts[0] in nodes:
+                        raise ValueError(f"Node {parts[0]} already exists.")
+                    nodes[parts[0]] = Node(parts[0])
+                    continue
+                elif not parts:
+                    continue
+                else:
+                    raise ValueError(f"Invalid line format: {line.strip()}")
+
+                node1 = get_node(value1)
+                if node1 is None:
+                    node1 = nodes[value1] = Node(value1)
+                node2 = get_node(value2)
+                if node2 is None:
+                    node2 = nodes[value2] = Node(value2)
+                if directed:
+                    node1.neighbors[node2] = weight
+                elif node1 is node2:
+                    raise ValueError("Loops are not allowed in undirected graphs.")
+                else:
+                    node1.neighbors[node2] = weight
+                    node2.neighbors[node1] = weight
+            except ValueError as e:
+                raise ValueError(f"Invalid data format in file '{filename}', line {line_number}: {e}") from None
+
+    def _load_parallel(self, filename, data_start, workers):
+        nodes = self.nodes
+        for labels, adjacency in self._parse_parallel(filename, data_start, workers):
+            block_nodes = []
+            for label in labels:
+                node = nodes.get(label)
+                if node is None:
+                    node = nodes[label] = Node(label)
+                block_nodes.append(node)
+            sources, offsets, targets, weights = adjacency
+            targets = list(map(block_nodes.__getitem__, targets))
+            for i, source in enumerate(sources):
+                start, end = offsets[i], offsets[i + 1]
+                block_nodes[source].neighbors.update(zip(targets[start:end], weights[start:end]))
+
+    def _parse_parallel(self, filename, data_start, workers):
+        # Parses newline-aligned parts of the file in worker processes and yields the
+        # (labels, adjacency) of each part in file order
+        size = os.path.getsize(filename)
+        bounds = [data_start]
+        with open(filename, 'rb') as file:
+            for i in range(1, workers):
+                file.seek(max(data_start + (size - data_start) * i // workers, bounds[-1]))
+                file.readline()
+                bounds.append(max(file.tell(), bounds[-1]))
+        bounds.append(size)
+        tasks = [(filename, start, end, self.directed, self.weighted)
+                 for start, end in zip(bounds, bounds[1:]) if end > start]
+
+        line_number = 2
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for labels, node_lines, adjacency, line_count, error in pool.map(_parse_block, tasks):
+                if error is not None:
+                    raise ValueError(f"Invalid data format in file '{filename}', "
+                                     f"line {line_number + error[0]}: {error[1]}")
+                for label, local_line in node_lines:
+                    if labels[label] in self.nodes:
+                        raise ValueError(f"Invalid data format in file '{filename}', "
+                                         f"line {line_number + local_line}: Node {labels[label]} already exists.")
+                yield labels, adjacency
+                line_number += line_count
+
+    def _finish_load(self):
+        pass
+
     def add_node(self, value):
         if value not in self.nodes:
             self.nodes[value] = Node(value)
+            self._version += 1
         else:
             raise ValueError(f"Node {value} already exists.")
 
@@ -82,6 +675,7 @@ class Graph:
 
         if not self.directed:
             node2.add_neighbor(node1, weight)
+        self._version += 1
 
     def remove_node(self, value):
         if value in self.nodes:
@@ -92,6 +686,7 @@ class Graph:
                     node.remove_neighbor(self.nodes[value])
 
             del self.nodes[value]
+            self._version += 1
         else:
             raise ValueError(f"Node {value} does not exist.")
 
@@ -102,57 +697,136 @@ class Graph:
             node1.remove_neighbor(node2)
             if not self.directed:
                 node2.remove_neighbor(node1)
+            self._version += 1
         else:
             raise ValueError(f"One or both of the nodes {value1}, {value2} do not exist.")
 
-    def save_to_file(self, filename):
+    def save_to_file(self, filename, compress=None, unique_edges=False):
+        # compress defaults to gzip for '.gz' filenames. With unique_edges an undirected
+        # edge is written once instead of once per direction; from_file adds both directions back.
+        if compress is None:
+            compress = filename.endswith('.gz')
+        unique_edges = unique_edges and not self.directed
+        values = list(self.nodes)
+        if self.directed:
+            has_incoming = set()
+            for value in values:
+                has_incoming.update(neighbor for neighbor, _ in self._neighbors(value))
+        else:
+            # Every edge of an undirected graph is stored in both endpoints
+            has_incoming = ()
+        order = {value: i for i, value in enumerate(values)} if unique_edges else None
+        weighted = self.weighted
         try:
-            with open(filename, 'w') as file:
+            if compress:
+                file = gzip.open(filename, 'wt', compresslevel=6)
+            else:
+                file = open(filename, 'w', buffering=SAVE_BUFFER_SIZE)
+            with file:
                 file.write("True\n" if self.directed else "False\n")
-                file.write("True\n" if self.weighted else "False\n")
-                for node_value, node in self.nodes.items():
-                    if node.neighbors:
-                        for neighbor, weight in node.neighbors.items():
-                            if self.weighted:
-                                file.write(f"{node_value} {neighbor.value} {weight}\n")
-                            else:
-                                file.write(f"{node_value} {neighbor.value}\n")
-                    else:
-                        is_isolated = True
-                        for other_node in self.nodes.values():
-                            if node in other_node.neighbors:
-                                is_isolated = False
-                                break
-
-                        if is_isolated:
-                            file.write(f"{node_value}\n")
+                file.write("True\n" if weighted else "False\n")
+                lines = []
+                for value in values:
+                    if self._out_degree(value):
+                        neighbors = self._neighbors(value)
+                        if unique_edges:
+                            position = order[value]
+                            neighbors = [(neighbor, weight) for neighbor, weight in neighbors
+                                         if order[neighbor] > position]
+                        if weighted:
+                            lines.extend(f"{value} {neighbor} {weight}\n" for neighbor, weight in neighbors)
+                        else:
+                            lines.extend(f"{value} {neighbor}\n" for neighbor, _ in neighbors)
+                    elif value not in has_incoming:
+                        lines.append(f"{value}\n")
+                    if len(lines) >= 65536:
+                        file.writelines(lines)
+                        lines.clear()
+                file.writelines(lines)
+        except IOError:
+            raise IOError(f"Error writing to file '{filename}'")
+
+    def save_snapshot(self, filename):
+        try:
+            with open(filename, 'wb') as file:
+                self._write_snapshot(file)
         except IOError:
             raise IOError(f"Error writing to file '{filename}'")
 
+    def _write_snapshot(self, file):
+        names, row_offsets, targets, weights = self._csr()
+        columns = []
+        if weights is not None and len(weights):
+            if any(weight is None for weight in weights):
+                raise ValueError("Cannot save a weighted graph with missing edge weights as a snapshot.")
+            columns.append((snapshot.column_kind(weights), weights))
+        snapshot.write_snapshot(file, names, row_offsets, targets, columns,
+                                directed=self.directed, weighted=self.weighted)
+
+    def freeze(self):
+        # Read-only CSR copy of the graph for query-heavy use. The copy is cached and only
+        # rebuilt after the graph has been changed through add_/remove_ methods.
+        frozen = self._frozen
+        if frozen is None or frozen.closed or frozen._version != self._version:
+            buffer = io.BytesIO()
+            self._write_snapshot(buffer)
+            self._frozen = FrozenGraph._open(buffer.getvalue())
+            self._frozen._version = self._version
+        return self._frozen
+
+    @classmethod
+    def load_snapshot(cls, filename, storage='objects'):
+        try:
+            with snapshot.read_snapshot(filename) as snap:
+                graph = cls(snap.directed, snap.weighted, storage=storage)
+                graph._read_snapshot(snap)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"File '{filename}' not found.")
+        except (ValueError, IndexError, UnicodeDecodeError):
+            raise ValueError(f"Invalid graph snapshot file '{filename}'.")
+        return graph
+
+    def _read_snapshot(self, snap):
+        node_list = [Node(name) for name in snap.names]
+        self.nodes = {node.value: node for node in node_list}
+        if len(self.nodes) != len(node_list):
+            raise ValueError("Duplicate node names.")
+        offsets = snap.row_offsets.tolist()
+        _check_snapshot_rows(offsets)
+        targets = snap.targets.tolist()
+        weights = snap.columns[0].tolist() if snap.columns else None
+        for i, node in enumerate(node_list):
+            start, end = offsets[i], offsets[i + 1]
+            neighbors = map(node_list.__getitem__, targets[start:end])
+            if weights is None:
+                node.neighbors = dict.fromkeys(neighbors)
+            else:
+                node.neighbors = dict(zip(neighbors, weights[start:end]))
+
     def get_edges(self):
         edges = []
         seen_edges = set()
 
-        for node_value, node in self.nodes.items():
-            for neighbor, weight in node.neighbors.items():
+        for node_value in self.nodes:
+            for neighbor, weight in self._neighbors(node_value):
                 if self.directed:
                     if self.weighted:
-                        edges.append((node_value, neighbor.value, weight))
+                        edges.append((node_value, neighbor, weight))
                     else:
-                        edges.append((node_value, neighbor.value))
+                        edges.append((node_value, neighbor))
                 else:
-                    edge = tuple(sorted((node_value, neighbor.value)))
+                    edge = tuple(sorted((node_value, neighbor)))
                     if edge not in seen_edges:
                         if self.weighted:
-                            edges.append((node_value, neighbor.value, weight))
+                            edges.append((node_value, neighbor, weight))
                         else:
-                            edges.append((node_value, neighbor.value))
+                            edges.append((node_value, neighbor))
                         seen_edges.add(edge)
         return sorted(edges)
 
     def get_outgoing_neighbors(self, node_value):
         if node_value in self.nodes:
-            return [neighbor.value for neighbor in self.nodes[node_value].neighbors]
+            return [neighbor for neighbor, _ in self._neighbors(node_value)]
         else:
             raise ValueError(f"Node {node_value} does not exist")
 
@@ -160,22 +834,23 @@ class Graph:
         if node_value not in self.nodes:
             raise ValueError(f"Node {node_value} does not exist")
         non_adjacent_nodes = []
-        for node in self.nodes.values():
-            if node_value != node.value and self.nodes[node_value] not in node.neighbors:
-                non_adjacent_nodes.append(node.value)
+        for value in self.nodes:
+            if node_value != value and not self._has_edge(value, node_value):
+                non_adjacent_nodes.append(value)
 
         return sorted(non_adjacent_nodes)
 
     def remove_edges_between_same_degree_nodes(self):
-        new_graph = Graph(directed=self.directed, weighted=self.weighted)
+        new_graph = Graph(directed=self.directed, weighted=self.weighted, storage=self.storage)
 
         for node_value in self.nodes.keys():
             new_graph.add_node(node_value)
 
-        for node_value, node in self.nodes.items():
-            for neighbor, weight in node.neighbors.items():
-                if len(node.neighbors) != len(self.nodes[neighbor.value].neighbors):
-                    new_graph.add_edge(node_value, neighbor.value, weight)
+        for node_value in self.nodes:
+            degree = self._out_degree(node_value)
+            for neighbor, weight in self._neighbors(node_value):
+                if degree != self._out_degree(neighbor):
+                    new_graph.add_edge(node_value, neighbor, weight)
         return new_graph
 
     def is_tree_or_forest_bfs(self):
@@ -199,8 +874,7 @@ class Graph:
                 local_visited.add(node)
                 visited.add(node)
 
-                for neighbor in self.nodes[node].neighbors:
-                    neighbor_value = neighbor.value
+                for neighbor_value, _ in self._neighbors(node):
                     if neighbor_value not in local_visited:
                         queue.append(neighbor_value)
                         parent[neighbor_value] = node
@@ -222,34 +896,28 @@ class Graph:
         return components
 
     def find_common_nodes_same_distance_dfs(self, u, v):
-        def dfs(node, path, all_paths):
-            path = path + [node]
-            if node not in all_paths:
-                all_paths[node] = []
-            all_paths[node].append(path)
-            for neighbor in self.nodes[node].neighbors:
-                if neighbor.value not in path:
-                    dfs(neighbor.value, path, all_paths)
-
-        paths_from_u = {}
-        paths_from_v = {}
+        def path_lengths(start):
+            # {node: lengths of all simple paths from start to node}, in the order nodes are first reached
+            lengths = {}
+            neighbors = lambda node: [neighbor for neighbor, _ in self._neighbors(node)]
+            for event, node, path in traversal.depth_first(start, neighbors, simple_paths=True):
+                if event == traversal.ENTER:
+                    lengths.setdefault(node, set()).add(len(path))
+            return lengths
 
         if u not in self.nodes:
             raise ValueError(f"Node {u} does not exist in the graph.")
         if v not in self.nodes:
             raise ValueError(f"Node {v} does not exist in the graph.")
 
-        dfs(u, [], paths_from_u)
-        dfs(v, [], paths_from_v)
+        lengths_from_u = path_lengths(u)
+        lengths_from_v = path_lengths(v)
 
         equal_distance_nodes = []
 
-        for node in paths_from_u:
-            if node in paths_from_v:
-                all_lengths_from_u = {len(path) for path in paths_from_u[node]}
-                all_lengths_from_v = {len(path) for path in paths_from_v[node]}
-                if all_lengths_from_u == all_lengths_from_v:
-                    equal_distance_nodes.append(node)
+        for node in lengths_from_u:
+            if lengths_from_v.get(node) == lengths_from_u[node]:
+                equal_distance_nodes.append(node)
 
         if not equal_distance_nodes:
             raise ValueError("No vertices with equal path lengths from both u and v.")
@@ -257,41 +925,32 @@ class Graph:
         return equal_distance_nodes
 
     def prim_mst(self):
+        return self.minimum_spanning_forest('prim')
+
+    def minimum_spanning_forest(self, method='auto'):
+        # Minimum spanning tree of every connected component: (edges, total weight).
+        # method is 'prim' (heap), 'kruskal' (sorted edges and union-find) or 'auto',
+        # which picks Prim for dense graphs (see spanning_forest.PRIM_MIN_DEGREE)
         if not self.nodes:
             raise ValueError("Graph is empty. Cannot compute MST.")
         if self.directed:
-            raise ValueError("Prim's algorithm works only for undirected graphs.")
+            raise ValueError("Minimum spanning trees are defined only for undirected graphs.")
         if not self.weighted:
-            raise ValueError("Prim's algorithm works only for weighted graphs.")
-        mst_edges = []
-        total_weight = 0
-        visited = set()
-        nodes = list(self.nodes.keys())
-
-        current_node = nodes[0]
-        visited.add(current_node)
-
-        while len(visited) < len(self.nodes):
-            min_edge = None
-            min_weight = float('inf')
-
-            for node in visited:
-                for neighbor, weight in self.nodes[node].neighbors.items():
-                    if neighbor.value not in visited and weight < min_weight:
-                        min_edge = (node, neighbor.value)
-                        min_weight = weight
-
-            if min_edge is None:
-                raise ValueError("The graph is not connected.")
-
-            mst_edges.append((min_edge[0], min_edge[1], min_weight))
-            total_weight += min_weight
-            visited.add(min_edge[1])
-
-        return mst_edges, total_weight
-
+            raise ValueError("Minimum spanning trees require a weighted graph.")
+        if method not in ('auto', 'prim', 'kruskal'):
+            raise ValueError(f"Unknown MST method '{method}', expected auto, prim or kruskal.")
+        names, offsets, targets, weights = self._csr()
+        if not targets:
+            return [], 0
+        forest = spanning_forest.minimum_spanning_forest(len(names), offsets, targets, weights, method)
+        mst_edges = [(names[u], names[v], weight) for u, v, weight in forest]
+        return mst_edges, sum(weight for _, _, weight in forest)
 
     def dijkstra(self, u):
+        # Distances from u, the number of shortest paths to every node and the predecessor DAG:
+        # predecessors[node] lists the nodes that end an edge of some shortest path to node.
+        # Use iter_shortest_paths to list the paths themselves. Nodes behind a zero-weight
+        # cycle have infinitely many shortest paths, their count is inf.
         if u not in self.nodes:
             raise ValueError(f"The node '{u}' does not exist in the graph.")
 
@@ -299,49 +958,133 @@ class Graph:
             raise ValueError("This method requires a weighted graph.")
 
         distances = {node: float('inf') for node in self.nodes}
-        path_counts = {node: 0 for node in self.nodes}
-        paths = {node: [] for node in self.nodes}
-
+        predecessors = {node: [] for node in self.nodes}
         distances[u] = 0
-        path_counts[u] = 1
-        paths[u] = [[u]]
-        unvisited = list(self.nodes.keys())
-
-        while unvisited:
-            current_node = None
-            current_distance = float('inf')
-            for node in unvisited:
-                if distances[node] < current_distance:
-                    current_distance = distances[node]
-                    current_node = node
-
-            if current_node is None:
-                break
-            unvisited.remove(current_node)
-
-            for neighbor, weight in self.nodes[current_node].neighbors.items():
-                new_distance = distances[current_node] + weight
-
-                if new_distance < distances[neighbor.value]:
-                    distances[neighbor.value] = new_distance
-                    path_counts[neighbor.value] = path_counts[current_node]
-
-                    paths[neighbor.value] = [
-                        path + [neighbor.value] for path in paths[current_node]
-                    ]
-                elif new_distance == distances[neighbor.value]:
-                    path_counts[neighbor.value] += path_counts[current_node]
-
-                    paths[neighbor.value].extend(
-                        path + [neighbor.value] for path in paths[current_node]
-                    )
-
-        return distances, path_counts, paths
+        heap = [(0, u)]
+        visited = set()
 
-    def floyd_warshall(self):
+        while heap:
+            distance, current_node = heapq.heappop(heap)
+            if current_node in visited:
+                continue
+            visited.add(current_node)
+
+            for neighbor, weight in self._neighbors(current_node):
+                if weight < 0:
+                    raise ValueError("Dijkstra's algorithm requires non-negative edge weights.")
+                new_distance = distance + weight
+
+                if new_distance < distances[neighbor]:
+                    distances[neighbor] = new_distance
+                    predecessors[neighbor] = [current_node]
+                    heapq.heappush(heap, (new_distance, neighbor))
+                elif new_distance == distances[neighbor] and neighbor != u:
+                    predecessors[neighbor].append(current_node)
+
+        # Counts in topological order of the DAG; with zero-weight edges the order of the
+        # heap is not enough
+        path_counts = {node: 0 for node in self.nodes}
+        path_counts[u] = 1
+        waiting = {node: len(node_predecessors) for node, node_predecessors in predecessors.items() if node_predecessors}
+        successors = {}
+        for node, node_predecessors in predecessors.items():
+            for predecessor in node_predecessors:
+                successors.setdefault(predecessor, []).append(node)
+        queue = deque([u])
+        while queue:
+            node = queue.popleft()
+            for successor in successors.get(node, ()):
+                path_counts[successor] += path_counts[node]
+                waiting[successor] -= 1
+                if not waiting[successor]:
+                    queue.append(successor)
+        for node, count in waiting.items():
+            if count:
+                path_counts[node] = float('inf')
+
+        return distances, path_counts, predecessors
+
+    def iter_shortest_paths(self, u, v, predecessors=None):
+        # Generator of the shortest paths from u to v, one list at a time. predecessors is the
+        # DAG returned by dijkstra(u); it is computed here if not given.
+        if predecessors is None:
+            predecessors = self.dijkstra(u)[2]
+        if v not in predecessors:
+            raise ValueError(f"The node '{v}' does not exist in the graph.")
+        if v != u and not predecessors[v]:
+            return
+
+        # Depth-first search back from v; path holds v ... node, choices the unexplored predecessors
+        path = [v]
+        on_path = {v}
+        choices = [iter(predecessors[v])]
+        while choices:
+            node = path[-1]
+            if node == u:
+                yield path[::-1]
+                on_path.discard(path.pop())
+                choices.pop()
+                continue
+            predecessor = next(choices[-1], None)
+            if predecessor is None:
+                on_path.discard(path.pop())
+                choices.pop()
+            elif predecessor not in on_path:
+                # (a node already in the path is on a zero-weight cycle)
+                path.append(predecessor)
+                on_path.add(predecessor)
+                choices.append(iter(predecessors[predecessor]))
+
+    def floyd_warshall(self, dtype='float64', block_rows=None):
+        # Pairs (u, v) with paths of arbitrarily small length, i.e. through a negative cycle.
+        # Uses NumPy when it is installed: each step k relaxes a block of block_rows rows
+        # at a time against row k, so the temporary arrays stay in cache. float32 halves the
+        # memory of the n x n matrix at the cost of precision.
         if not self.weighted:
             raise ValueError("This method requires a weighted graph.")
-
+        if np is None:
+            return self._floyd_warshall_python()
+
+        names, dist = self._floyd_warshall_matrix(dtype, block_rows)
+        # i reaches a node k on a negative cycle, and k reaches j
+        reachable = dist < np.inf
+        on_negative_cycle = np.diagonal(dist) < 0
+        if not on_negative_cycle.any():
+            return []
+        to_cycle = reachable[:, on_negative_cycle].astype(np.float32)
+        from_cycle = reachable[on_negative_cycle].astype(np.float32)
+        rows, columns = np.nonzero(to_cycle @ from_cycle)
+        return sorted(zip(map(names.__getitem__, rows.tolist()), map(names.__getitem__, columns.tolist())))
+
+    def _floyd_warshall_matrix(self, dtype='float64', block_rows=None):
+        # Node values and the n x n NumPy distance matrix
+        names, offsets, targets, weights = self._csr()
+        n = len(names)
+        dtype = np.dtype(dtype)
+        if dtype.kind != 'f':
+            raise ValueError(f"Unsupported distance type '{dtype}', use float32 or float64.")
+        dist = np.full((n, n), np.inf, dtype=dtype)
+        np.fill_diagonal(dist, 0)
+        offsets = np.asarray(offsets, dtype=np.int64)
+        sources = np.repeat(np.arange(n), np.diff(offsets))
+        dist[sources, np.asarray(targets, dtype=np.int64)] = np.asarray(weights, dtype=dtype)
+
+        if block_rows is None:
+            block_rows = max(1, FLOYD_BLOCK_BYTES // max(1, n * dtype.itemsize))
+        buffer = np.empty((min(block_rows, n), n), dtype=dtype)
+        # Distances through negative cycles can overflow to -inf; -inf + inf then gives NaN,
+        # which fmin skips just like the inf checks of the plain loop
+        with np.errstate(over='ignore', invalid='ignore'):
+            for k in range(n):
+                row_k = dist[k]
+                for start in range(0, n, block_rows):
+                    block = dist[start:start + block_rows]
+                    through_k = buffer[:len(block)]
+                    np.add(block[:, k, None], row_k, out=through_k)
+                    np.fmin(block, through_k, out=block)
+        return names, dist
+
+    def _floyd_warshall_python(self):
         nodes = list(self.nodes.keys())
         node_indices = {node: idx for idx, node in enumerate(nodes)}
         n = len(nodes)
@@ -351,8 +1094,8 @@ class Graph:
             dist[i][i] = 0
 
         for node in self.nodes:
-            for neighbor, weight in self.nodes[node].neighbors.items():
-                dist[node_indices[node]][node_indices[neighbor.value]] = weight
+            for neighbor, weight in self._neighbors(node):
+                dist[node_indices[node]][node_indices[neighbor]] = weight
 
         for k in range(n):
             for i in range(n):
@@ -370,75 +1113,547 @@ class Graph:
 
         return sorted(negative_cycle_pairs)
 
+    def _choose_all_pairs_method(self, method, node_count, edge_count):
+        if method not in ('auto', 'johnson', 'floyd_warshall'):
+            raise ValueError(f"Unknown method '{method}', expected 'auto', 'johnson' or 'floyd_warshall'.")
+        if method == 'floyd_warshall' and np is None:
+            raise ValueError("The floyd_warshall method requires NumPy.")
+        if method == 'auto':
+            dense = node_count + edge_count >= DENSE_GRAPH_RATIO * node_count * node_count
+            method = 'floyd_warshall' if np is not None and dense and node_count <= FLOYD_MAX_NODES else 'johnson'
+        return method
+
+    def all_pairs_shortest_paths(self, method='auto', workers=1):
+        # {u: {v: distance}} for every v reachable from u. Johnson's algorithm (Bellman-Ford
+        # potentials, then a heap Dijkstra per source, in a process pool with workers > 1)
+        # for sparse graphs, floyd_warshall for dense ones; 'auto' chooses by density.
+        if not self.weighted:
+            raise ValueError("This method requires a weighted graph.")
+        names, offsets, targets, weights = self._csr()
+        method = self._choose_all_pairs_method(method, len(names), len(targets))
+
+        if method == 'floyd_warshall':
+            names, dist = self._floyd_warshall_matrix()
+            if (np.diagonal(dist) < 0).any():
+                raise ValueError("The graph contains a negative cycle.")
+            # The matrix keeps positive self-loop weights on the diagonal, as floyd_warshall always did
+            np.fill_diagonal(dist, 0)
+            result = {}
+            for i, name in enumerate(names):
+                row = dist[i]
+                reachable = np.flatnonzero(row < np.inf)
+                result[name] = dict(zip(map(names.__getitem__, reachable.tolist()), row[reachable].tolist()))
+            return result
+
+        offsets, targets, weights = list(offsets), list(targets), list(weights)
+        potentials = _bellman_ford_potentials(len(names), offsets, targets, weights)
+        if potentials is None:
+            raise ValueError("The graph contains a negative cycle.")
+        sources = range(len(names))
+        if workers > 1 and len(names) > 1:
+            chunk = max(1, len(names) // (workers * 4))
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_johnson_worker,
+                                     initargs=(self.freeze(), potentials)) as pool:
+                rows = list(pool.map(_johnson_rows, [sources[i:i + chunk] for i in range(0, len(names), chunk)]))
+            rows = [row for block in rows for row in block]
+        else:
+            rows = [_johnson_dijkstra(offsets, targets, weights, potentials, source) for source in sources]
+        return {names[source]: dict(zip(map(names.__getitem__, row), row.values()))
+                for source, row in zip(sources, rows)}
+
+    def negative_cycle_pairs(self, method='auto'):
+        # The same pairs as floyd_warshall. The 'johnson' method finds the strongly connected
+        # components that contain a negative cycle (Bellman-Ford inside each component), then
+        # pairs every node that reaches such a component with every node reachable from it.
+        if not self.weighted:
+            raise ValueError("This method requires a weighted graph.")
+        names, offsets, targets, weights = self._csr()
+        if self._choose_all_pairs_method(method, len(names), len(targets)) == 'floyd_warshall':
+            return self.floyd_warshall()
+
+        n = len(names)
+        offsets, targets, weights = list(offsets), list(targets), list(weights)
+        component, component_count = _strongly_connected_components(n, offsets, targets)
+        members = [[] for _ in range(component_count)]
+        for node, c in enumerate(component):
+            members[c].append(node)
+        bad = [c for c in range(component_count)
+               if _has_negative_cycle(members[c], component, offsets, targets, weights)]
+        if not bad:
+            return []
+
+        reverse_offsets, reverse_targets = _reverse_csr(n, offsets, targets)
+        pairs = set()
+        for c in bad:
+            start = members[c][0]
+            ancestors = _reachable(start, reverse_offsets, reverse_targets)
+            descendants = [names[node] for node in _reachable(start, offsets, targets)]
+            for node in ancestors:
+                name = names[node]
+                pairs.update((name, other) for other in descendants)
+        return sorted(pairs)
+
     def bellman_ford(self, u, v, k):
+        # The k cheapest walks from u to v (nodes may repeat) with at most V-1 edges, cheapest first
+        return list(islice(self.k_shortest_paths(u, v, k, loopless=False, max_edges=len(self.nodes) - 1), k))
+
+    def k_shortest_paths(self, u, v, k=None, loopless=True, max_edges=None):
+        # Generator of (cost, path) from u to v in increasing cost order. loopless=True runs
+        # Yen's algorithm (simple paths); loopless=False enumerates walks best-first, popping
+        # each node at most k times (the walk version of Eppstein's algorithm), and skips
+        # walks longer than max_edges edges if it is given. Both search with potentials:
+        # Johnson's (Bellman-Ford) for negative weights, plus the exact distance to v, so
+        # each search goes straight to v. Unweighted edges cost 1. Paths are found as they
+        # are consumed; k=None yields all of them (walks never end if there is a cycle on
+        # the way and no max_edges).
         if u not in self.nodes or v not in self.nodes:
             raise ValueError(f"One or both of the nodes '{u}' or '{v}' do not exist in the graph.")
+        if k is not None and k < 1:
+            raise ValueError("The number of paths must be positive.")
+        names, offsets, targets, weights = self._csr()
+        offsets, targets = list(offsets), list(targets)
+        weights = list(weights) if weights is not None else [1] * len(targets)
+        search = _PathSearch(len(names), offsets, targets, weights, names.index(u), names.index(v))
+        paths = search.simple_paths(k) if loopless else search.walks(k, max_edges)
+        return ((cost, [names[node] for node in path]) for cost, path in paths)
 
-        all_paths = [(0, (u,))]
+    def edmonds_karp(self, source, sink):
+        return self.max_flow(source, sink, method='edmonds_karp')
 
-        for i in range(len(self.nodes) - 1):
-            new_paths = []
-            for path_cost, path in all_paths:
-                last_node = path[-1]
+    def max_flow(self, source, sink, method='dinic'):
+        # Maximum flow from source to sink with edge weights as capacities (1 in an unweighted
+        # graph, edges with weight <= 0 carry nothing). method is 'dinic', 'push_relabel'
+        # (highest label) or 'edmonds_karp'. Returns the flow value and {u: {v: flow}} with
+        # the edges that carry flow.
+        if source not in self.nodes or sink not in self.nodes:
+            raise ValueError(f"Source '{source}' or sink '{sink}' does not exist in the graph.")
+        if method not in flow.METHODS:
+            raise ValueError(f"Unknown max flow method '{method}', expected one of {', '.join(flow.METHODS)}.")
+
+        names, offsets, targets, weights = self._csr()
+        capacities = weights if weights is not None else [1] * len(targets)
+        network = flow.FlowNetwork.from_csr(offsets, targets, capacities)[0]
+        value = flow.max_flow(network, names.index(source), names.index(sink), method)
+        return value, network.flows(names)
+
+
+class CompactGraph(Graph):
+    # Array-backed storage for large graphs, created with Graph(..., storage='compact').
+    # Nodes get integer ids in insertion order (nodes maps node values to ids), and the
+    # adjacency is kept in CSR form: the outgoing edges of node i are targets[offsets[i]:offsets[i + 1]]
+    # with weights at the same positions. An edge costs 12 bytes instead of a dict entry
+    # between two Node objects. Rows changed after loading move to small per-node arrays
+    # in _rows; removed nodes leave an unused id behind. Every edge of a weighted compact
+    # graph needs a numeric weight.
+    __slots__ = ('_ids', '_labels', '_offsets', '_targets', '_weights', '_rows', '_pending')
+    storage = 'compact'
+
+    def __init__(self, directed=False, weighted=False, storage='compact'):
+        self.directed = directed
+        self.weighted = weighted
+        self._version = 0
+        self._frozen = None
+        self._ids = {}
+        self._labels = []
+        self._offsets = array('Q', [0])
+        self._targets = array('I')
+        self._weights = array('q') if weighted else None
+        self._rows = {}
+        self._pending = None
+
+    @property
+    def nodes(self):
+        return self._ids
+
+    @nodes.setter
+    def nodes(self, value):
+        self._ids = value
 
-                for neighbor, weight in self.nodes[last_node].neighbors.items():
-                    neighbor_value = neighbor.value
-                    new_path = path + (neighbor_value,)
-                    new_cost = path_cost + weight
-                    new_paths.append((new_cost, new_path))
+    def __copy__(self):
+        new_graph = CompactGraph(self.directed, self.weighted)
+        new_graph._ids = dict(self._ids)
+        new_graph._labels = list(self._labels)
+        new_graph._offsets = array('Q', self._offsets)
+        new_graph._targets = array('I', self._targets)
+        if self._weights is not None:
+            new_graph._weights = array(self._weights.typecode, self._weights)
+        new_graph._rows = {i: (array('I', targets), None if weights is None else array(weights.typecode, weights))
+                           for i, (targets, weights) in self._rows.items()}
+        return new_graph
 
-            all_paths.extend(new_paths)
-            all_paths = list(set(all_paths))
+    def _row(self, node_id):
+        row = self._rows.get(node_id)
+        if row is not None:
+            return row
+        start, end = self._offsets[node_id], self._offsets[node_id + 1]
+        weights = self._weights[start:end] if self._weights is not None else None
+        return self._targets[start:end], weights
+
+    def _editable_row(self, node_id):
+        row = self._rows.get(node_id)
+        if row is None:
+            row = self._rows[node_id] = self._row(node_id)
+        return row
+
+    def _neighbors(self, value):
+        targets, weights = self._row(self._ids[value])
+        neighbors = map(self._labels.__getitem__, targets)
+        return zip(neighbors, weights if weights is not None else repeat(None))
+
+    def _out_degree(self, value):
+        node_id = self._ids[value]
+        row = self._rows.get(node_id)
+        if row is not None:
+            return len(row[0])
+        return self._offsets[node_id + 1] - self._offsets[node_id]
+
+    def _has_edge(self, value1, value2):
+        return self._ids[value2] in self._row(self._ids[value1])[0]
+
+    def _csr(self):
+        if not self._rows and len(self._ids) == len(self._labels):
+            return list(self._ids), self._offsets, self._targets, self._weights
+        live = list(self._ids.values())
+        remap = None
+        if len(live) != len(self._labels):
+            remap = [0] * len(self._labels)
+            for new_id, node_id in enumerate(live):
+                remap[node_id] = new_id
+        row_offsets = array('Q', [0])
+        targets = array('I')
+        weights = array(self._weights.typecode) if self._weights is not None else None
+        for node_id in live:
+            row_targets, row_weights = self._row(node_id)
+            targets.extend(row_targets if remap is None else map(remap.__getitem__, row_targets))
+            if weights is not None:
+                weights.extend(row_weights)
+            row_offsets.append(len(targets))
+        return list(self._ids), row_offsets, targets, weights
+
+    def _read_snapshot(self, snap):
+        names = snap.names
+        self._ids = {name: i for i, name in enumerate(names)}
+        if len(self._ids) != len(names):
+            raise ValueError("Duplicate node names.")
+        self._labels = names
+        self._offsets = array('Q')
+        self._offsets.frombytes(snap.row_offsets.tobytes())
+        self._targets = array('I')
+        self._targets.frombytes(snap.targets.tobytes())
+        # The arrays are used as they are, so check what the object loader gets from IndexError
+        _check_snapshot_rows(self._offsets)
+        if self._targets and max(self._targets) >= len(names):
+            raise ValueError("Node index out of range.")
+        if self.weighted:
+            typecode = 'd' if snap.columns and snap.columns[0].format == 'd' else 'q'
+            self._weights = array(typecode)
+            if snap.columns:
+                self._weights.frombytes(snap.columns[0].tobytes())
+            elif len(self._targets):
+                raise ValueError("Missing edge weights.")
+        self._rows = {}
+
+    def _new_node(self, value):
+        node_id = self._ids[value] = len(self._labels)
+        self._labels.append(value)
+        self._offsets.append(self._offsets[-1])
+        return node_id
+
+    def _weight(self, weight):
+        # Validates a weight for the weight arrays, switching them to floats if needed
+        if not self.weighted:
+            return None
+        if weight is None:
+            raise ValueError("Edges of a weighted compact graph need a weight.")
+        if self._weights.typecode == 'q' and not isinstance(weight, int):
+            self._weights = array('d', self._weights)
+            for node_id, (targets, weights) in self._rows.items():
+                self._rows[node_id] = (targets, array('d', weights))
+        if self._weights.typecode == 'q' and not -2 ** 63 <= weight < 2 ** 63:
+            raise ValueError(f"Edge weight {weight} is out of range.")
+        return weight
+
+    def _set_edge(self, node_id1, node_id2, weight):
+        targets, weights = self._editable_row(node_id1)
+        try:
+            i = targets.index(node_id2)
+        except ValueError:
+            targets.append(node_id2)
+            if weights is not None:
+                weights.append(weight)
+        else:
+            if weights is not None:
+                weights[i] = weight
 
-        valid_paths = [(cost, path) for cost, path in all_paths if path[-1] == v]
-        valid_paths.sort(key=lambda x: x[0])
+    def _unset_edge(self, node_id1, node_id2):
+        targets, weights = self._editable_row(node_id1)
+        try:
+            i = targets.index(node_id2)
+        except ValueError:
+            raise ValueError(f"Neighbor with node {self._labels[node_id2]} not found.") from None
+        del targets[i]
+        if weights is not None:
+            del weights[i]
 
-        return [(cost, list(path)) for cost, path in valid_paths[:k]]
+    def add_node(self, value):
+        if value not in self._ids:
+            self._new_node(value)
+            self._version += 1
+        else:
+            raise ValueError(f"Node {value} already exists.")
 
-    def edmonds_karp(self, source, sink):
-        if source not in self.nodes or sink not in self.nodes:
-            raise ValueError(f"Source '{source}' or sink '{sink}' does not exist in the graph.")
+    def add_edge(self, value1, value2, weight=None):
+        if value1 not in self._ids:
+            self.add_node(value1)
+        if value2 not in self._ids:
+            self.add_node(value2)
 
-        capacity = {u: {v.value: 0 for v in self.nodes[u].neighbors} for u in self.nodes}
-        for u in self.nodes:
-            for v, w in self.nodes[u].neighbors.items():
-                capacity[u][v.value] = w
-        ostat = {u: {v: capacity[u].get(v, 0) for v in self.nodes} for u in self.nodes}
-        flow = {u: {v: 0 for v in self.nodes} for u in self.nodes}
+        if value1 == value2 and not self.directed:
+            raise ValueError(f"Loops are not allowed in undirected graphs.")
 
-        def bfs():
-            parent = {node: None for node in self.nodes}
-            parent[source] = source
-            queue = [source]
+        weight = self._weight(weight)
+        node_id1 = self._ids[value1]
+        node_id2 = self._ids[value2]
+        self._set_edge(node_id1, node_id2, weight)
+        if not self.directed:
+            self._set_edge(node_id2, node_id1, weight)
+        self._version += 1
+
+    def remove_node(self, value):
+        if value not in self._ids:
+            raise ValueError(f"Node {value} does not exist.")
+        node_id = self._ids.pop(value)
+        targets, _ = self._row(node_id)
+        if self.directed:
+            sources = [other for other in self._ids.values() if node_id in self._row(other)[0]]
+        else:
+            sources = targets
+        for other in sources:
+            self._unset_edge(other, node_id)
+        self._rows[node_id] = (array('I'), array(self._weights.typecode) if self._weights is not None else None)
+        self._labels[node_id] = None
+        self._version += 1
+
+    def remove_edge(self, value1, value2):
+        if value1 in self._ids and value2 in self._ids:
+            node_id1 = self._ids[value1]
+            node_id2 = self._ids[value2]
+            self._unset_edge(node_id1, node_id2)
+            if not self.directed:
+                self._unset_edge(node_id2, node_id1)
+            self._version += 1
+        else:
+            raise ValueError(f"One or both of the nodes {value1}, {value2} do not exist.")
+
+    def _load_lines(self, lines, line_number, filename):
+        # Edges are collected as (source, target, weight) arrays and sorted into rows by _finish_load
+        if self._pending is None:
+            self._pending = (array('I'), array('I'), array('q') if self.weighted else None)
+        sources, targets, weights = self._pending
+        ids = self._ids
+        get_id = ids.get
+        new_node = self._new_node
+        directed = self.directed
+        weighted = self.weighted
+        for line in lines:
+            line_number += 1
+            parts = line.split()
+            try:
+                if len(parts) == 3:
+                    value1, value2, weight = parts
+                    weight = int(weight)
+                elif len(parts) == 2:
+                    value1, value2 = parts
+                    if weighted:
+                        raise ValueError("Edges of a weighted compact graph need a weight.")
+                    weight = None
+                elif len(parts) == 1:
+                    if parts[0] in ids:
+                        raise ValueError(f"Node {parts[0]} already exists.")
+                    new_node(parts[0])
+                    continue
+                elif not parts:
+                    continue
+                else:
+                    raise ValueError(f"Invalid line format: {line.strip()}")
+
+                node_id1 = get_id(value1)
+                if node_id1 is None:
+                    node_id1 = new_node(value1)
+                node_id2 = get_id(value2)
+                if node_id2 is None:
+                    node_id2 = new_node(value2)
+                if not directed and node_id1 == node_id2:
+                    raise ValueError("Loops are not allowed in undirected graphs.")
+                if weighted:
+                    weights.append(weight)
+                sources.append(node_id1)
+                targets.append(node_id2)
+                if not directed:
+                    if weighted:
+                        weights.append(weight)
+                    sources.append(node_id2)
+                    targets.append(node_id1)
+            except (ValueError, OverflowError) as e:
+                raise ValueError(f"Invalid data format in file '{filename}', line {line_number}: {e}") from None
+
+    def _load_parallel(self, filename, data_start, workers):
+        if self._pending is None:
+            self._pending = (array('I'), array('I'), array('q') if self.weighted else None)
+        sources, targets, weights = self._pending
+        ids = self._ids
+        for labels, adjacency in self._parse_parallel(filename, data_start, workers):
+            block_ids = []
+            for label in labels:
+                node_id = ids.get(label)
+                if node_id is None:
+                    node_id = self._new_node(label)
+                block_ids.append(node_id)
+            block_sources, offsets, block_targets, block_weights = adjacency
+            for i, source in enumerate(block_sources):
+                sources.extend(repeat(block_ids[source], offsets[i + 1] - offsets[i]))
+            targets.extend(map(block_ids.__getitem__, block_targets))
+            if weights is not None:
+                if None in block_weights:
+                    raise ValueError(f"Invalid data format in file '{filename}': "
+                                     f"edges of a weighted compact graph need a weight.")
+                try:
+                    weights.extend(block_weights)
+                except OverflowError as e:
+                    raise ValueError(f"Invalid data format in file '{filename}': {e}") from None
+
+    def _finish_load(self):
+        # Counting sort of the loaded edges by source; the file order is kept within each row
+        if self._pending is None:
+            return
+        sources, targets, weights = self._pending
+        self._pending = None
+        node_count = len(self._labels)
+        counts = Counter(sources)
+        offsets = array('Q', accumulate((counts.get(i, 0) for i in range(node_count)), initial=0))
+        del counts
+        positions = offsets[:-1]
+        row_targets = array('I', bytes(4 * len(targets)))
+        row_weights = array('q', bytes(8 * len(targets))) if weights is not None else None
+        for i, source in enumerate(sources):
+            position = positions[source]
+            positions[source] = position + 1
+            row_targets[position] = targets[i]
+            if row_weights is not None:
+                row_weights[position] = weights[i]
+        del positions, sources, targets, weights
+        self._offsets = offsets
+        self._targets = row_targets
+        self._weights = row_weights
+
+        # A repeated edge keeps its first position and its last weight, like a dict update
+        for node_id in range(node_count):
+            start, end = offsets[node_id], offsets[node_id + 1]
+            if end - start > 1:
+                row = row_targets[start:end]
+                if len(set(row)) != len(row):
+                    neighbors = dict(zip(row, row_weights[start:end] if row_weights is not None else repeat(None)))
+                    self._rows[node_id] = (array('I', neighbors),
+                                           array('q', neighbors.values()) if row_weights is not None else None)
+
+
+class FrozenGraph(Graph):
+    # Immutable graph returned by Graph.freeze(). Its adjacency is a snapshot (graph_app/snapshot.py
+    # format) in one buffer, read through memoryviews, so threads can query it without locks.
+    # Forked workers inherit it without copying; other processes get it through share() and
+    # attach(path), or by pickling, which maps the same shared pages instead of copying them.
+    __slots__ = ('_ids', '_labels', '_snapshot', '_data', '_shared_path', '_remove_shared', 'closed',
+                 '__weakref__')
+    storage = 'compact'
+
+    @classmethod
+    def _open(cls, source):
+        graph = Graph.__new__(cls)
+        snap = snapshot.read_snapshot(source)
+        graph.directed = snap.directed
+        graph.weighted = snap.weighted
+        graph._version = 0
+        graph._frozen = graph
+        graph._snapshot = snap
+        graph._labels = snap.names
+        graph._ids = {name: i for i, name in enumerate(graph._labels)}
+        graph._data = source if isinstance(source, bytes) else None
+        graph._shared_path = None if isinstance(source, bytes) else source
+        graph._remove_shared = None
+        graph.closed = False
+        return graph
+
+    @classmethod
+    def attach(cls, path):
+        # Maps a graph published by share() in another process
+        try:
+            return cls._open(path)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Shared graph '{path}' not found.")
+        except (ValueError, IndexError, UnicodeDecodeError):
+            raise ValueError(f"Invalid shared graph '{path}'.")
+
+    def share(self):
+        # Publishes the snapshot in shared memory and returns the path for attach(). The file
+        # is removed when this graph is closed or garbage collected.
+        if self._shared_path is None:
+            self._shared_path = snapshot.write_shared(self._data)
+            self._remove_shared = weakref.finalize(self, _remove_file, self._shared_path)
+        return self._shared_path
+
+    def close(self):
+        if self._remove_shared is not None:
+            self._remove_shared()
+        self._snapshot.close()
+        self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __reduce__(self):
+        return FrozenGraph.attach, (self.share(),)
+
+    @property
+    def nodes(self):
+        return self._ids
+
+    def __copy__(self):
+        return self
+
+    def freeze(self):
+        return self
+
+    def _neighbors(self, value):
+        node_id = self._ids[value]
+        snap = self._snapshot
+        start, end = snap.row_offsets[node_id], snap.row_offsets[node_id + 1]
+        neighbors = map(self._labels.__getitem__, snap.targets[start:end])
+        return zip(neighbors, snap.columns[0][start:end] if snap.columns else repeat(None))
+
+    def _out_degree(self, value):
+        node_id = self._ids[value]
+        return self._snapshot.row_offsets[node_id + 1] - self._snapshot.row_offsets[node_id]
+
+    def _has_edge(self, value1, value2):
+        node_id = self._ids[value1]
+        start, end = self._snapshot.row_offsets[node_id], self._snapshot.row_offsets[node_id + 1]
+        return self._ids[value2] in self._snapshot.targets[start:end]
+
+    def _csr(self):
+        snap = self._snapshot
+        return list(self._ids), snap.row_offsets, snap.targets, snap.columns[0] if snap.columns else None
+
+    def _read_only(self, *args, **kwargs):
+        raise ValueError("A frozen graph cannot be changed; change the original graph and freeze it again.")
+
+    add_node = add_edge = remove_node = remove_edge = _read_only
 
-            while queue:
-                current = queue.pop(0)
-                for neighbor, cap in ostat[current].items():
-                    if cap > 0 and parent[neighbor] is None:
-                        parent[neighbor] = current
-                        if neighbor == sink:
-                            return parent
-                        queue.append(neighbor)
-            return None
 
-        max_flow = 0
-        while True:
-            path = bfs()
-            if not path:
-                break
-            path_flow = float('inf')
-            s = sink
-            while s != source:
-                path_flow = min(path_flow, ostat[path[s]][s])
-                s = path[s]
-
-            v = sink
-            while v != source:
-                u = path[v]
-                ostat[u][v] -= path_flow
-                flow[u][v] += path_flow
-                v = u
-
-            max_flow += path_flow
-
-        return max_flow, flow
+def _remove_file(path):
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
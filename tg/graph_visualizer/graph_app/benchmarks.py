@@ -0,0 +1,450 @@
+"""
+Замеры производительности алгоритмов логистического графа.
+
+Запуск из каталога graph_visualizer:
+
+    python -m graph_app.benchmarks paths
+    python -m graph_app.benchmarks render
+    python -m graph_app.benchmarks load
+    python -m graph_app.benchmarks flow
+    python -m graph_app.benchmarks mst
+    python -m graph_app.benchmarks session
+    python -m graph_app.benchmarks mincost
+"""
+import argparse
+import heapq
+import io
+import json
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+from .graph import Graph
+from .spanning_forest import PRIM_MIN_DEGREE
+
+
+def build_logistics_graph(edge_count, seed=42, directed=True, node_count=None):
+    """
+    Строит случайную логистическую сеть: ~edge_count рёбер, по умолчанию в среднем 4 исходящих
+    ребра на вершину
+    """
+    rng = random.Random(seed)
+    if node_count is None:
+        node_count = max(2, edge_count // 4)
+    graph = Graph(directed=directed, weighted=True)
+    for i in range(node_count):
+        graph.add_node(f"v{i}", 'warehouse' if i % 10 == 0 else 'client')
+    names = list(graph.nodes)
+    for _ in range(edge_count):
+        graph.add_edge(rng.choice(names), rng.choice(names),
+                       rng.randint(100, 5000), rng.randint(1, 72))
+    return graph
+
+
+def legacy_find_shortest_path(graph, start, end, weight_type='cost'):
+    """Прежняя реализация: на каждое извлечение из кучи просматривается весь список рёбер."""
+    edges = graph.edges
+    distances = {node: float('inf') for node in graph.nodes}
+    distances[start] = 0
+    previous_nodes = {node: None for node in graph.nodes}
+    pq = [(0, start)]
+    while pq:
+        current_distance, current_node = heapq.heappop(pq)
+        if current_node == end:
+            break
+        if current_distance > distances[current_node]:
+            continue
+        for edge in edges:
+            if edge[0] == current_node:
+                neighbor = edge[1]
+                weight = edge[2] if weight_type == 'cost' else edge[3]
+                distance = current_distance + weight
+                if distance < distances[neighbor]:
+                    distances[neighbor] = distance
+                    previous_nodes[neighbor] = current_node
+                    heapq.heappush(pq, (distance, neighbor))
+    return distances[end]
+
+
+def _time_queries(func, queries):
+    started = time.perf_counter()
+    for start, end in queries:
+        func(start, end)
+    return (time.perf_counter() - started) / len(queries)
+
+
+def bench_paths(sizes, queries, legacy_max_edges, seed):
+    print(f"{'рёбер':>10} {'вершин':>8} {'до, мс':>12} {'после, мс':>12} {'Парето-путь, мс':>16} "
+          f"{'freeze, мс':>11} {'замороженный, мс':>17}")
+    for edge_count in sizes:
+        graph = build_logistics_graph(edge_count, seed)
+        rng = random.Random(seed)
+        names = list(graph.nodes)
+        pairs = [(rng.choice(names), rng.choice(names)) for _ in range(queries)]
+
+        after = _time_queries(graph.find_shortest_path, pairs)
+        optimal = _time_queries(graph.find_optimal_path, pairs)
+        if edge_count <= legacy_max_edges:
+            before = _time_queries(lambda s, e: legacy_find_shortest_path(graph, s, e), pairs)
+            before_text = f"{before * 1000:12.1f}"
+        else:
+            before_text = f"{'-':>12}"
+        started = time.perf_counter()
+        frozen = graph.freeze()
+        freeze = time.perf_counter() - started
+        frozen_after = _time_queries(frozen.find_shortest_path, pairs)
+        print(f"{edge_count:>10} {len(names):>8} {before_text} {after * 1000:12.1f} {optimal * 1000:16.1f} "
+              f"{freeze * 1000:11.1f} {frozen_after * 1000:17.1f}")
+
+
+def legacy_draw_edges(G, pos):
+    """Прежняя отрисовка: отдельный вызов draw_networkx_edges (и коллекция) на каждое ребро."""
+    import networkx as nx
+
+    for u, v in G.edges():
+        if G.has_edge(v, u):
+            nx.draw_networkx_edges(G, pos, edgelist=[(u, v)], edge_color='gray', arrows=True,
+                                   arrowsize=20, connectionstyle='arc3,rad=0.2', width=1)
+            nx.draw_networkx_edges(G, pos, edgelist=[(v, u)], edge_color='gray', arrows=True,
+                                   arrowsize=20, connectionstyle='arc3,rad=-0.2', width=1)
+        else:
+            nx.draw_networkx_edges(G, pos, edgelist=[(u, v)], edge_color='gray', arrows=True,
+                                   arrowsize=20, width=1)
+
+
+def legacy_draw_edge_labels(G, pos):
+    """Прежние подписи: два отдельных вызова для стоимости и для времени доставки."""
+    import networkx as nx
+
+    for label_pos, key, suffix, color in ((0.8, 'cost', 'руб.', 'red'), (0.2, 'delivery_time', 'ч.', 'blue')):
+        labels = {(u, v): f"{data[key]} {suffix}" for u, v, data in G.edges(data=True)}
+        nx.draw_networkx_edge_labels(G, pos, edge_labels=labels, label_pos=label_pos, font_size=6,
+                                     font_color=color, bbox=dict(facecolor='white', edgecolor='none', alpha=0.5))
+
+
+def _time_render(draw, G, pos):
+    import matplotlib.pyplot as plt
+
+    started = time.perf_counter()
+    plt.figure(figsize=(16, 12), dpi=100)
+    draw(G, pos)
+    plt.axis('off')
+    plt.savefig(io.BytesIO(), format='png', bbox_inches='tight', dpi=100)
+    plt.close()
+    return time.perf_counter() - started
+
+
+def bench_render(sizes, seed):
+    import matplotlib
+    matplotlib.use('Agg')
+    import networkx as nx
+    from .layout import grid_force_layout
+    from .rendering import draw_edge_labels, draw_edges
+
+    print(f"{'рёбер':>8} {'рёбра до, с':>12} {'рёбра после, с':>15} {'подписи до, с':>14} {'подписи после, с':>17}")
+    for edge_count in sizes:
+        graph = build_logistics_graph(edge_count, seed)
+        G = nx.MultiDiGraph()
+        G.add_nodes_from(graph.nodes)
+        for edge in graph.edges:
+            G.add_edge(edge[0], edge[1], cost=edge[2], delivery_time=edge[3])
+        pos = grid_force_layout(list(graph.nodes), graph.edges, iterations=10, seed=seed)
+        timings = [_time_render(draw, G, pos)
+                   for draw in (legacy_draw_edges, draw_edges, legacy_draw_edge_labels, draw_edge_labels)]
+        print(f"{len(graph.edges):>8} {timings[0]:12.2f} {timings[1]:15.2f} {timings[2]:14.2f} {timings[3]:17.2f}")
+
+
+def write_graph_json(graph, file):
+    """Записывает граф в формате файла загрузки (как complex_logistics_network.json)."""
+    file.write('{"nodes": ' + json.dumps(graph.nodes, ensure_ascii=False) + ',\n "edges": [\n')
+    for i, edge in enumerate(graph.edges):
+        file.write((',\n' if i else '') + json.dumps(
+            {'from': edge[0], 'to': edge[1], 'cost': edge[2], 'delivery_time': edge[3]}, ensure_ascii=False))
+    file.write('\n]}\n')
+
+
+def legacy_load_graph(path):
+    """Прежняя загрузка: весь файл в память, json.loads и add_node/add_edge по одному."""
+    with open(path, 'rb') as file:
+        graph_data = json.loads(file.read().decode('utf-8'))
+    graph = Graph(directed=True, weighted=True)
+    for node_name, node_type in graph_data.get('nodes', {}).items():
+        graph.add_node(node_name, node_type)
+    for edge in graph_data.get('edges', []):
+        graph.add_edge(edge.get('from'), edge.get('to'), edge.get('cost', 0), edge.get('delivery_time', 0))
+    return graph
+
+
+def streaming_load_graph(path, chunk_size=1 << 16):
+    from .loader import load_graph_json
+
+    with open(path, 'rb') as file:
+        return load_graph_json(iter(lambda: file.read(chunk_size), b''))
+
+
+def _time_load(load, path):
+    """Время загрузки и пик памяти сверх самого графа (по tracemalloc, отдельным запуском)."""
+    started = time.perf_counter()
+    load(path)
+    elapsed = time.perf_counter() - started
+
+    tracemalloc.start()
+    graph = load(path)
+    graph_size, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del graph
+    return elapsed, (peak - graph_size) / 2 ** 20
+
+
+def bench_load(sizes, seed):
+    print(f"{'рёбер':>10} {'файл, МБ':>9} {'до, с':>8} {'после, с':>9} {'доп. память до, МБ':>19} {'после, МБ':>10}")
+    for edge_count in sizes:
+        graph = build_logistics_graph(edge_count, seed)
+        with tempfile.NamedTemporaryFile('w', suffix='.json', encoding='utf-8', delete=False) as file:
+            write_graph_json(graph, file)
+        try:
+            before, before_memory = _time_load(legacy_load_graph, file.name)
+            after, after_memory = _time_load(streaming_load_graph, file.name)
+            size = os.path.getsize(file.name) / 2 ** 20
+            print(f"{len(graph.edges):>10} {size:9.1f} {before:8.2f} {after:9.2f} "
+                  f"{before_memory:19.1f} {after_memory:10.1f}")
+        finally:
+            os.unlink(file.name)
+
+
+def legacy_edmonds_karp(graph, source, sink):
+    """Прежняя реализация: плотные словари V×V и обход в ширину по всем V вершинам."""
+    residual = {u: {v: 0 for v in graph.nodes} for u in graph.nodes}
+    for edge in graph.edges:
+        residual[edge[0]][edge[1]] = edge[2] if edge[2] is not None else 1
+    max_flow = 0
+    while True:
+        parent = {node: None for node in graph.nodes}
+        parent[source] = source
+        queue = [source]
+        while queue and parent[sink] is None:
+            current = queue.pop(0)
+            for neighbor, cap in residual[current].items():
+                if cap > 0 and parent[neighbor] is None:
+                    parent[neighbor] = current
+                    queue.append(neighbor)
+        if parent[sink] is None:
+            return max_flow
+        path_flow = float('inf')
+        node = sink
+        while node != source:
+            path_flow = min(path_flow, residual[parent[node]][node])
+            node = parent[node]
+        node = sink
+        while node != source:
+            residual[parent[node]][node] -= path_flow
+            residual[node][parent[node]] += path_flow
+            node = parent[node]
+        max_flow += path_flow
+
+
+def bench_flow(sizes, legacy_max_edges, seed):
+    print(f"{'рёбер':>10} {'вершин':>8} {'до, с':>8} {'edmonds_karp, с':>16} {'dinic, с':>9} "
+          f"{'push_relabel, с':>16} {'поток':>10}")
+    for edge_count in sizes:
+        graph = build_logistics_graph(edge_count, seed)
+        names = list(graph.nodes)
+        # Склад с наибольшим числом исходящих рёбер и клиент с наибольшим числом входящих
+        source = max((name for name in names if graph.nodes[name] == 'warehouse'),
+                     key=lambda name: len(graph.out_edges[name]))
+        sink = max((name for name in names if graph.nodes[name] == 'client'),
+                   key=lambda name: len(graph.in_edges[name]))
+        results = {}
+        times = {}
+        for method in ('edmonds_karp', 'dinic', 'push_relabel'):
+            started = time.perf_counter()
+            results[method] = graph.max_flow(source, sink, method)[0]
+            times[method] = time.perf_counter() - started
+        before_text = f"{'-':>8}"
+        if edge_count <= legacy_max_edges:
+            started = time.perf_counter()
+            results['legacy'] = legacy_edmonds_karp(graph, source, sink)
+            before_text = f"{time.perf_counter() - started:8.2f}"
+        if len(set(results.values())) != 1:
+            raise AssertionError(f"Методы дали разные потоки: {results}")
+        print(f"{edge_count:>10} {len(names):>8} {before_text} {times['edmonds_karp']:16.2f} "
+              f"{times['dinic']:9.2f} {times['push_relabel']:16.2f} {results['dinic']:>10}")
+
+
+def legacy_prim(graph):
+    """Прежний алгоритм Прима: для каждой новой вершины пересматриваются все рёбра дерева и весь список рёбер."""
+    start_node = next(iter(graph.nodes))
+    visited = {start_node}
+    mst_edges = []
+    total_weight = 0
+    while len(visited) < len(graph.nodes):
+        min_edge = None
+        min_weight = float('infinity')
+        for node in visited:
+            for neighbor in graph.get_neighbors(node):
+                if neighbor not in visited:
+                    for edge in graph.edges:
+                        if edge[0] == node and edge[1] == neighbor:
+                            weight = edge[2]
+                            if weight < min_weight:
+                                min_edge = (node, neighbor)
+                                min_weight = weight
+        if min_edge is None:
+            raise ValueError("Граф не связан.")
+        mst_edges.append((min_edge[0], min_edge[1], min_weight))
+        total_weight += min_weight
+        visited.add(min_edge[1])
+    return mst_edges, total_weight
+
+
+def bench_mst(cases, legacy_max_edges, seed):
+    print(f"{'вершин':>8} {'рёбер':>10} {'до, с':>8} {'prim, с':>8} {'kruskal, с':>11} {'auto':>8} "
+          f"{'деревьев':>9} {'стоимость':>12}")
+    for node_count, edge_count in cases:
+        graph = build_logistics_graph(edge_count, seed, directed=False, node_count=node_count)
+        results = {}
+        times = {}
+        for method in ('prim', 'kruskal'):
+            started = time.perf_counter()
+            results[method] = graph.minimum_spanning_forest(method)
+            times[method] = time.perf_counter() - started
+        totals = {method: total for method, (_, total) in results.items()}
+        before_text = f"{'-':>8}"
+        if edge_count <= legacy_max_edges and len(results['prim'][0]) == node_count - 1:
+            started = time.perf_counter()
+            totals['legacy'] = legacy_prim(graph)[1]
+            before_text = f"{time.perf_counter() - started:8.2f}"
+        if len(set(totals.values())) != 1:
+            raise AssertionError(f"Методы дали разные стоимости: {totals}")
+        degrees = sum(len(neighbors) for neighbors in graph.out_edges.values())
+        auto = 'prim' if degrees >= PRIM_MIN_DEGREE * node_count else 'kruskal'
+        trees = node_count - len(results['kruskal'][0])
+        print(f"{node_count:>8} {edge_count:>10} {before_text} {times['prim']:8.2f} {times['kruskal']:11.2f} "
+              f"{auto:>8} {trees:>9} {totals['kruskal']:>12}")
+
+
+def bench_flow_session(sizes, edits, seed):
+    print(f"{'рёбер':>10} {'правок':>7} {'заново, с/правка':>17} {'сессия, с/правка':>17} {'поток':>10}")
+    for edge_count in sizes:
+        graph = build_logistics_graph(edge_count, seed)
+        rng = random.Random(seed)
+        names = list(graph.nodes)
+        source = max((name for name in names if graph.nodes[name] == 'warehouse'),
+                     key=lambda name: len(graph.out_edges[name]))
+        sink = max((name for name in names if graph.nodes[name] == 'client'),
+                   key=lambda name: len(graph.in_edges[name]))
+        session = graph.flow_session(source, sink)
+        session_time = full_time = 0.0
+        for _ in range(edits):
+            # Половина правок уменьшает пропускную способность ребра, по которому идёт поток
+            flows = session.flows()
+            if flows and rng.random() < 0.5:
+                node1 = rng.choice(list(flows))
+                node2 = rng.choice(list(flows[node1]))
+            else:
+                node1, node2, _, _ = rng.choice(graph.edges)
+            started = time.perf_counter()
+            value = session.set_capacity(node1, node2, rng.randint(0, 5000))
+            session_time += time.perf_counter() - started
+            started = time.perf_counter()
+            expected = graph.edmonds_karp(source, sink)[0]
+            full_time += time.perf_counter() - started
+            if value != expected:
+                raise AssertionError(f"Сессия дала поток {value}, пересчёт заново - {expected}")
+        print(f"{edge_count:>10} {edits:>7} {full_time / edits:17.4f} {session_time / edits:17.4f} {value:>10}")
+
+
+def bench_min_cost_flow(sizes, ssp_max_edges, demand_share, seed):
+    print(f"{'рёбер':>10} {'вершин':>8} {'клиентов':>9} {'ssp, с':>8} {'cost_scaling, с':>16} "
+          f"{'доставлено':>11} {'стоимость':>12}")
+    for edge_count in sizes:
+        graph = build_logistics_graph(edge_count, seed)
+        rng = random.Random(seed)
+        for u, v, _, _ in graph.edges:
+            graph.capacities[(u, v)] = rng.randint(5, 50)
+        clients = [name for name, node_type in graph.nodes.items() if node_type == 'client']
+        demands = {name: rng.randint(1, 20)
+                   for name in rng.sample(clients, max(1, int(len(clients) * demand_share)))}
+        results = {}
+        times = {}
+        for method in ('successive_shortest_paths', 'cost_scaling'):
+            if method == 'successive_shortest_paths' and edge_count > ssp_max_edges:
+                continue
+            started = time.perf_counter()
+            results[method] = graph.min_cost_flow(demands, method=method)[:2]
+            times[method] = time.perf_counter() - started
+        if len(set(results.values())) != 1:
+            raise AssertionError(f"Методы дали разные планы: {results}")
+        ssp_text = f"{times['successive_shortest_paths']:8.2f}" if 'successive_shortest_paths' in times else f"{'-':>8}"
+        delivered, total_cost = results['cost_scaling']
+        print(f"{edge_count:>10} {len(graph.nodes):>8} {len(demands):>9} {ssp_text} "
+              f"{times['cost_scaling']:16.2f} {delivered:>11} {total_cost:>12}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Замеры производительности графа логистики")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    paths = subparsers.add_parser('paths', help="задержка find_shortest_path / find_optimal_path")
+    paths.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    paths.add_argument('--queries', type=int, default=20)
+    paths.add_argument('--legacy-max-edges', type=int, default=10_000,
+                       help="прежняя реализация O(V·E) запускается только на графах не больше этого размера")
+    paths.add_argument('--seed', type=int, default=42)
+
+    render = subparsers.add_parser('render', help="время отрисовки рёбер в зависимости от их числа")
+    render.add_argument('--sizes', type=int, nargs='+', default=[100, 300, 1000, 3000])
+    render.add_argument('--seed', type=int, default=42)
+
+    load = subparsers.add_parser('load', help="загрузка JSON-файла графа")
+    load.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    load.add_argument('--seed', type=int, default=42)
+
+    flow = subparsers.add_parser('flow', help="максимальный поток от склада до клиента")
+    flow.add_argument('--sizes', type=int, nargs='+', default=[2_000, 5_000, 100_000])
+    flow.add_argument('--legacy-max-edges', type=int, default=5_000,
+                      help="прежняя реализация на плотных словарях запускается только на графах не больше этого размера")
+    flow.add_argument('--seed', type=int, default=42)
+
+    mst = subparsers.add_parser('mst', help="минимальный остовный лес алгоритмами Прима и Краскала")
+    mst.add_argument('--cases', type=lambda text: tuple(map(int, text.split(':'))), nargs='+',
+                     default=[(300, 1_000), (100_000, 1_000_000), (3_000, 1_000_000)],
+                     help="пары вершин:рёбер")
+    mst.add_argument('--legacy-max-edges', type=int, default=1_000,
+                     help="прежний алгоритм Прима запускается только на графах не больше этого размера")
+    mst.add_argument('--seed', type=int, default=42)
+
+    session = subparsers.add_parser('session', help="пересчёт максимального потока после правки пропускной способности")
+    session.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000])
+    session.add_argument('--edits', type=int, default=20)
+    session.add_argument('--seed', type=int, default=42)
+
+    mincost = subparsers.add_parser('mincost', help="план поставок минимальной стоимости со складов клиентам")
+    mincost.add_argument('--sizes', type=int, nargs='+', default=[2_000, 10_000, 50_000])
+    mincost.add_argument('--ssp-max-edges', type=int, default=10_000,
+                         help="последовательные кратчайшие пути запускаются только на графах не больше этого размера")
+    mincost.add_argument('--demand-share', type=float, default=0.1,
+                         help="доля клиентов, которым нужна поставка")
+    mincost.add_argument('--seed', type=int, default=42)
+
+    args = parser.parse_args(argv)
+    if args.command == 'paths':
+        bench_paths(args.sizes, args.queries, args.legacy_max_edges, args.seed)
+    elif args.command == 'render':
+        bench_render(args.sizes, args.seed)
+    elif args.command == 'load':
+        bench_load(args.sizes, args.seed)
+    elif args.command == 'flow':
+        bench_flow(args.sizes, args.legacy_max_edges, args.seed)
+    elif args.command == 'mst':
+        bench_mst(args.cases, args.legacy_max_edges, args.seed)
+    elif args.command == 'session':
+        bench_flow_session(args.sizes, args.edits, args.seed)
+    elif args.command == 'mincost':
+        bench_min_cost_flow(args.sizes, args.ssp_max_edges, args.demand_share, args.seed)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+from collections import OrderedDict
+import threading
+
+
+class RenderCache:
+    """
+    LRU-кэш отрисованных изображений графа
+
+    Ключ - (graph_id, version, выделенный путь): любое изменение графа увеличивает версию,
+    поэтому устаревшие изображения никогда не отдаются и со временем вытесняются.
+    """
+
+    def __init__(self, max_size=32):
+        self.max_size = max_size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(graph, path=None):
+        return graph.graph_id, graph.version, tuple(path) if path else None
+
+    def get(self, key):
+        """Возвращает закэшированное значение или None, отмечая запись как недавно использованную."""
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        """Сохраняет значение, вытесняя давно не использованные записи сверх max_size."""
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self):
+        return len(self._items)
@@ -0,0 +1,375 @@
+"""
+Максимальный поток на разреженной остаточной сети.
+
+FlowNetwork хранит дуги в плоских списках: дуга a ведёт в heads[a], у неё осталось
+residual[a] пропускной способности из capacity[a]. Дуги добавляются парами, поэтому
+обратная к дуге a - это a ^ 1 (с нулевой пропускной способностью), а adjacency[вершина] -
+список исходящих из вершины дуг, включая обратные. Память - O(V + E) при любой плотности графа.
+
+У дуг есть ещё стоимость единицы потока cost[a] (у обратной дуги - со знаком минус);
+поток минимальной стоимости по ней ищет min_cost.py.
+
+Модуль общий с консольной программой (tg/graph.py), поэтому сообщений об ошибках
+в нём нет: метод проверяют вызывающие, каждый на своём языке.
+"""
+from collections import deque
+
+METHODS = ('dinic', 'push_relabel', 'edmonds_karp')
+
+
+class FlowNetwork:
+    """Остаточная сеть на вершинах 0..node_count-1."""
+
+    __slots__ = ('adjacency', 'heads', 'residual', 'capacity', 'cost')
+
+    def __init__(self, node_count):
+        self.adjacency = [[] for _ in range(node_count)]
+        self.heads = []
+        self.residual = []
+        self.capacity = []
+        self.cost = []
+
+    @classmethod
+    def from_csr(cls, offsets, targets, capacities):
+        """
+        Сеть по смежности в форме CSR: по дуге на каждое ребро с положительной пропускной способностью
+
+        :return: кортеж (сеть, arcs), где arcs[i] - дуга ребра i (None, если ребро пропущено)
+        """
+        network = cls(len(offsets) - 1)
+        arcs = [None] * len(targets)
+        for node in range(len(offsets) - 1):
+            for edge in range(offsets[node], offsets[node + 1]):
+                if capacities[edge] > 0:
+                    arcs[edge] = network.add_arc(node, targets[edge], capacities[edge])
+        return network, arcs
+
+    @property
+    def node_count(self):
+        return len(self.adjacency)
+
+    def add_arc(self, tail, head, capacity, cost=0):
+        """Добавляет дугу tail -> head вместе с обратной и возвращает номер прямой дуги."""
+        arc = len(self.heads)
+        self.heads += (head, tail)
+        self.residual += (capacity, 0)
+        self.capacity += (capacity, 0)
+        self.cost += (cost, -cost)
+        self.adjacency[tail].append(arc)
+        self.adjacency[head].append(arc + 1)
+        return arc
+
+    def tail(self, arc):
+        return self.heads[arc ^ 1]
+
+    def flow(self, arc):
+        return self.capacity[arc] - self.residual[arc]
+
+    def net_outflow(self, node):
+        """Сколько потока вытекает из вершины за вычетом втекающего."""
+        return sum(self.capacity[arc] - self.residual[arc] for arc in self.adjacency[node])
+
+    def total_cost(self):
+        """Стоимость текущего потока."""
+        return sum((self.capacity[arc] - self.residual[arc]) * self.cost[arc]
+                   for arc in range(0, len(self.heads), 2))
+
+    def flows(self, names):
+        """
+        Словарь {начало: {конец: поток}} с положительным суммарным потоком между парами вершин
+
+        Дуги вершин с номерами от len(names) (вспомогательных источника и стока) пропускаются.
+        """
+        totals = {}
+        for arc in range(0, len(self.heads), 2):
+            amount = self.capacity[arc] - self.residual[arc]
+            if amount and self.heads[arc] < len(names) and self.heads[arc + 1] < len(names):
+                key = (self.heads[arc + 1], self.heads[arc])
+                totals[key] = totals.get(key, 0) + amount
+        result = {}
+        for (tail, head), amount in totals.items():
+            amount -= totals.get((head, tail), 0)
+            if amount > 0:
+                result.setdefault(names[tail], {})[names[head]] = amount
+        return result
+
+
+def max_flow(network, source, sink, method='dinic'):
+    """
+    Пропускает по сети максимальный поток из source в sink
+
+    Остаточные пропускные способности меняются на месте, поэтому поток можно потом увеличить.
+    Из вершины в неё саму поток не идёт (величина 0).
+
+    :param method: 'dinic', 'push_relabel' (проталкивание предпотока) или 'edmonds_karp';
+        вызывающий заранее проверяет, что метод есть в METHODS
+    :return: величина потока
+    """
+    if source == sink:
+        return 0
+    if method == 'dinic':
+        return dinic(network, source, sink)
+    if method == 'push_relabel':
+        return push_relabel(network, source, sink)
+    return edmonds_karp(network, source, sink)
+
+
+def edmonds_karp(network, source, sink):
+    """Алгоритм Эдмондса - Карпа: кратчайшие увеличивающие пути, найденные обходом в ширину."""
+    return push_flow(network, source, sink)
+
+
+def push_flow(network, start, end, limit=None):
+    """
+    Проталкивает поток из start в end по кратчайшим остаточным путям (как в алгоритме
+    Эдмондса - Карпа), но не больше limit единиц (None - сколько пройдёт)
+
+    :return: сколько единиц потока удалось протолкнуть
+    """
+    adjacency, heads, residual = network.adjacency, network.heads, network.residual
+    total = 0
+    while limit is None or total < limit:
+        # Обход в ширину; parent_arc[вершина] - дуга, по которой в неё пришли
+        parent_arc = {start: None}
+        queue = deque([start])
+        while queue and end not in parent_arc:
+            node = queue.popleft()
+            for arc in adjacency[node]:
+                head = heads[arc]
+                if residual[arc] > 0 and head not in parent_arc:
+                    parent_arc[head] = arc
+                    queue.append(head)
+        if end not in parent_arc:
+            break
+
+        path = []
+        node = end
+        while node != start:
+            arc = parent_arc[node]
+            path.append(arc)
+            node = heads[arc ^ 1]
+        amount = min(residual[arc] for arc in path)
+        if limit is not None:
+            amount = min(amount, limit - total)
+        for arc in path:
+            residual[arc] -= amount
+            residual[arc ^ 1] += amount
+        total += amount
+    return total
+
+
+def set_capacity(network, arc, capacity, source, sink, method='edmonds_karp'):
+    """
+    Меняет пропускную способность дуги и восстанавливает максимальный поток из source в sink,
+    не пересчитывая его заново
+
+    Если поток по дуге больше новой пропускной способности, лишнее снимается с дуги: в её
+    начале остаётся избыток, в конце - недостача. Избыток сначала перенаправляется в обход
+    дуги, а что не удалось перенаправить, уходит в sink или возвращается в source; недостачу
+    так же покрывает source или sink. После этого (и при увеличении пропускной способности)
+    поток дополняется новыми увеличивающими путями.
+
+    :param method: алгоритм дополнения потока, как в max_flow
+    """
+    heads, residual = network.heads, network.residual
+    residual[arc] += capacity - network.capacity[arc]
+    network.capacity[arc] = capacity
+    if residual[arc] < 0:
+        excess = -residual[arc]
+        residual[arc] = 0
+        residual[arc ^ 1] -= excess
+        tail, head = heads[arc ^ 1], heads[arc]
+        terminals = (source, sink)
+        if tail not in terminals and head not in terminals:
+            excess -= push_flow(network, tail, head, excess)
+        if excess:
+            if tail not in terminals:
+                pushed = push_flow(network, tail, sink, excess)
+                push_flow(network, tail, source, excess - pushed)
+            if head not in terminals:
+                pulled = push_flow(network, source, head, excess)
+                push_flow(network, sink, head, excess - pulled)
+    max_flow(network, source, sink, method)
+
+
+def _levels(network, source, sink):
+    """Расстояния от source по дугам с остаточной способностью или None, если sink недостижим."""
+    adjacency, heads, residual = network.adjacency, network.heads, network.residual
+    level = [-1] * network.node_count
+    level[source] = 0
+    queue = deque([source])
+    while queue:
+        node = queue.popleft()
+        next_level = level[node] + 1
+        for arc in adjacency[node]:
+            head = heads[arc]
+            if level[head] < 0 and residual[arc] > 0:
+                level[head] = next_level
+                queue.append(head)
+    return level if level[sink] >= 0 else None
+
+
+def dinic(network, source, sink):
+    """Алгоритм Диница: блокирующие потоки в слоистой сети."""
+    adjacency, heads, residual = network.adjacency, network.heads, network.residual
+    total = 0
+    while True:
+        level = _levels(network, source, sink)
+        if level is None:
+            return total
+
+        # Блокирующий поток: идём вперёд по текущей дуге каждой вершины, при достижении sink
+        # увеличиваем поток, из тупиков отступаем
+        current = [0] * network.node_count
+        path = []
+        node = source
+        while True:
+            if node == sink:
+                amount = min(residual[arc] for arc in path)
+                saturated = None
+                for position, arc in enumerate(path):
+                    residual[arc] -= amount
+                    residual[arc ^ 1] += amount
+                    if saturated is None and not residual[arc]:
+                        saturated = position
+                total += amount
+                # Продолжаем с начала первой насыщенной дуги
+                del path[saturated:]
+                node = heads[path[-1]] if path else source
+                continue
+
+            arcs = adjacency[node]
+            position = current[node]
+            next_level = level[node] + 1
+            while position < len(arcs):
+                arc = arcs[position]
+                if residual[arc] > 0 and level[heads[arc]] == next_level:
+                    break
+                position += 1
+            current[node] = position
+            if position < len(arcs):
+                path.append(arcs[position])
+                node = heads[arcs[position]]
+            elif node == source:
+                break
+            else:
+                # Тупик: в этой фазе через вершину больше ничего не пройдёт
+                level[node] = -1
+                arc = path.pop()
+                node = heads[arc ^ 1]
+                current[node] += 1
+
+
+def push_relabel(network, source, sink):
+    """
+    Проталкивание предпотока с выбором вершины с наибольшей высотой, эвристикой разрыва
+    и периодическим глобальным пересчётом высот
+
+    Высоты меньше n - расстояния до sink; вершины, отрезанные от sink, получают высоты от n
+    и возвращают избыток в source, так что в итоге получается поток, а не предпоток.
+    """
+    adjacency, heads, residual = network.adjacency, network.heads, network.residual
+    n = network.node_count
+    height = [0] * n
+    excess = [0] * n
+    current = [0] * n
+    buckets = [[] for _ in range(2 * n + 1)]
+    counts = [0] * (2 * n + 1)
+    active = [False] * n
+
+    def global_relabel():
+        # Точные высоты: расстояние до sink или n + расстояние до source
+        for node in range(n):
+            height[node] = 2 * n
+        height[sink] = 0
+        height[source] = n
+        for root in (sink, source):
+            queue = deque([root])
+            while queue:
+                node = queue.popleft()
+                label = height[node] + 1
+                for arc in adjacency[node]:
+                    tail = heads[arc]
+                    if height[tail] == 2 * n and residual[arc ^ 1] > 0:
+                        height[tail] = label
+                        queue.append(tail)
+        for bucket in buckets:
+            bucket.clear()
+        for label in range(len(counts)):
+            counts[label] = 0
+        highest = 0
+        for node in range(n):
+            counts[height[node]] += 1
+            current[node] = 0
+            if active[node]:
+                buckets[height[node]].append(node)
+                highest = max(highest, height[node])
+        return highest
+
+    for arc in adjacency[source]:
+        amount = residual[arc]
+        if amount > 0:
+            head = heads[arc]
+            residual[arc] = 0
+            residual[arc ^ 1] += amount
+            excess[head] += amount
+            excess[source] -= amount
+            if head != sink:
+                active[head] = True
+    highest = global_relabel()
+    relabels = 0
+
+    while highest >= 0:
+        bucket = buckets[highest]
+        if not bucket:
+            highest -= 1
+            continue
+        node = bucket.pop()
+        if height[node] != highest:
+            # Поднята эвристикой разрыва, пока ждала в очереди
+            buckets[height[node]].append(node)
+            highest = max(highest, height[node])
+            continue
+
+        # Разгрузка вершины
+        arcs = adjacency[node]
+        while excess[node] > 0:
+            position = current[node]
+            if position == len(arcs):
+                # Подъём
+                relabels += 1
+                old = height[node]
+                label = min((height[heads[arc]] for arc in arcs if residual[arc] > 0), default=2 * n - 1) + 1
+                label = min(label, 2 * n)
+                counts[old] -= 1
+                height[node] = label
+                counts[label] += 1
+                current[node] = 0
+                if not counts[old] and old < n:
+                    # Разрыв: вершины выше него больше не могут дойти до sink
+                    for other in range(n):
+                        if old < height[other] < n:
+                            counts[height[other]] -= 1
+                            height[other] = n + 1
+                            counts[n + 1] += 1
+                continue
+            arc = arcs[position]
+            head = heads[arc]
+            if residual[arc] > 0 and height[node] == height[head] + 1:
+                amount = min(excess[node], residual[arc])
+                residual[arc] -= amount
+                residual[arc ^ 1] += amount
+                excess[node] -= amount
+                excess[head] += amount
+                if not active[head] and head != source and head != sink:
+                    active[head] = True
+                    buckets[height[head]].append(head)
+                    highest = max(highest, height[head])
+            else:
+                current[node] = position + 1
+        active[node] = False
+
+        if relabels >= n:
+            relabels = 0
+            highest = global_relabel()
+    return excess[sink]
@@ -1,6 +1,15 @@
 from collections import deque
+from collections.abc import Mapping
+from array import array
 import heapq
+import io
 import math
+import os
+import uuid
+import weakref
+
+from . import flow, min_cost, snapshot, spanning_forest, traversal
+
 
 class Node:
     def __init__(self, value):
@@ -19,9 +28,239 @@ class Node:
 class Graph:
     def __init__(self, directed=True, weighted=True):
         self.nodes = {}  # Изменяем на словарь, где ключ - имя вершины, значение - тип (склад/клиент)
-        self.edges = []  # список рёбер (from_vertex, to_vertex, weight)
+        # Индексы смежности: вершина -> {сосед: (стоимость, время доставки)}
+        self.out_edges = {}
+        self.in_edges = {}
         self.directed = directed
         self.weighted = weighted
+        # Идентификатор графа и счётчик версий: версия растёт при каждом изменении,
+        # пара (graph_id, version) однозначно определяет состояние графа для кэшей
+        self.graph_id = uuid.uuid4().hex
+        self.version = 0
+        self._edges_cache = None
+        # Раскладка для визуализации: вершина -> (x, y) и вершины, которые нужно
+        # заново уравновесить после изменений (см. layout.update_layout)
+        self.positions = {}
+        self.layout_dirty = set()
+        # Пропускные способности рёбер (начало, конец) -> сколько единиц товара можно перевезти;
+        # у рёбер, которых здесь нет, пропускная способность не ограничена
+        self.capacities = {}
+        # Кэш freeze(): неизменяемая копия графа для текущей версии
+        self._frozen = None
+        # Журнал изменений: если это список, каждое изменение графа дописывается в него как
+        # (имя метода, аргументы...), и его можно повторить через apply_change (см. store.GraphStore)
+        self.changes = None
+
+    def _record(self, method, *args):
+        """Дописывает изменение в журнал, если журнал ведётся."""
+        if self.changes is not None:
+            self.changes.append((method, *args))
+
+    def apply_change(self, change):
+        """
+        Повторяет изменение из журнала (см. changes)
+
+        :param change: последовательность (имя метода, аргументы...)
+        """
+        method, *args = change
+        if method not in ('add_node', 'remove_node', 'add_edge', 'remove_edge', 'set_capacity'):
+            raise ValueError(f"Неизвестное изменение графа: {method}")
+        getattr(self, method)(*args)
+
+    def _mark_changed(self, *affected_nodes):
+        """Увеличивает версию графа, сбрасывает кэш списка рёбер и отмечает затронутые вершины для раскладки."""
+        self.version += 1
+        self._edges_cache = None
+        self.layout_dirty.update(affected_nodes)
+
+    def to_dict(self):
+        """
+        Полное состояние графа в виде JSON-совместимого словаря (для хранилища графов)
+
+        В отличие от файла загрузки сохраняются также graph_id, версия и раскладка,
+        поэтому граф, восстановленный через from_dict, попадает в те же кэши.
+        """
+        return {
+            'graph_id': self.graph_id,
+            'version': self.version,
+            'directed': self.directed,
+            'weighted': self.weighted,
+            'nodes': self.nodes,
+            'edges': [list(edge) for edge in self.edges],
+            'capacities': [[node1, node2, capacity] for (node1, node2), capacity in self.capacities.items()],
+            'positions': {node: list(xy) for node, xy in self.positions.items()},
+            'layout_dirty': list(self.layout_dirty),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Восстанавливает граф, сохранённый методом to_dict."""
+        graph = cls(directed=data['directed'], weighted=data['weighted'])
+        graph.graph_id = data['graph_id']
+        graph.version = data['version']
+        graph.nodes = dict(data['nodes'])
+        graph.out_edges = {node: {} for node in graph.nodes}
+        graph.in_edges = {node: {} for node in graph.nodes}
+        # Список рёбер уже содержит оба направления неориентированных рёбер
+        for node1, node2, cost, delivery_time in data['edges']:
+            graph.out_edges[node1][node2] = (cost, delivery_time)
+            graph.in_edges[node2][node1] = (cost, delivery_time)
+        graph.capacities = {(node1, node2): capacity for node1, node2, capacity in data.get('capacities', ())}
+        graph.positions = {node: tuple(xy) for node, xy in data.get('positions', {}).items()}
+        graph.layout_dirty = set(data.get('layout_dirty', ()))
+        return graph
+
+    @classmethod
+    def from_iterables(cls, nodes, edges, directed=True, weighted=True):
+        """
+        Строит граф за один проход по вершинам и рёбрам с той же проверкой, что add_node и add_edge
+
+        :param nodes: пары (вершина, тип)
+        :param edges: четвёрки (начальная вершина, конечная вершина, стоимость, время доставки)
+            или пятёрки с пропускной способностью в конце (None - без ограничения)
+        :return: новый граф
+        """
+        graph = cls(directed=directed, weighted=weighted)
+        graph_nodes, out_edges, in_edges = graph.nodes, graph.out_edges, graph.in_edges
+        capacities = graph.capacities
+        for node, node_type in nodes:
+            if node in graph_nodes:
+                raise ValueError(f"Вершина {node} уже существует в графе")
+            if node_type not in ('warehouse', 'client'):
+                raise ValueError(f"Вершина {node}: тип вершины должен быть 'warehouse' или 'client'")
+            graph_nodes[node] = node_type
+            out_edges[node] = {}
+            in_edges[node] = {}
+
+        for number, (node1, node2, cost, delivery_time, *capacity) in enumerate(edges, 1):
+            if node1 not in graph_nodes or node2 not in graph_nodes:
+                raise ValueError(f"Ребро {number} ({node1} -> {node2}): обе вершины должны существовать в графе")
+            if not isinstance(cost, (int, float)) or not isinstance(delivery_time, (int, float)):
+                raise ValueError(f"Ребро {number} ({node1} -> {node2}): стоимость и время доставки должны быть числами")
+            if cost < 0 or delivery_time < 0:
+                raise ValueError(
+                    f"Ребро {number} ({node1} -> {node2}): стоимость и время доставки не могут быть отрицательными")
+            weights = (cost, delivery_time)
+            out_edges[node1][node2] = weights
+            in_edges[node2][node1] = weights
+            if not directed and node1 != node2:
+                out_edges[node2][node1] = weights
+                in_edges[node1][node2] = weights
+            if capacity and capacity[0] is not None:
+                _check_capacity(capacity[0], f"Ребро {number} ({node1} -> {node2}): ")
+                capacities[node1, node2] = capacity[0]
+                if not directed:
+                    capacities[node2, node1] = capacity[0]
+
+        graph.version = 1
+        return graph
+
+    def save_snapshot(self, file):
+        """
+        Записывает граф в двоичный снимок (формат описан в snapshot.py)
+
+        :param file: путь к файлу или двоичный файловый объект
+        """
+        if not hasattr(file, 'write'):
+            with open(file, 'wb') as output:
+                return self.save_snapshot(output)
+
+        index = {node: i for i, node in enumerate(self.nodes)}
+        row_offsets = [0]
+        targets = []
+        costs = []
+        delivery_times = []
+        for node in self.nodes:
+            neighbors = self.out_edges[node]
+            targets.extend(map(index.__getitem__, neighbors))
+            for cost, delivery_time in neighbors.values():
+                costs.append(cost)
+                delivery_times.append(delivery_time)
+            row_offsets.append(len(targets))
+
+        node_types = [1 if node_type == 'warehouse' else 0 for node_type in self.nodes.values()]
+        columns = [(snapshot.column_kind(costs), costs), (snapshot.column_kind(delivery_times), delivery_times)]
+        if self.capacities:
+            # Третий столбец - пропускные способности, -1 - без ограничения
+            capacities = [self.capacities.get((node, neighbor), -1)
+                          for node in self.nodes for neighbor in self.out_edges[node]]
+            columns.append((snapshot.column_kind(capacities), capacities))
+        snapshot.write_snapshot(file, list(self.nodes), row_offsets, targets, columns, node_types,
+                                directed=self.directed, weighted=self.weighted)
+
+    @classmethod
+    def load_snapshot(cls, source):
+        """
+        Восстанавливает граф из двоичного снимка
+
+        :param source: путь к файлу (отображается в память) или байты снимка
+        :return: новый граф
+        """
+        with snapshot.read_snapshot(source) as snap:
+            if snap.node_types is None or len(snap.columns) not in (2, 3):
+                raise ValueError("Снимок не содержит типов вершин и стоимости/времени доставки рёбер")
+            names = snap.names
+            node_types = ['warehouse' if node_type else 'client' for node_type in snap.node_types.tolist()]
+            offsets = snap.row_offsets.tolist()
+            targets = snap.targets.tolist()
+            costs, delivery_times = snap.columns[0].tolist(), snap.columns[1].tolist()
+            capacities = snap.columns[2].tolist() if len(snap.columns) == 3 else None
+
+        # Снимок мог прийти от пользователя, поэтому столбцы проверяются до построения смежности
+        _check_snapshot_columns(len(names), offsets, targets, costs, delivery_times, capacities)
+        weights = list(zip(costs, delivery_times))
+        graph = cls(directed=snap.directed, weighted=snap.weighted)
+        graph.nodes = dict(zip(names, node_types))
+        if len(graph.nodes) != len(names):
+            raise ValueError("Снимок графа повреждён: имена вершин повторяются")
+        graph.in_edges = {node: {} for node in names}
+        for i, node in enumerate(names):
+            start, end = offsets[i], offsets[i + 1]
+            neighbors = graph.out_edges[node] = dict(zip(map(names.__getitem__, targets[start:end]),
+                                                         weights[start:end]))
+            if len(neighbors) != end - start:
+                raise ValueError(f"Снимок графа повреждён: у вершины {node} повторяются рёбра")
+            for neighbor, edge_weights in neighbors.items():
+                graph.in_edges[neighbor][node] = edge_weights
+        if not graph.directed:
+            # Неориентированное ребро хранится в обоих направлениях с одинаковыми весами
+            for node, neighbors in graph.out_edges.items():
+                for neighbor, edge_weights in neighbors.items():
+                    if graph.out_edges[neighbor].get(node) != edge_weights:
+                        raise ValueError(
+                            f"Снимок графа повреждён: ребро {node} - {neighbor} записано только в одном направлении")
+        if capacities is not None:
+            graph.capacities = _read_capacities(names, offsets, targets, capacities)
+        graph.version = 1
+        return graph
+
+    def freeze(self):
+        """
+        Неизменяемая CSR-копия графа для запросов только на чтение (см. FrozenGraph)
+
+        Копия кэшируется и пересобирается, только если после её создания граф изменился.
+        """
+        frozen = self._frozen
+        if frozen is None or frozen.closed or frozen.version != self.version:
+            buffer = io.BytesIO()
+            self.save_snapshot(buffer)
+            self._frozen = FrozenGraph(buffer.getvalue(), graph_id=self.graph_id, version=self.version)
+        return self._frozen
+
+    def _successors(self, node):
+        """Пары (сосед, (стоимость, время доставки)) исходящих рёбер вершины."""
+        return self.out_edges[node].items()
+
+    @property
+    def edges(self):
+        """Список рёбер (from_vertex, to_vertex, cost, delivery_time), построенный по индексу смежности."""
+        if self._edges_cache is None:
+            self._edges_cache = [
+                (node1, node2, cost, delivery_time)
+                for node1, neighbors in self.out_edges.items()
+                for node2, (cost, delivery_time) in neighbors.items()
+            ]
+        return self._edges_cache
 
     def add_node(self, node, node_type):
         """Добавляет вершину в граф с указанным типом (склад/клиент)."""
@@ -30,17 +269,35 @@ class Graph:
         if node_type not in ['warehouse', 'client']:
             raise ValueError("Тип вершины должен быть 'warehouse' или 'client'")
         self.nodes[node] = node_type
+        self.out_edges[node] = {}
+        self.in_edges[node] = {}
+        self._record('add_node', node, node_type)
+        self._mark_changed(node)
 
     def remove_node(self, node):
         """Удаляет вершину и все связанные с ней рёбра."""
         if node not in self.nodes:
             raise ValueError(f"Вершина {node} не существует в графе")
-        
-        # Удаляем все рёбра, связанные с этой вершиной
-        self.edges = [edge for edge in self.edges if edge[0] != node and edge[1] != node]
+
+        # Удаляем все рёбра, связанные с этой вершиной, за O(deg)
+        adjacent = set()
+        for neighbor in self.out_edges.pop(node):
+            self.capacities.pop((node, neighbor), None)
+            if neighbor != node:
+                del self.in_edges[neighbor][node]
+                adjacent.add(neighbor)
+        for predecessor in self.in_edges.pop(node):
+            self.capacities.pop((predecessor, node), None)
+            if predecessor != node:
+                del self.out_edges[predecessor][node]
+                adjacent.add(predecessor)
         del self.nodes[node]
+        self.positions.pop(node, None)
+        self.layout_dirty.discard(node)
+        self._record('remove_node', node)
+        self._mark_changed(*adjacent)
 
-    def add_edge(self, node1, node2, cost=0, delivery_time=0):
+    def add_edge(self, node1, node2, cost=0, delivery_time=0, capacity=None):
         """
         Добавляет ребро между двумя вершинами с указанием стоимости и времени доставки
         
@@ -48,6 +305,7 @@ class Graph:
         :param node2: Конечная вершина
         :param cost: Стоимость доставки в рублях
         :param delivery_time: Время доставки в часах
+        :param capacity: Пропускная способность (None - без ограничения)
         """
         if node1 not in self.nodes or node2 not in self.nodes:
             raise ValueError("Обе вершины должны существовать в графе перед добавлением ребра")
@@ -57,26 +315,22 @@ class Graph:
         
         if cost < 0 or delivery_time < 0:
             raise ValueError("Стоимость и время доставки не могут быть отрицательными")
+        if capacity is not None:
+            _check_capacity(capacity)
         
-        # Проверяем, существует ли уже такое ребро
-        for edge in self.edges:
-            if edge[0] == node1 and edge[1] == node2:
-                # Если ребро существует, обновляем его параметры
-                self.edges.remove(edge)
-                break
-        
-        # Добавляем новое ребро
-        self.edges.append((node1, node2, cost, delivery_time))
+        # Если ребро уже существует, его параметры просто перезаписываются
+        self.out_edges[node1][node2] = (cost, delivery_time)
+        self.in_edges[node2][node1] = (cost, delivery_time)
+        self._set_capacity(node1, node2, capacity)
         
         # Для неориентированного графа добавляем обратное ребро
         if not self.directed and node1 != node2:
-            # Проверяем существование обратного ребра
-            for edge in self.edges:
-                if edge[0] == node2 and edge[1] == node1:
-                    self.edges.remove(edge)
-                    break
-            
-            self.edges.append((node2, node1, cost, delivery_time))
+            self.out_edges[node2][node1] = (cost, delivery_time)
+            self.in_edges[node1][node2] = (cost, delivery_time)
+            self._set_capacity(node2, node1, capacity)
+
+        self._record('add_edge', node1, node2, cost, delivery_time, capacity)
+        self._mark_changed(node1, node2)
 
     def remove_edge(self, from_vertex, to_vertex):
         """Удаляет ребро из графа."""
@@ -85,26 +339,59 @@ class Graph:
         if to_vertex not in self.nodes:
             raise ValueError(f"Конечная вершина {to_vertex} не существует в графе")
 
-        # Ищем ребро для удаления
-        initial_length = len(self.edges)
-        self.edges = [edge for edge in self.edges if not (edge[0] == from_vertex and edge[1] == to_vertex)]
-        
+        removed = self._discard_edge(from_vertex, to_vertex)
         if not self.directed:
             # Для неориентированного графа удаляем также обратное ребро
-            self.edges = [edge for edge in self.edges if not (edge[0] == to_vertex and edge[1] == from_vertex)]
+            removed = self._discard_edge(to_vertex, from_vertex) or removed
+
+        if not removed:
+            raise ValueError(f"Ребро от {from_vertex} к {to_vertex} не существует в графе")
+        self._record('remove_edge', from_vertex, to_vertex)
+        self._mark_changed(from_vertex, to_vertex)
+
+    def set_capacity(self, from_vertex, to_vertex, capacity):
+        """
+        Меняет пропускную способность ребра
 
-        if len(self.edges) == initial_length:
+        :param capacity: новая пропускная способность (None - без ограничения)
+        """
+        if not self.has_edge(from_vertex, to_vertex):
             raise ValueError(f"Ребро от {from_vertex} к {to_vertex} не существует в графе")
+        if capacity is not None:
+            _check_capacity(capacity)
+        self._set_capacity(from_vertex, to_vertex, capacity)
+        if not self.directed:
+            self._set_capacity(to_vertex, from_vertex, capacity)
+        self._record('set_capacity', from_vertex, to_vertex, capacity)
+        self._mark_changed(from_vertex, to_vertex)
+
+    def _discard_edge(self, from_vertex, to_vertex):
+        """Удаляет ребро из обоих индексов, если оно есть. Возвращает True, если ребро было удалено."""
+        if self.out_edges[from_vertex].pop(to_vertex, None) is None:
+            return False
+        del self.in_edges[to_vertex][from_vertex]
+        self.capacities.pop((from_vertex, to_vertex), None)
+        return True
+
+    def _set_capacity(self, from_vertex, to_vertex, capacity):
+        if capacity is None:
+            self.capacities.pop((from_vertex, to_vertex), None)
+        else:
+            self.capacities[from_vertex, to_vertex] = capacity
+
+    def has_edge(self, from_vertex, to_vertex):
+        """Проверяет наличие ребра за O(1)."""
+        return from_vertex in self.out_edges and to_vertex in self.out_edges[from_vertex]
+
+    def get_edge(self, from_vertex, to_vertex):
+        """Возвращает пару (стоимость, время доставки) ребра или None, если ребра нет."""
+        return self.out_edges.get(from_vertex, {}).get(to_vertex)
 
     def get_neighbors(self, value):
         """Возвращает список соседей вершины."""
         if value not in self.nodes:
             raise ValueError(f"Вершина {value} не существует в графе")
-        neighbors = []
-        for edge in self.edges:
-            if edge[0] == value:
-                neighbors.append(edge[1])
-        return sorted(neighbors)
+        return sorted(self.out_edges[value])
 
     def get_nodes(self):
         """Возвращает отсортированный список всех вершин."""
@@ -119,20 +406,19 @@ class Graph:
         return sorted(edges)
 
     def dfs(self, start_value, visited=None):
+        """
+        Вершины в порядке обхода в глубину из start_value (соседи - по возрастанию)
+
+        :param visited: уже пройденные вершины, в которые обход не заходит; пополняется
+        """
         if start_value not in self.nodes:
             raise ValueError(f"Стартовая вершина {start_value} не существует")
 
-        if visited is None:
-            visited = set()
+        return [node for event, node, _ in traversal.depth_first(start_value, self._sorted_neighbors, visited)
+                if event == traversal.ENTER]
 
-        visited.add(start_value)
-        result = [start_value]
-
-        for neighbor in sorted(self.get_neighbors(start_value)):
-            if neighbor not in visited:
-                result.extend(self.dfs(neighbor, visited))
-
-        return result
+    def _sorted_neighbors(self, node):
+        return sorted(self.out_edges[node])
 
     def bfs(self, start_value):
         if start_value not in self.nodes:
@@ -153,66 +439,88 @@ class Graph:
 
         return result
 
-    def dijkstra(self, start_value):
+    def dijkstra(self, start_value, target=None, weight_type='cost'):
+        """
+        Алгоритм Дейкстры на двоичной куче с ленивым удалением устаревших записей
+
+        :param start_value: начальная вершина
+        :param target: вершина, при извлечении которой поиск останавливается (None - все вершины)
+        :param weight_type: тип веса ('cost' или 'delivery_time')
+        :return: кортеж (расстояния, предшественники на кратчайших путях)
+        """
         if not self.weighted:
             raise ValueError("Алгоритм Дейкстры требует взвешенный граф")
         if start_value not in self.nodes:
             raise ValueError(f"Стартовая вершина {start_value} не существует")
+        if target is not None and target not in self.nodes:
+            raise ValueError(f"Конечная вершина {target} не существует")
 
+        weight_index = 0 if weight_type == 'cost' else 1
         distances = {node: float('infinity') for node in self.nodes}
         distances[start_value] = 0
-        unvisited = set(self.nodes)
+        previous_nodes = {node: None for node in self.nodes}
+        pq = [(0, start_value)]
 
-        while unvisited:
-            current = min(unvisited, key=lambda x: distances[x])
-            if distances[current] == float('infinity'):
+        while pq:
+            current_distance, current = heapq.heappop(pq)
+            # Устаревшая запись: вершина уже извлечена с меньшим расстоянием
+            if current_distance > distances[current]:
+                continue
+            if current == target:
                 break
 
-            for neighbor in self.get_neighbors(current):
-                for edge in self.edges:
-                    if edge[0] == current and edge[1] == neighbor:
-                        weight = edge[2]
-                        distance = distances[current] + weight
-                        if distance < distances[neighbor]:
-                            distances[neighbor] = distance
-
-            unvisited.remove(current)
-
-        return distances
+            for neighbor, weights in self._successors(current):
+                distance = current_distance + weights[weight_index]
+                if distance < distances[neighbor]:
+                    distances[neighbor] = distance
+                    previous_nodes[neighbor] = current
+                    heapq.heappush(pq, (distance, neighbor))
 
-    def find_path(self, start_value, end_value):
-        if start_value not in self.nodes or end_value not in self.nodes:
-            raise ValueError("Стартовая или конечная вершина не существует")
+        return distances, previous_nodes
 
-        visited = set()
-        path = []
+    def nearest_warehouses(self, weight_type='cost'):
+        """
+        Ближайший склад для каждой вершины: Дейкстра сразу из всех складов
 
-        def dfs_path(current_value):
-            if current_value == end_value:
-                return True
+        :param weight_type: тип веса ('cost' или 'delivery_time')
+        :return: словарь {вершина: склад}; недостижимые от складов вершины в него не попадают
+        """
+        weight_index = 0 if weight_type == 'cost' else 1
+        distances = {}
+        owner = {}
+        pq = [(0, node, node) for node, node_type in self.nodes.items() if node_type == 'warehouse']
+        heapq.heapify(pq)
 
-            visited.add(current_value)
-            path.append(current_value)
+        while pq:
+            current_distance, current, warehouse = heapq.heappop(pq)
+            if current in owner:
+                continue
+            owner[current] = warehouse
+            for neighbor, weights in self._successors(current):
+                distance = current_distance + (weights[weight_index] if self.weighted else 1)
+                if neighbor not in owner and distance < distances.get(neighbor, float('infinity')):
+                    distances[neighbor] = distance
+                    heapq.heappush(pq, (distance, neighbor, warehouse))
 
-            for neighbor in sorted(self.get_neighbors(current_value)):
-                if neighbor not in visited:
-                    if dfs_path(neighbor):
-                        return True
+        return owner
 
-            path.pop()
-            return False
+    def find_path(self, start_value, end_value):
+        if start_value not in self.nodes or end_value not in self.nodes:
+            raise ValueError("Стартовая или конечная вершина не существует")
 
-        if dfs_path(start_value):
-            path.append(end_value)
-            return path
+        # Первый путь, найденный обходом в глубину; обход останавливается, как только он найден
+        for event, node, path in traversal.depth_first(start_value, self._sorted_neighbors):
+            if event == traversal.ENTER and node == end_value:
+                return list(path)
         return None
 
     def get_non_adjacent_nodes(self, node_value):
         if node_value not in self.nodes:
             raise ValueError(f"Вершина {node_value} не существует")
+        neighbors = self.out_edges[node_value]
         non_adjacent_nodes = []
         for node in self.nodes:
-            if node_value != node and node not in self.get_neighbors(node_value):
+            if node_value != node and node not in neighbors:
                 non_adjacent_nodes.append(node)
 
         return sorted(non_adjacent_nodes)
@@ -223,176 +531,163 @@ class Graph:
 
         start_node = next(iter(self.nodes))
         visited = set()
-
-        def dfs_connected(node_value):
-            visited.add(node_value)
-            for neighbor in self.get_neighbors(node_value):
-                if neighbor not in visited:
-                    dfs_connected(neighbor)
-
-        dfs_connected(start_node)
+        for _ in traversal.depth_first(start_node, self.out_edges.__getitem__, visited):
+            pass
         return len(visited) == len(self.nodes)
 
     def find_cycles(self):
+        """
+        Циклы, найденные обходом в глубину: из каждой ещё не пройденной вершины (по возрастанию)
+        обход идёт до первого ребра в вершину текущего пути, и цикл от неё до конца пути
+        попадает в результат
+        """
         visited = set()
         cycles = []
-        path = []
-        path_set = set()
 
-        def dfs_cycle(node_value):
-            visited.add(node_value)
-            path.append(node_value)
-            path_set.add(node_value)
-
-            for neighbor in sorted(self.get_neighbors(node_value)):
-                if neighbor not in visited:
-                    if dfs_cycle(neighbor):
-                        return True
-                elif neighbor in path_set:
-                    cycle_start = path.index(neighbor)
-                    cycles.append(path[cycle_start:])
-                    return True
-
-            path_set.remove(node_value)
-            path.pop()
-            return False
-
-        for node in sorted(self.nodes):
-            if node not in visited:
-                dfs_cycle(node)
+        for start in sorted(self.nodes):
+            if start in visited:
+                continue
+            on_path = set()
+            for event, node, path in traversal.depth_first(start, self._sorted_neighbors, visited):
+                if event == traversal.ENTER:
+                    on_path.add(node)
+                elif event == traversal.LEAVE:
+                    on_path.discard(node)
+                elif node in on_path:
+                    cycles.append(path[path.index(node):])
+                    break
 
         return cycles
 
     def kruskal(self):
-        if not self.weighted:
-            raise ValueError("Алгоритм Краскала требует взвешенный граф")
-        if self.directed:
-            raise ValueError("Алгоритм Краскала работает только для неориентированных графов")
-
-        def find(parent, i):
-            if parent[i] != i:
-                parent[i] = find(parent, parent[i])
-            return parent[i]
-
-        def union(parent, rank, x, y):
-            root_x = find(parent, x)
-            root_y = find(parent, y)
-            if rank[root_x] < rank[root_y]:
-                parent[root_x] = root_y
-            elif rank[root_x] > rank[root_y]:
-                parent[root_y] = root_x
-            else:
-                parent[root_y] = root_x
-                rank[root_x] += 1
+        """Минимальный остовный лес алгоритмом Краскала (см. minimum_spanning_forest)."""
+        return self.minimum_spanning_forest('kruskal')
 
-        edges = []
-        for edge in self.edges:
-            if edge[0] < edge[1]:  # Avoid duplicates
-                edges.append((edge[2], edge[0], edge[1]))
-        edges.sort()  # Sort by weight
-
-        mst_edges = []
-        total_weight = 0
-        parent = {node: node for node in self.nodes}
-        rank = {node: 0 for node in self.nodes}
+    def prim(self):
+        """Минимальный остовный лес алгоритмом Прима (см. minimum_spanning_forest)."""
+        return self.minimum_spanning_forest('prim')
 
-        for weight, u, v in edges:
-            if find(parent, u) != find(parent, v):
-                union(parent, rank, u, v)
-                mst_edges.append((u, v, weight))
-                total_weight += weight
+    def minimum_spanning_forest(self, method='auto'):
+        """
+        Минимальное остовное дерево каждой компоненты связности по стоимости рёбер
 
-        return mst_edges, total_weight
+        Для несвязного графа возвращается лес, а не ошибка.
 
-    def prim(self):
+        :param method: 'prim' - алгоритм Прима с кучей, 'kruskal' - алгоритм Краскала по
+            отсортированному массиву рёбер с системой непересекающихся множеств, 'auto' -
+            Прим для плотных графов (см. spanning_forest.PRIM_MIN_DEGREE), иначе Краскал
+        :return: кортеж (список рёбер (u, v, стоимость), общая стоимость)
+        """
         if not self.weighted:
-            raise ValueError("Алгоритм Прима требует взвешенный граф")
+            raise ValueError("Остовное дерево минимального веса требует взвешенный граф")
         if self.directed:
-            raise ValueError("Алгоритм Прима работает только для неориентированных графов")
-        if not self.is_connected():
-            raise ValueError("Граф должен быть связным для алгоритма Прима")
-
-        start_node = next(iter(self.nodes))
-        visited = {start_node}
-        mst_edges = []
-        total_weight = 0
+            raise ValueError("Остовное дерево строится только для неориентированных графов")
+        if method not in ('auto', 'prim', 'kruskal'):
+            raise ValueError(f"Неизвестный метод '{method}', ожидался один из: auto, prim, kruskal")
+        names, offsets, targets, costs = self._cost_csr()
+        forest = spanning_forest.minimum_spanning_forest(len(names), offsets, targets, costs, method)
+        mst_edges = [(names[u], names[v], cost) for u, v, cost in forest]
+        return mst_edges, sum(cost for _, _, cost in forest)
+
+    def _cost_csr(self):
+        """Имена вершин, смещения строк, номера соседей и стоимости рёбер в порядке смежности."""
+        names = list(self.nodes)
+        index = {name: i for i, name in enumerate(names)}
+        offsets = [0]
+        targets = []
+        costs = []
+        for name in names:
+            for neighbor, (cost, _) in self._successors(name):
+                targets.append(index[neighbor])
+                costs.append(cost)
+            offsets.append(len(targets))
+        return names, offsets, targets, costs
 
-        while len(visited) < len(self.nodes):
-            min_edge = None
-            min_weight = float('infinity')
-
-            for node in visited:
-                for neighbor in self.get_neighbors(node):
-                    if neighbor not in visited:
-                        for edge in self.edges:
-                            if edge[0] == node and edge[1] == neighbor:
-                                weight = edge[2]
-                                if weight < min_weight:
-                                    min_edge = (node, neighbor)
-                                    min_weight = weight
-
-            if min_edge is None:
-                raise ValueError("Граф не связан.")
+    def edmonds_karp(self, source, sink):
+        """Максимальный поток алгоритмом Эдмондса - Карпа (см. max_flow)."""
+        return self.max_flow(source, sink, method='edmonds_karp')
 
-            mst_edges.append((min_edge[0], min_edge[1], min_weight))
-            total_weight += min_weight
-            visited.add(min_edge[1])
+    def max_flow(self, source, sink, method='dinic'):
+        """
+        Максимальный поток из source в sink на разреженной остаточной сети
 
-        return mst_edges, total_weight
+        Пропускная способность ребра берётся из capacities, а у рёбер без неё, как и раньше, равна
+        стоимости; рёбра с нулевой пропускной способностью поток не пропускают.
 
-    def edmonds_karp(self, source, sink):
+        :param method: 'dinic', 'push_relabel' или 'edmonds_karp'
+        :return: кортеж (величина потока, {u: {v: поток}} только по рёбрам с ненулевым потоком)
+        """
+        _check_flow_method(method)
         if source not in self.nodes or sink not in self.nodes:
             raise ValueError(f"Источник '{source}' или сток '{sink}' не существует в графе.")
 
-        # Резервный граф инициализируется напрямую из весов рёбер
-        residual = {u: {v: 0 for v in self.nodes} for u in self.nodes}
-        for edge in self.edges:
-            residual[edge[0]][edge[1]] = edge[2] if edge[2] is not None else 1
-
-        flow = {u: {v: 0 for v in self.nodes} for u in self.nodes}
-        max_flow = 0
-
-        def bfs():
-            parent = {node: None for node in self.nodes}
-            parent[source] = source
-            queue = [source]
-
-            while queue:
-                current = queue.pop(0)
-                for neighbor, cap in residual[current].items():
-                    if cap > 0 and parent[neighbor] is None:  # Не посещён
-                        parent[neighbor] = current
-                        if neighbor == sink:
-                            return parent
-                        queue.append(neighbor)
-            return None
-
-        # Ищем увеличивающие пути
-        while True:
-            parent_map = bfs()
-            if not parent_map:
-                break
-
-            # Находим минимальную пропускную способность в пути
-            path_flow = float('inf')
-            s = sink
-            while s != source:
-                path_flow = min(path_flow, residual[parent_map[s]][s])
-                s = parent_map[s]
-
-            # Обновляем резервный граф и поток
-            v = sink
-            while v != source:
-                u = parent_map[v]
-                residual[u][v] -= path_flow
-                residual[v][u] += path_flow
-                flow[u][v] += path_flow
-                flow[v][u] -= path_flow
-                v = u
-
-            max_flow += path_flow
+        names = list(self.nodes)
+        index = {name: i for i, name in enumerate(names)}
+        network = flow.FlowNetwork(len(names))
+        for name in names:
+            tail = index[name]
+            for neighbor, (cost, _) in self._successors(name):
+                capacity = self.capacities.get((name, neighbor), cost)
+                if capacity > 0:
+                    network.add_arc(tail, index[neighbor], capacity)
+        value = flow.max_flow(network, index[source], index[sink], method)
+        return value, network.flows(names)
+
+    def flow_session(self, source, sink, method='edmonds_karp'):
+        """
+        Максимальный поток из source в sink, который после правок рёбер не пересчитывается
+        с нуля, а исправляется (см. FlowSession)
+        """
+        return FlowSession(self, source, sink, method)
 
-        return max_flow, flow
+    def min_cost_flow(self, demands, supplies=None, method='successive_shortest_paths'):
+        """
+        План поставок минимальной стоимости со складов клиентам
+
+        Все склады подключаются к общему источнику, все клиенты - к общему стоку. Сначала
+        доставляется как можно больше, а среди таких планов выбирается самый дешёвый;
+        стоимость ребра - цена перевозки единицы товара, пропускная способность берётся
+        из capacities. В отличие от max_flow, где ребро без пропускной способности пропускает
+        столько, сколько стоит, здесь стоимость - это цена, а не ограничение: у рёбер без
+        пропускной способности ограничения нет.
+
+        :param demands: {клиент: сколько ему нужно}, только числа
+        :param supplies: {склад: сколько он может отгрузить (None - без ограничения)};
+            по умолчанию - все склады без ограничения
+        :param method: 'successive_shortest_paths' или 'cost_scaling' (для больших сетей, только
+            при целых стоимостях)
+        :return: кортеж (сколько доставлено, общая стоимость, {u: {v: поток}} по рёбрам с ненулевым потоком)
+        """
+        if supplies is None:
+            supplies = {node: None for node, node_type in self.nodes.items() if node_type == 'warehouse'}
+        for amounts, optional in ((demands, False), (supplies, True)):
+            for node, amount in amounts.items():
+                if node not in self.nodes:
+                    raise ValueError(f"Вершина {node} не существует в графе")
+                if amount is None and optional:
+                    continue
+                if isinstance(amount, bool) or not (isinstance(amount, (int, float)) and amount >= 0):
+                    raise ValueError(f"Вершина {node}: потребность и запас должны быть неотрицательными числами")
+
+        # Больше, чем нужно всем клиентам, ни по одному ребру не повезут
+        unlimited = sum(demands.values())
+        names = list(self.nodes)
+        index = {name: i for i, name in enumerate(names)}
+        source, sink = len(names), len(names) + 1
+        network = flow.FlowNetwork(len(names) + 2)
+        for name in names:
+            tail = index[name]
+            for neighbor, (cost, _) in self._successors(name):
+                capacity = self.capacities.get((name, neighbor), unlimited)
+                if capacity > 0:
+                    network.add_arc(tail, index[neighbor], capacity, cost)
+        for node, amount in supplies.items():
+            network.add_arc(source, index[node], unlimited if amount is None else amount)
+        for node, amount in demands.items():
+            network.add_arc(index[node], sink, amount)
+
+        delivered = min_cost.min_cost_flow(network, source, sink, method)
+        return delivered, network.total_cost(), network.flows(names)
 
     def find_shortest_path(self, start, end, weight_type='cost'):
         """
@@ -406,37 +701,7 @@ class Graph:
         if start not in self.nodes or end not in self.nodes:
             raise ValueError("Начальная или конечная вершина не существует в графе")
 
-        # Инициализация
-        distances = {node: float('inf') for node in self.nodes}
-        distances[start] = 0
-        previous_nodes = {node: None for node in self.nodes}
-        pq = [(0, start)]
-
-        while pq:
-            current_distance, current_node = heapq.heappop(pq)
-
-            # Если достигли конечной вершины
-            if current_node == end:
-                break
-
-            # Если текущее расстояние больше уже известного, пропускаем
-            if current_distance > distances[current_node]:
-                continue
-
-            # Проверяем все ребра из текущей вершины
-            for edge in self.edges:
-                if edge[0] == current_node:
-                    neighbor = edge[1]
-                    # Выбираем вес в зависимости от параметра
-                    weight = edge[2] if weight_type == 'cost' else edge[3]
-                    
-                    distance = current_distance + weight
-
-                    # Если нашли более короткий путь
-                    if distance < distances[neighbor]:
-                        distances[neighbor] = distance
-                        previous_nodes[neighbor] = current_node
-                        heapq.heappush(pq, (distance, neighbor))
+        distances, previous_nodes = self.dijkstra(start, target=end, weight_type=weight_type)
 
         # Восстанавливаем путь
         path = []
@@ -451,57 +716,456 @@ class Graph:
     def find_optimal_path(self, start, end):
         """
         Публичный метод для нахождения Парето-оптимального пути
-        
+
+        Возвращает самый дешёвый маршрут Парето-фронта (при равной стоимости - самый быстрый).
+        Весь фронт возвращает find_pareto_paths.
+
         :param start: начальная вершина
         :param end: конечная вершина
         :return: кортеж (путь, стоимость, время)
         """
+        front = self.find_pareto_paths(start, end)
+        if not front:
+            return [end], float('inf'), float('inf')
+        return front[0]
+
+    def find_pareto_paths(self, start, end, epsilon=0.0, max_labels_per_node=None):
+        """
+        Многокритериальный поиск с метками: весь Парето-фронт маршрутов по (стоимость, время)
+
+        Метки извлекаются из кучи в лексикографическом порядке (стоимость, время), поэтому
+        метка вершины недоминируема тогда и только тогда, когда её время меньше времени всех
+        ранее принятых меток этой вершины. Доминируемые метки отсекаются ещё до вставки в кучу,
+        в том числе по уже найденным маршрутам до конечной вершины.
+
+        :param start: начальная вершина
+        :param end: конечная вершина
+        :param epsilon: относительный шаг по времени; метка принимается, только если она
+            быстрее предыдущей принятой более чем в (1 + epsilon) раз (0 - точный фронт)
+        :param max_labels_per_node: предел числа принятых меток на вершину (None - без предела);
+            при заполнении остаются самые дешёвые метки
+        :return: список кортежей (путь, стоимость, время) по возрастанию стоимости
+        """
         if start not in self.nodes or end not in self.nodes:
             raise ValueError("Начальная или конечная вершина не существует в графе")
-
-        # Инициализация
-        distances_cost = {node: float('inf') for node in self.nodes}
-        distances_time = {node: float('inf') for node in self.nodes}
-        distances_cost[start] = 0
-        distances_time[start] = 0
-        previous_nodes = {node: None for node in self.nodes}
-        pq = [(0, 0, start)]  # (стоимость, время, вершина)
+        if epsilon < 0:
+            raise ValueError("Параметр epsilon не может быть отрицательным")
+        if max_labels_per_node is not None and max_labels_per_node < 1:
+            raise ValueError("Предел числа меток на вершину должен быть положительным")
+
+        inf = float('inf')
+        shrink = 1 / (1 + epsilon)
+        # Метки хранятся плоско: (вершина, индекс родительской метки)
+        labels = [(start, -1)]
+        time_bound = {}  # вершина -> время, которое новая метка должна строго улучшить
+        label_counts = {}
+        front = []
+        pq = [(0, 0, 0)]  # (стоимость, время, индекс метки)
 
         while pq:
-            current_cost, current_time, current_node = heapq.heappop(pq)
+            current_cost, current_time, label_id = heapq.heappop(pq)
+            current_node = labels[label_id][0]
 
-            # Если достигли конечной вершины
-            if current_node == end:
-                break
-
-            # Проверяем все ребра из текущей вершины
-            for edge in self.edges:
-                if edge[0] == current_node:
-                    neighbor = edge[1]
-                    edge_cost = edge[2]
-                    edge_time = edge[3]
-                    
-                    new_cost = current_cost + edge_cost
-                    new_time = current_time + edge_time
-
-                    # Условие Парето-оптимальности
-                    if (new_cost < distances_cost[neighbor] or 
-                        new_time < distances_time[neighbor]):
-                        distances_cost[neighbor] = new_cost
-                        distances_time[neighbor] = new_time
-                        previous_nodes[neighbor] = current_node
-                        heapq.heappush(pq, (new_cost, new_time, neighbor))
+            if current_time >= time_bound.get(current_node, inf) or current_time >= time_bound.get(end, inf):
+                continue
+            count = label_counts.get(current_node, 0)
+            if max_labels_per_node is not None and count >= max_labels_per_node:
+                continue
+            time_bound[current_node] = current_time * shrink
+            label_counts[current_node] = count + 1
 
-        # Восстанавливаем путь
-        path = []
-        current = end
-        while current is not None:
-            path.append(current)
-            current = previous_nodes[current]
-        path.reverse()
+            if current_node == end:
+                front.append((current_cost, current_time, label_id))
+                continue
 
-        return path, distances_cost[end], distances_time[end]
+            for neighbor, (edge_cost, edge_time) in self._successors(current_node):
+                new_time = current_time + edge_time
+                if new_time >= time_bound.get(neighbor, inf) or new_time >= time_bound.get(end, inf):
+                    continue
+                if max_labels_per_node is not None and label_counts.get(neighbor, 0) >= max_labels_per_node:
+                    continue
+                labels.append((neighbor, label_id))
+                heapq.heappush(pq, (current_cost + edge_cost, new_time, len(labels) - 1))
+
+        # Восстанавливаем пути по цепочкам родительских меток
+        routes = []
+        for total_cost, total_time, label_id in front:
+            path = []
+            while label_id != -1:
+                node, label_id = labels[label_id]
+                path.append(node)
+            path.reverse()
+            routes.append((path, total_cost, total_time))
+        return routes
 
     @property
     def edges_list(self):
         return self.edges
+
+
+class FlowSession:
+    """
+    Максимальный поток на графе, который поддерживается при правках рёбер
+
+    Остаточная сеть хранится между вызовами. Ребро добавляется, удаляется или получает
+    другую пропускную способность через методы сессии (они меняют и сам граф), после чего
+    поток исправляется на месте (flow.set_capacity): при увеличении пропускной способности
+    ищутся только новые увеличивающие пути, при уменьшении лишний поток перенаправляется
+    в обход ребра или снимается. Если граф изменили в обход сессии, при следующем обращении
+    поток строится заново.
+
+    Пропускные способности те же, что в Graph.max_flow: из capacities, иначе - стоимость ребра.
+
+    :param graph: граф
+    :param source: источник
+    :param sink: сток
+    :param method: алгоритм поиска и дополнения потока: 'edmonds_karp', 'dinic' или 'push_relabel'
+    """
+
+    def __init__(self, graph, source, sink, method='edmonds_karp'):
+        _check_flow_method(method)
+        self.graph = graph
+        self.source = source
+        self.sink = sink
+        self.method = method
+        self._rebuild()
+
+    def _rebuild(self):
+        graph = self.graph
+        if self.source not in graph.nodes or self.sink not in graph.nodes:
+            raise ValueError(f"Источник '{self.source}' или сток '{self.sink}' не существует в графе.")
+        self._names = list(graph.nodes)
+        self._index = {name: i for i, name in enumerate(self._names)}
+        self._network = flow.FlowNetwork(len(self._names))
+        # Дуга сети для каждого ребра (начало, конец); дуги с нулевой пропускной способностью
+        # тоже хранятся, чтобы её можно было потом увеличить
+        self._arcs = {}
+        for name in self._names:
+            tail = self._index[name]
+            for neighbor, (cost, _) in graph._successors(name):
+                capacity = graph.capacities.get((name, neighbor), cost)
+                self._arcs[name, neighbor] = self._network.add_arc(tail, self._index[neighbor], capacity)
+        flow.max_flow(self._network, self._index[self.source], self._index[self.sink], self.method)
+        self._version = graph.version
+
+    def _current(self):
+        if self._version != self.graph.version:
+            self._rebuild()
+        return self._network
+
+    @property
+    def value(self):
+        """Величина текущего максимального потока."""
+        return self._current().net_outflow(self._index[self.source])
+
+    def flows(self):
+        """Поток по рёбрам: {u: {v: поток}} только по рёбрам с ненулевым потоком."""
+        return self._current().flows(self._names)
+
+    def add_edge(self, node1, node2, cost=0, delivery_time=0, capacity=None):
+        """
+        Добавляет ребро (или меняет существующее) как Graph.add_edge и дополняет поток
+
+        :return: новая величина максимального потока
+        """
+        self._current()
+        self.graph.add_edge(node1, node2, cost, delivery_time, capacity)
+        return self._update(node1, node2)
+
+    def remove_edge(self, from_vertex, to_vertex):
+        """
+        Удаляет ребро как Graph.remove_edge и перенаправляет шедший по нему поток
+
+        :return: новая величина максимального потока
+        """
+        self._current()
+        self.graph.remove_edge(from_vertex, to_vertex)
+        return self._update(from_vertex, to_vertex)
+
+    def set_capacity(self, from_vertex, to_vertex, capacity):
+        """
+        Меняет пропускную способность ребра как Graph.set_capacity и исправляет поток
+
+        :return: новая величина максимального потока
+        """
+        self._current()
+        self.graph.set_capacity(from_vertex, to_vertex, capacity)
+        return self._update(from_vertex, to_vertex)
+
+    def _update(self, node1, node2):
+        """Переносит в сеть пропускную способность рёбер между node1 и node2 после правки графа."""
+        graph, network = self.graph, self._network
+        source, sink = self._index[self.source], self._index[self.sink]
+        pairs = [(node1, node2)] if graph.directed or node1 == node2 else [(node1, node2), (node2, node1)]
+        for pair in pairs:
+            edge = graph.get_edge(*pair)
+            capacity = 0 if edge is None else graph.capacities.get(pair, edge[0])
+            arc = self._arcs.get(pair)
+            if arc is not None:
+                flow.set_capacity(network, arc, capacity, source, sink, self.method)
+            elif capacity > 0:
+                self._arcs[pair] = network.add_arc(self._index[pair[0]], self._index[pair[1]], capacity)
+                flow.max_flow(network, source, sink, self.method)
+        self._version = graph.version
+        return network.net_outflow(source)
+
+
+class _CSRAdjacency(Mapping):
+    """
+    Индекс смежности {вершина: {сосед: (стоимость, время доставки)}} только для чтения
+    поверх CSR-массивов; словарь соседей строится заново при каждом обращении
+    """
+
+    def __init__(self, index, names, offsets, targets, costs, delivery_times):
+        self._index = index
+        self._names = names
+        self._offsets = offsets
+        self._targets = targets
+        self._costs = costs
+        self._delivery_times = delivery_times
+
+    def successors(self, node):
+        """Пары (сосед, (стоимость, время доставки)) без построения словаря."""
+        i = self._index[node]
+        start, end = self._offsets[i], self._offsets[i + 1]
+        return zip(map(self._names.__getitem__, self._targets[start:end]),
+                   zip(self._costs[start:end], self._delivery_times[start:end]))
+
+    def __getitem__(self, node):
+        return dict(self.successors(node))
+
+    def __contains__(self, node):
+        return node in self._index
+
+    def __iter__(self):
+        return iter(self._names)
+
+    def __len__(self):
+        return len(self._names)
+
+
+class FrozenGraph(Graph):
+    """
+    Неизменяемый граф из Graph.freeze()
+
+    Смежность хранится одним буфером в формате снимка (snapshot.py) и читается через
+    memoryview, поэтому потоки могут выполнять запросы к графу без блокировок. Процессы,
+    созданные через fork, получают его без копирования, а остальные - через share() и
+    attach(путь) или при передаче через pickle: тогда все процессы отображают одни и те же
+    страницы разделяемой памяти. Все алгоритмы Graph работают и с замороженным графом.
+
+    :param source: байты снимка или путь к файлу снимка (отображается в память)
+    :param graph_id: идентификатор исходного графа
+    :param version: версия исходного графа
+    """
+
+    def __init__(self, source, graph_id=None, version=0):
+        snap = snapshot.read_snapshot(source)
+        if snap.node_types is None or len(snap.columns) not in (2, 3):
+            snap.close()
+            raise ValueError("Снимок не содержит типов вершин и стоимости/времени доставки рёбер")
+        names = snap.names
+        self.nodes = dict(zip(names, ['warehouse' if node_type else 'client'
+                                      for node_type in snap.node_types.tolist()]))
+        self._index = {name: i for i, name in enumerate(names)}
+        self.out_edges = _CSRAdjacency(self._index, names, snap.row_offsets, snap.targets, *snap.columns[:2])
+        self._in_edges = None
+        self.directed = snap.directed
+        self.weighted = snap.weighted
+        self.graph_id = graph_id or uuid.uuid4().hex
+        self.version = version
+        self._edges_cache = None
+        self.positions = {}
+        self.layout_dirty = set()
+        self.capacities = {}
+        if len(snap.columns) == 3:
+            self.capacities = _read_capacities(names, snap.row_offsets.tolist(), snap.targets.tolist(),
+                                               snap.columns[2].tolist())
+        self._frozen = self
+        self._snapshot = snap
+        self._data = source if isinstance(source, bytes) else None
+        self._shared_path = None if isinstance(source, bytes) else source
+        self._remove_shared = None
+        self.closed = False
+        # Места имён вершин в отсортированном порядке (для dijkstra), строятся при первом поиске
+        self._name_ranks = None
+        self._ranked = None
+
+    @classmethod
+    def attach(cls, path, graph_id=None, version=0):
+        """Открывает граф, опубликованный через share() в другом процессе."""
+        return cls(path, graph_id=graph_id, version=version)
+
+    def share(self):
+        """
+        Публикует снимок в разделяемой памяти
+
+        Файл удаляется при закрытии этого графа (или при его сборке сборщиком мусора).
+
+        :return: путь для attach()
+        """
+        if self._shared_path is None:
+            self._shared_path = snapshot.write_shared(self._data)
+            self._remove_shared = weakref.finalize(self, _remove_file, self._shared_path)
+        return self._shared_path
+
+    def close(self):
+        if self._remove_shared is not None:
+            self._remove_shared()
+        self._in_edges = None
+        self._snapshot.close()
+        self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __reduce__(self):
+        return FrozenGraph.attach, (self.share(), self.graph_id, self.version)
+
+    @property
+    def in_edges(self):
+        """Обратный индекс смежности; строится при первом обращении."""
+        if self._in_edges is None:
+            snap = self._snapshot
+            offsets = snap.row_offsets
+            sources = array('I')
+            for i in range(len(self._index)):
+                sources.extend([i] * (offsets[i + 1] - offsets[i]))
+            counts = [0] * (len(self._index) + 1)
+            for target in snap.targets:
+                counts[target + 1] += 1
+            for i in range(len(self._index)):
+                counts[i + 1] += counts[i]
+            positions = counts[:-1]
+            reverse_targets = array('I', bytes(4 * len(sources)))
+            columns = snap.columns[:2]
+            reverse_columns = [array(column.format, bytes(column.itemsize * len(sources))) for column in columns]
+            for edge, target in enumerate(snap.targets):
+                position = positions[target]
+                positions[target] += 1
+                reverse_targets[position] = sources[edge]
+                for column, reverse in zip(columns, reverse_columns):
+                    reverse[position] = column[edge]
+            self._in_edges = _CSRAdjacency(self._index, self.out_edges._names, counts, reverse_targets,
+                                           *reverse_columns)
+        return self._in_edges
+
+    def freeze(self):
+        return self
+
+    def _successors(self, node):
+        return self.out_edges.successors(node)
+
+    def _cost_csr(self):
+        snap = self._snapshot
+        return self.out_edges._names, snap.row_offsets, snap.targets, snap.columns[0]
+
+    def dijkstra(self, start_value, target=None, weight_type='cost'):
+        """
+        Алгоритм Дейкстры прямо по CSR-массивам: вершины - номера, расстояния - списки
+
+        Параметры и результат те же, что у Graph.dijkstra. В куче вершины сравниваются
+        по месту имени в отсортированном списке, поэтому при равных расстояниях выбирается
+        тот же путь, что и в исходном графе.
+        """
+        if not self.weighted:
+            raise ValueError("Алгоритм Дейкстры требует взвешенный граф")
+        if start_value not in self.nodes:
+            raise ValueError(f"Стартовая вершина {start_value} не существует")
+        if target is not None and target not in self.nodes:
+            raise ValueError(f"Конечная вершина {target} не существует")
+
+        snap = self._snapshot
+        offsets, targets = snap.row_offsets, snap.targets
+        weights = snap.columns[0 if weight_type == 'cost' else 1]
+        names = self.out_edges._names
+        if self._name_ranks is None:
+            self._ranked = sorted(range(len(names)), key=names.__getitem__)
+            self._name_ranks = [0] * len(names)
+            for rank, node in enumerate(self._ranked):
+                self._name_ranks[node] = rank
+        ranks, ranked = self._name_ranks, self._ranked
+        inf = float('infinity')
+        distances = [inf] * len(names)
+        previous = [-1] * len(names)
+        start = self._index[start_value]
+        stop = self._index[target] if target is not None else -1
+        distances[start] = 0
+        pq = [(0, ranks[start])]
+
+        while pq:
+            current_distance, current = heapq.heappop(pq)
+            current = ranked[current]
+            if current_distance > distances[current]:
+                continue
+            if current == stop:
+                break
+            for edge in range(offsets[current], offsets[current + 1]):
+                neighbor = targets[edge]
+                distance = current_distance + weights[edge]
+                if distance < distances[neighbor]:
+                    distances[neighbor] = distance
+                    previous[neighbor] = current
+                    heapq.heappush(pq, (distance, ranks[neighbor]))
+
+        previous_nodes = dict.fromkeys(names)
+        for node, predecessor in enumerate(previous):
+            if predecessor >= 0:
+                previous_nodes[names[node]] = names[predecessor]
+        return dict(zip(names, distances)), previous_nodes
+
+    def _read_only(self, *args, **kwargs):
+        raise ValueError("Замороженный граф нельзя изменять: измените исходный граф и заморозьте его заново")
+
+    add_node = add_edge = remove_node = remove_edge = set_capacity = _read_only
+
+
+def _remove_file(path):
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+def _check_capacity(capacity, prefix=''):
+    if isinstance(capacity, bool) or not isinstance(capacity, (int, float)):
+        raise ValueError(f"{prefix}Пропускная способность должна быть числом")
+    if capacity < 0:
+        raise ValueError(f"{prefix}Пропускная способность не может быть отрицательной")
+
+
+def _check_flow_method(method):
+    if method not in flow.METHODS:
+        raise ValueError(f"Неизвестный метод поиска потока '{method}', "
+                         f"ожидался один из: {', '.join(flow.METHODS)}")
+
+
+def _check_snapshot_columns(node_count, offsets, targets, costs, delivery_times, capacities):
+    """
+    Проверяет столбцы снимка перед построением графа
+
+    Смещения строк должны не убывать, номера вершин - быть меньше числа вершин, стоимость и
+    время доставки - неотрицательными числами, пропускные способности - неотрицательными
+    или -1 (без ограничения). Сравнение value >= 0 ложно и для NaN.
+    """
+    if offsets[0] != 0 or any(start > end for start, end in zip(offsets, offsets[1:])):
+        raise ValueError("Снимок графа повреждён: смещения рёбер не упорядочены")
+    if targets and max(targets) >= node_count:
+        raise ValueError("Снимок графа повреждён: номер вершины вне диапазона")
+    if not all(value >= 0 for value in costs) or not all(value >= 0 for value in delivery_times):
+        raise ValueError("Снимок графа повреждён: стоимость и время доставки должны быть неотрицательными числами")
+    if capacities is not None and not all(value >= 0 or value == -1 for value in capacities):
+        raise ValueError("Снимок графа повреждён: пропускная способность должна быть неотрицательной или -1")
+
+
+def _read_capacities(names, offsets, targets, capacities):
+    """Словарь пропускных способностей из столбца снимка (-1 - без ограничения)."""
+    result = {}
+    for i, node in enumerate(names):
+        for edge in range(offsets[i], offsets[i + 1]):
+            if capacities[edge] != -1:
+                result[node, names[targets[edge]]] = capacities[edge]
+    return result
@@ -0,0 +1,234 @@
+"""
+Раскладка вершин графа для визуализации.
+
+Позиции хранятся в самом графе (Graph.positions) и пересчитываются инкрементально:
+после изменения уравновешиваются только новые и затронутые вершины (Graph.layout_dirty),
+а остальные остаются на своих местах, поэтому картинка не «прыгает» при добавлении вершины.
+"""
+import math
+
+import networkx as nx
+import numpy as np
+
+# Сколько пар расстояний (вершина x вершина) обрабатывается за один шаг numpy
+_CHUNK_PAIRS = 2_000_000
+# Множитель для упаковки координат ячейки сетки в один ключ
+_ROW = 1 << 32
+
+
+def update_layout(graph, iterations=50, warm_iterations=15, approximate_threshold=2000, seed=42):
+    """
+    Обновляет graph.positions и возвращает его
+
+    :param graph: граф (graph_app.graph.Graph)
+    :param iterations: число итераций полной раскладки
+    :param warm_iterations: число итераций при дообучении от предыдущей раскладки
+    :param approximate_threshold: начиная с этого числа вершин полная раскладка считается
+        приближённо, с отталкиванием только от вершин соседних ячеек сетки
+    :param seed: зерно генератора случайных чисел
+    """
+    positions = graph.positions
+    if not graph.nodes:
+        positions.clear()
+        graph.layout_dirty.clear()
+        return positions
+
+    if not positions:
+        if len(graph.nodes) > approximate_threshold:
+            new_positions = grid_force_layout(list(graph.nodes), graph.edges, iterations=iterations, seed=seed)
+        else:
+            G = nx.MultiDiGraph()
+            G.add_nodes_from(graph.nodes)
+            G.add_edges_from((edge[0], edge[1]) for edge in graph.edges)
+            new_positions = nx.spring_layout(G, k=4, iterations=iterations, seed=seed)
+        positions.update((node, (float(x), float(y))) for node, (x, y) in new_positions.items())
+    else:
+        movable = set(graph.layout_dirty)
+        movable.update(node for node in graph.nodes if node not in positions)
+        movable.intersection_update(graph.nodes)
+        if movable:
+            relax_nodes(graph, sorted(movable, key=str), iterations=warm_iterations, seed=seed)
+
+    graph.layout_dirty.clear()
+    return positions
+
+
+def relax_nodes(graph, movable, iterations=15, seed=42):
+    """
+    Дообучение раскладки: силовой алгоритм Фрюхтермана-Рейнгольда только для вершин movable
+
+    Новые вершины сначала ставятся в центр уже размещённых соседей. Отталкивание
+    считается от всех вершин графа, притяжение - по инцидентным рёбрам; остальные вершины
+    неподвижны, поэтому шаг стоит O(len(movable) * V), а не O(V²).
+    """
+    rng = np.random.default_rng(seed)
+    nodes = list(graph.nodes)
+    index = {node: i for i, node in enumerate(nodes)}
+    coords = np.zeros((len(nodes), 2))
+    placed = np.zeros(len(nodes), dtype=bool)
+    for node, (x, y) in graph.positions.items():
+        i = index.get(node)
+        if i is not None:
+            coords[i] = (x, y)
+            placed[i] = True
+
+    if placed.any():
+        low, high = coords[placed].min(axis=0), coords[placed].max(axis=0)
+    else:
+        low, high = np.array([-1.0, -1.0]), np.array([1.0, 1.0])
+    span = np.maximum(high - low, 1.0)
+    k = math.sqrt(span[0] * span[1] / len(nodes))
+
+    for node in movable:
+        i = index[node]
+        if placed[i]:
+            continue
+        adjacent = [index[other] for other in (*graph.out_edges[node], *graph.in_edges[node])
+                    if placed[index[other]]]
+        if adjacent:
+            coords[i] = coords[adjacent].mean(axis=0) + rng.normal(scale=k, size=2)
+        else:
+            coords[i] = low + rng.random(2) * span
+        placed[i] = True
+
+    moving = np.array([index[node] for node in movable])
+    local = {node: j for j, node in enumerate(movable)}
+    edge_src, edge_dst = [], []
+    for node in movable:
+        for other in (*graph.out_edges[node], *graph.in_edges[node]):
+            if other != node:
+                edge_src.append(local[node])
+                edge_dst.append(index[other])
+    edge_src = np.array(edge_src, dtype=np.intp)
+    edge_dst = np.array(edge_dst, dtype=np.intp)
+
+    temperature = 0.1 * float(span.max())
+    cooling = temperature / (iterations + 1)
+    chunk = max(1, _CHUNK_PAIRS // len(nodes))
+    for _ in range(iterations):
+        displacement = np.zeros((len(moving), 2))
+        for start in range(0, len(moving), chunk):
+            block = moving[start:start + chunk]
+            delta = coords[block, None, :] - coords[None, :, :]
+            distance = np.maximum(np.linalg.norm(delta, axis=-1), 0.01 * k)
+            displacement[start:start + chunk] = (delta * (k * k / distance ** 2)[..., None]).sum(axis=1)
+        if len(edge_src):
+            delta = coords[moving[edge_src]] - coords[edge_dst]
+            distance = np.linalg.norm(delta, axis=-1)
+            _accumulate(displacement, edge_src, -delta * (distance / k)[:, None])
+        _apply_displacement(coords, moving, displacement, temperature)
+        temperature -= cooling
+
+    for node in movable:
+        x, y = coords[index[node]]
+        graph.positions[node] = (float(x), float(y))
+
+
+def grid_force_layout(nodes, edges, iterations=50, seed=42):
+    """
+    Приближённая силовая раскладка для больших графов (многоуровневая сетка в духе Барнса-Хата)
+
+    Плоскость делится на иерархию сеток с ячейками s, 2s, 4s, ... Отталкивание от вершин
+    соседних ячеек самого мелкого уровня считается точно, а от далёких вершин - между центрами
+    масс ячеек: на каждом уровне ячейка взаимодействует с ячейками, соседними с её родительской,
+    но не с ней самой (не более 27). Итерация стоит O(V + E) вместо O(V²) у nx.spring_layout.
+    Результат приводится к квадрату [-1, 1] так же, как в nx.spring_layout.
+    """
+    rng = np.random.default_rng(seed)
+    n = len(nodes)
+    index = {node: i for i, node in enumerate(nodes)}
+    coords = rng.random((n, 2))
+    pairs = [(index[edge[0]], index[edge[1]]) for edge in edges if edge[0] != edge[1]]
+    edge_src = np.array([pair[0] for pair in pairs], dtype=np.intp)
+    edge_dst = np.array([pair[1] for pair in pairs], dtype=np.intp)
+
+    k = math.sqrt(1.0 / n)
+    temperature = 0.1
+    cooling = temperature / (iterations + 1)
+    everyone = np.arange(n)
+    near_offsets = [(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1)]
+    far_offsets = [(dx, dy) for dx in range(-3, 4) for dy in range(-3, 4) if max(abs(dx), abs(dy)) > 1]
+
+    for _ in range(iterations):
+        displacement = np.zeros((n, 2))
+
+        if len(edge_src):
+            delta = coords[edge_src] - coords[edge_dst]
+            force = delta * (np.linalg.norm(delta, axis=-1) / k)[:, None]
+            _accumulate(displacement, edge_src, -force)
+            _accumulate(displacement, edge_dst, force)
+
+        # Размер мелкой ячейки подбирается по плотности основной массы вершин (без выбросов),
+        # чтобы в ячейке было в среднем около двух вершин
+        low, high = np.percentile(coords, [5, 95], axis=0)
+        finest_cell = max(math.sqrt(2 * float(np.prod(high - low)) / (0.81 * n)), 1e-9)
+        origin = coords.min(axis=0)
+        extent = float((coords.max(axis=0) - origin).max())
+        levels = 1
+        while finest_cell * 2 ** levels < extent:
+            levels += 1
+        for level in reversed(range(levels)):
+            cells = np.floor((coords - origin) / (finest_cell * 2 ** level)).astype(np.int64)
+            keys = cells[:, 0] * _ROW + cells[:, 1]
+            cell_keys, inverse, mass = np.unique(keys, return_inverse=True, return_counts=True)
+            centre = np.stack([np.bincount(inverse, weights=coords[:, axis]) for axis in (0, 1)], axis=1)
+            centre /= mass[:, None]
+            # Взаимодействие «ячейка-ячейка»: сила считается в центре масс ячейки
+            # и затем одинаково прикладывается ко всем её вершинам
+            cell_x, cell_y = cell_keys // _ROW, cell_keys % _ROW
+            field = np.zeros((len(cell_keys), 2))
+            cell_ids = np.arange(len(cell_keys))
+            for dx, dy in far_offsets:
+                # Ячейка из списка взаимодействия: её родитель - сосед нашего родителя
+                other_x, other_y = cell_x + dx, cell_y + dy
+                other_keys = other_x * _ROW + other_y
+                in_list = (np.abs(other_x // 2 - cell_x // 2) <= 1) & (np.abs(other_y // 2 - cell_y // 2) <= 1)
+                position = np.minimum(np.searchsorted(cell_keys, other_keys), len(cell_keys) - 1)
+                in_list &= cell_keys[position] == other_keys
+                if not in_list.any():
+                    continue
+                rows, other = cell_ids[in_list], position[in_list]
+                delta = centre[rows] - centre[other]
+                distance = np.maximum(np.linalg.norm(delta, axis=-1), 0.01 * k)
+                _accumulate(field, rows, delta * (mass[other] * k * k / distance ** 2)[:, None])
+            displacement += field[inverse]
+
+        # Ближняя зона: точное отталкивание от вершин своей и соседних ячеек мелкого уровня
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+        for dx, dy in near_offsets:
+            target = keys + dx * _ROW + dy
+            low = np.searchsorted(sorted_keys, target, side='left')
+            counts = np.searchsorted(sorted_keys, target, side='right') - low
+            total = int(counts.sum())
+            if not total:
+                continue
+            rows = np.repeat(everyone, counts)
+            shift = np.repeat(low - (np.cumsum(counts) - counts), counts)
+            cols = order[shift + np.arange(total)]
+            delta = coords[rows] - coords[cols]
+            distance = np.maximum(np.linalg.norm(delta, axis=-1), 0.01 * k)
+            _accumulate(displacement, rows, delta * (k * k / distance ** 2)[:, None])
+
+        _apply_displacement(coords, everyone, displacement, temperature)
+        temperature -= cooling
+
+    coords -= coords.mean(axis=0)
+    extent = np.abs(coords).max()
+    if extent > 0:
+        coords /= extent
+    return {node: coords[i] for node, i in index.items()}
+
+
+def _accumulate(displacement, rows, force):
+    """Суммирует силы force по строкам rows (быстрее, чем np.add.at)."""
+    size = len(displacement)
+    displacement[:, 0] += np.bincount(rows, weights=force[:, 0], minlength=size)
+    displacement[:, 1] += np.bincount(rows, weights=force[:, 1], minlength=size)
+
+
+def _apply_displacement(coords, moving, displacement, temperature):
+    """Сдвигает вершины moving вдоль displacement, ограничивая шаг текущей «температурой»."""
+    length = np.linalg.norm(displacement, axis=-1)
+    length = np.where(length < 0.01, 0.01, length)
+    coords[moving] += displacement * (np.minimum(length, temperature) / length)[:, None]
@@ -0,0 +1,252 @@
+"""
+Потоковая загрузка графа из JSON-файла.
+
+Формат файла тот же, что и раньше:
+
+    {"nodes": {"Москва": "warehouse", ...},
+     "edges": [{"from": "Москва", "to": "Клиент1", "cost": 500, "delivery_time": 24}, ...]}
+
+У ребра может быть необязательное поле "capacity" - пропускная способность.
+
+Файл не читается в память целиком и не превращается в одно большое дерево объектов:
+разбор идёт по частям, элементы "nodes" и "edges" декодируются пачками в пределах
+текущего фрагмента. Поэтому кроме самого графа в памяти держится только этот фрагмент.
+"""
+import codecs
+import gc
+import json
+import re
+
+from .graph import Graph
+
+_skip_whitespace = re.compile(r'[ \t\n\r]*').match
+
+
+class _ChunkReader:
+    """Текстовый буфер поверх итератора байтовых (или строковых) фрагментов."""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder('utf-8-sig')()
+        self._decode = json.JSONDecoder().raw_decode
+        self._decode_list = json.JSONDecoder().decode
+        self._decode_pairs = json.JSONDecoder(object_pairs_hook=list).decode
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+        # Сколько символов и строк уже отброшено из начала буфера (для сообщений об ошибках)
+        self.offset = 0
+        self.lines = 0
+
+    def _read_more(self):
+        """Дочитывает следующий фрагмент; возвращает False, если файл закончился."""
+        if self.eof:
+            return False
+        # Уже разобранная часть буфера отбрасывается
+        self.offset += self.pos
+        self.lines += self.buffer.count('\n', 0, self.pos)
+        self.buffer = self.buffer[self.pos:]
+        self.pos = 0
+        for chunk in self._chunks:
+            text = chunk if isinstance(chunk, str) else self._decoder.decode(chunk)
+            if text:
+                self.buffer += text
+                return True
+        self.buffer += self._decoder.decode(b'', final=True)
+        self.eof = True
+        return True
+
+    def peek(self):
+        """Следующий значимый символ (пробелы пропускаются) или '' в конце файла."""
+        while True:
+            self.pos = _skip_whitespace(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._read_more():
+                return ''
+
+    def expect(self, char):
+        found = self.peek()
+        if found != char:
+            raise self.error(f"Ожидался символ {char!r}", self.pos)
+        self.pos += 1
+
+    def error(self, message, pos):
+        """JSONDecodeError с номером строки и символа от начала файла, а не буфера."""
+        error = json.JSONDecodeError(message, self.buffer, pos)
+        error.pos = self.offset + pos
+        error.lineno += self.lines
+        error.args = (f"{message}: строка {error.lineno}, символ {error.pos}",)
+        return error
+
+    def value(self):
+        """Декодирует очередное JSON-значение, при необходимости дочитывая файл."""
+        self.peek()
+        while True:
+            try:
+                value, end = self._decode(self.buffer, self.pos)
+            except json.JSONDecodeError as error:
+                if self._read_more():
+                    continue
+                raise self.error(error.msg, error.pos) from None
+            # Значение, упёршееся в конец буфера (например, число), может продолжаться в следующем фрагменте
+            if end == len(self.buffer) and self._read_more():
+                continue
+            self.pos = end
+            return value
+
+    def items(self, closing):
+        """
+        Элементы JSON-массива (closing=']') или пары (ключ, значение) JSON-объекта (closing='}'),
+        открывающая скобка которого уже прочитана
+
+        Элементы декодируются пачками: всё, что в буфере стоит до последней запятой перед
+        началом очередного элемента, пробуется разобрать одним вызовом как '[...]' (или '{...}').
+        Если эта запятая оказалась внутри строки или вложенного значения, разбор не удастся,
+        и до неё элементы декодируются по одному.
+        """
+        pairs = closing == '}'
+        decode = self._decode_pairs if pairs else self._decode_list
+        if self.peek() == closing:
+            self.pos += 1
+            return
+        single_until = 0
+        while True:
+            buffer, start = self.buffer, self.pos
+            cut = _last_separator(buffer, start)
+            batch = None
+            if cut > start and self.offset + start >= single_until:
+                try:
+                    batch = decode(('{' if pairs else '[') + buffer[start:cut] + closing)
+                except json.JSONDecodeError:
+                    pass
+                if not batch:
+                    batch = None
+                    single_until = self.offset + cut
+            if batch is not None:
+                self.pos = cut + 1
+                yield from batch
+                continue
+
+            if pairs:
+                key = self.value()
+                self.expect(':')
+                yield key, self.value()
+            else:
+                yield self.value()
+            separator = self.peek()
+            self.pos += 1
+            if separator == closing:
+                return
+            if separator != ',':
+                raise self.error(f"Ожидался символ ',' или {closing!r}", self.pos - 1)
+
+
+def _last_separator(buffer, start, attempts=8):
+    """
+    Позиция последней запятой в buffer[start:], за которой (после пробелов) идёт тот же символ,
+    с которого начинается первый элемент ('{' у рёбер, '"' у вершин), или -1
+    """
+    first = _skip_whitespace(buffer, start).end()
+    if first >= len(buffer):
+        return -1
+    opening = buffer[first]
+    end = len(buffer)
+    for _ in range(attempts):
+        position = buffer.rfind(opening, first + 1, end)
+        if position < 0:
+            return -1
+        before = position - 1
+        while buffer[before] in ' \t\n\r':
+            before -= 1
+        if buffer[before] == ',':
+            return before
+        end = position
+    return buffer.rfind(',', start)
+
+
+def iter_graph_json(chunks):
+    """
+    Разбирает JSON-файл графа по частям
+
+    :param chunks: итератор фрагментов файла (bytes в UTF-8 или str)
+    :return: генератор событий ('node', имя, тип), ('edge', словарь ребра) и
+        ('field', ключ, значение) для остальных полей верхнего уровня
+    """
+    reader = _ChunkReader(chunks)
+    reader.expect('{')
+    if reader.peek() == '}':
+        reader.pos += 1
+        return
+    while True:
+        key = reader.value()
+        reader.expect(':')
+        if key == 'nodes' and reader.peek() == '{':
+            reader.pos += 1
+            for name, node_type in reader.items('}'):
+                yield 'node', name, node_type
+        elif key == 'edges' and reader.peek() == '[':
+            reader.pos += 1
+            for edge in reader.items(']'):
+                yield 'edge', edge
+        else:
+            yield 'field', key, reader.value()
+
+        if reader.peek() != ',':
+            reader.expect('}')
+            break
+        reader.pos += 1
+    if reader.peek():
+        raise reader.error("Лишние данные после конца документа", reader.pos)
+
+
+def load_graph_json(chunks, directed=True, weighted=True):
+    """
+    Строит граф из JSON-файла, разбирая его по частям (см. iter_graph_json)
+
+    Обычно вершины идут в файле раньше рёбер, и тогда рёбра добавляются в граф
+    (через Graph.from_iterables) прямо по мере разбора. Если рёбра идут первыми,
+    они накапливаются в компактном виде до конца файла.
+
+    :param chunks: итератор фрагментов файла (bytes в UTF-8 или str)
+    :return: новый граф
+    """
+    # На время загрузки сборщик мусора отключается: на миллионах новых кортежей и словарей
+    # его проходы по всем объектам занимают больше времени, чем сам разбор
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        events = iter_graph_json(chunks)
+        nodes = []
+        edges = []
+        for event in events:
+            if event[0] == 'node':
+                nodes.append((event[1], event[2]))
+            elif event[0] == 'edge':
+                edges.append(_edge_tuple(event[1], 1))
+                if nodes:
+                    # Блок вершин уже разобран: остальные рёбра идут в граф без накопления
+                    return Graph.from_iterables(nodes, _streamed_edges(edges[0], events),
+                                                directed=directed, weighted=weighted)
+        return Graph.from_iterables(nodes, edges, directed=directed, weighted=weighted)
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+
+def _streamed_edges(first_edge, events):
+    yield first_edge
+    number = 1
+    for event in events:
+        if event[0] == 'edge':
+            number += 1
+            yield _edge_tuple(event[1], number)
+        elif event[0] == 'node':
+            raise ValueError(f"Вершина {event[1]}: все вершины должны быть перечислены в одном блоке nodes")
+
+
+def _edge_tuple(edge, number):
+    if not isinstance(edge, dict):
+        raise ValueError(f"Ребро {number}: ожидался объект с полями from, to, cost, delivery_time")
+    return (edge.get('from'), edge.get('to'), edge.get('cost', 0), edge.get('delivery_time', 0),
+            edge.get('capacity'))
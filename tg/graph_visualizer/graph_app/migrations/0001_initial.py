@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoredGraph',
+            fields=[
+                ('graph_id', models.CharField(max_length=32, primary_key=True, serialize=False)),
+                ('version', models.PositiveIntegerField(default=0)),
+                ('data', models.TextField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
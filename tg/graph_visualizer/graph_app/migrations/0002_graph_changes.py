@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('graph_app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='storedgraph',
+            name='layout',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.CreateModel(
+            name='GraphChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveIntegerField()),
+                ('change', models.TextField()),
+                ('graph', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='changes', to='graph_app.storedgraph')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('graph', 'version'), name='unique_graph_change_version')],
+            },
+        ),
+    ]
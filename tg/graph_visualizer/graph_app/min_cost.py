@@ -0,0 +1,175 @@
+"""
+Поток минимальной стоимости на сети FlowNetwork (flow.py).
+
+Стоимость единицы потока по дуге a - network.cost[a]. Сначала пропускается как можно
+больше потока, а среди максимальных потоков выбирается самый дешёвый.
+"""
+from collections import deque
+import heapq
+
+from .flow import dinic
+
+METHODS = ('successive_shortest_paths', 'cost_scaling')
+
+
+def min_cost_flow(network, source, sink, method='successive_shortest_paths'):
+    """
+    Максимальный поток из source в sink минимальной стоимости
+
+    :param method: 'successive_shortest_paths' - кратчайшие пути с потенциалами Джонсона;
+        'cost_scaling' - масштабирование стоимостей (Гольдберг - Тарьян), для больших сетей
+        с большими пропускными способностями; требует целых стоимостей
+    :return: величина потока (стоимость - network.total_cost())
+    """
+    if method not in METHODS:
+        raise ValueError(f"Неизвестный метод поиска потока минимальной стоимости '{method}', "
+                         f"ожидался один из: {', '.join(METHODS)}")
+    if source == sink:
+        return 0
+    if method == 'cost_scaling':
+        return cost_scaling(network, source, sink)
+    return successive_shortest_paths(network, source, sink)
+
+
+def _initial_potentials(network, source):
+    """
+    Потенциалы, при которых приведённые стоимости остаточных дуг неотрицательны:
+    нули, если отрицательных стоимостей нет, иначе расстояния Беллмана - Форда от source
+    """
+    adjacency, heads, residual, cost = network.adjacency, network.heads, network.residual, network.cost
+    n = network.node_count
+    if all(cost[arc] >= 0 for arc in range(len(heads)) if residual[arc] > 0):
+        return [0] * n
+    distance = [None] * n
+    distance[source] = 0
+    rounds = [0] * n
+    queue = deque([source])
+    queued = [False] * n
+    queued[source] = True
+    while queue:
+        node = queue.popleft()
+        queued[node] = False
+        for arc in adjacency[node]:
+            if residual[arc] > 0:
+                head = heads[arc]
+                new_distance = distance[node] + cost[arc]
+                if distance[head] is None or new_distance < distance[head]:
+                    distance[head] = new_distance
+                    rounds[head] = rounds[node] + 1
+                    if rounds[head] >= n:
+                        raise ValueError("В сети есть цикл отрицательной стоимости")
+                    if not queued[head]:
+                        queued[head] = True
+                        queue.append(head)
+    unreachable = max((value for value in distance if value is not None), default=0)
+    return [unreachable if value is None else value for value in distance]
+
+
+def successive_shortest_paths(network, source, sink):
+    """
+    Последовательные кратчайшие пути: Дейкстра по приведённым стоимостям (потенциалы Джонсона)
+    до sink и увеличение потока вдоль найденного пути
+    """
+    adjacency, heads, residual, cost = network.adjacency, network.heads, network.residual, network.cost
+    n = network.node_count
+    potential = _initial_potentials(network, source)
+    total = 0
+    while True:
+        distance = [None] * n
+        distance[source] = 0
+        parent_arc = [None] * n
+        done = [False] * n
+        settled = []
+        heap = [(0, source)]
+        while heap:
+            node_distance, node = heapq.heappop(heap)
+            if done[node]:
+                continue
+            done[node] = True
+            settled.append(node)
+            if node == sink:
+                break
+            node_potential = potential[node]
+            for arc in adjacency[node]:
+                if residual[arc] > 0:
+                    head = heads[arc]
+                    new_distance = node_distance + cost[arc] + node_potential - potential[head]
+                    if distance[head] is None or new_distance < distance[head]:
+                        distance[head] = new_distance
+                        parent_arc[head] = arc
+                        heapq.heappush(heap, (new_distance, head))
+        if not done[sink]:
+            return total
+        # Поиск остановлен на sink: потенциал вершины увеличивается на min(расстояние, расстояние
+        # до sink), и приведённые стоимости остаются неотрицательными. Из всех потенциалов
+        # вычитается расстояние до sink, поэтому меняются только пройденные вершины
+        sink_distance = distance[sink]
+        for node in settled:
+            potential[node] += distance[node] - sink_distance
+
+        path = []
+        node = sink
+        while node != source:
+            arc = parent_arc[node]
+            path.append(arc)
+            node = heads[arc ^ 1]
+        amount = min(residual[arc] for arc in path)
+        for arc in path:
+            residual[arc] -= amount
+            residual[arc ^ 1] += amount
+        total += amount
+
+
+def cost_scaling(network, source, sink, alpha=8):
+    """
+    Масштабирование стоимостей: сначала максимальный поток алгоритмом Диница, затем его
+    стоимость уменьшается уточнениями eps-оптимальной циркуляции (eps делится на alpha)
+    с проталкиванием избытков, пока eps не станет меньше 1 / n в исходных единицах
+    """
+    value = dinic(network, source, sink)
+    adjacency, heads, residual = network.adjacency, network.heads, network.residual
+    if not all(float(arc_cost).is_integer() for arc_cost in network.cost):
+        raise ValueError("Масштабирование стоимостей требует целых стоимостей рёбер")
+    n = network.node_count
+    scaled = [int(arc_cost) * (n + 1) for arc_cost in network.cost]
+    price = [0] * n
+    eps = max(map(abs, scaled), default=0)
+    while eps > 1:
+        eps = max(1, eps // alpha)
+
+        # Насыщаем все дуги с отрицательной приведённой стоимостью: псевдопоток становится 0-оптимальным
+        excess = [0] * n
+        for arc in range(len(heads)):
+            amount = residual[arc]
+            if amount > 0:
+                tail, head = heads[arc ^ 1], heads[arc]
+                if scaled[arc] + price[tail] - price[head] < 0:
+                    residual[arc] = 0
+                    residual[arc ^ 1] += amount
+                    excess[tail] -= amount
+                    excess[head] += amount
+
+        active = deque(node for node in range(n) if excess[node] > 0)
+        current = [0] * n
+        while active:
+            node = active.popleft()
+            arcs = adjacency[node]
+            while excess[node] > 0:
+                position = current[node]
+                if position == len(arcs):
+                    price[node] = max(price[heads[arc]] - scaled[arc] for arc in arcs if residual[arc] > 0) - eps
+                    current[node] = 0
+                    continue
+                arc = arcs[position]
+                head = heads[arc]
+                if residual[arc] > 0 and scaled[arc] + price[node] - price[head] < 0:
+                    amount = min(excess[node], residual[arc])
+                    residual[arc] -= amount
+                    residual[arc ^ 1] += amount
+                    excess[node] -= amount
+                    if excess[head] <= 0 < excess[head] + amount:
+                        active.append(head)
+                    excess[head] += amount
+                else:
+                    current[node] = position + 1
+    return value
@@ -0,0 +1,28 @@
+from django.db import models
+
+
+class StoredGraph(models.Model):
+    """Сохранённое состояние рабочего графа (см. store.GraphStore)."""
+
+    graph_id = models.CharField(max_length=32, primary_key=True)
+    version = models.PositiveIntegerField(default=0)
+    # Graph.to_dict() в формате JSON; изменения после сохранённой в нём версии лежат в GraphChange
+    data = models.TextField()
+    # Раскладка {'version', 'positions', 'layout_dirty'} в формате JSON, сохранённая после
+    # отрисовки; пустая строка - раскладка хранится только в data
+    layout = models.TextField(blank=True, default='')
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class GraphChange(models.Model):
+    """Одно изменение графа из журнала (Graph.changes), переводящее его в версию version."""
+
+    graph = models.ForeignKey(StoredGraph, on_delete=models.CASCADE, related_name='changes')
+    version = models.PositiveIntegerField()
+    # (имя метода, аргументы...) в формате JSON, см. Graph.apply_change
+    change = models.TextField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['graph', 'version'], name='unique_graph_change_version'),
+        ]
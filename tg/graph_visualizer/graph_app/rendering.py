@@ -0,0 +1,260 @@
+import base64
+import io
+import logging
+import math
+
+from matplotlib.collections import PathCollection
+from matplotlib.path import Path
+import matplotlib.pyplot as plt
+import networkx as nx
+import numpy as np
+
+from .layout import update_layout
+
+logger = logging.getLogger(__name__)
+
+# Сколько пар (вершина, склад) обрабатывается за один шаг numpy
+_CHUNK_PAIRS = 2_000_000
+# Больше стольких складов в обобщённом режиме подписи вершин не рисуются
+_AGGREGATED_LABEL_LIMIT = 200
+
+
+def render_graph(current_graph, path=None, approximate_threshold=2000,
+                 lod_node_threshold=500, lod_label_threshold=300, pos=None):
+    """
+    Отрисовывает граф с выделенным путём и возвращает PNG в base64.
+
+    Раскладку pos можно посчитать заранее (update_layout), тогда рисовать можно
+    неизменяемую копию графа (Graph.freeze()) без блокировки исходного.
+
+    Уровни детализации: если рёбер больше lod_label_threshold, подписи рёбер не рисуются;
+    если вершин больше lod_node_threshold, клиенты объединяются с ближайшим складом
+    и рисуются только склады и рёбра между их кластерами. Выделенный путь в любом
+    режиме рисуется полностью, с подписями.
+    """
+    logger.debug("Визуализация графа: %d вершин, %d рёбер", len(current_graph.nodes), len(current_graph.edges))
+
+    # Создаем визуализацию
+    plt.figure(figsize=(16, 12), dpi=100)
+    
+    # Раскладка хранится в графе: после изменений уравновешиваются только затронутые вершины
+    if pos is None:
+        pos = update_layout(current_graph, approximate_threshold=approximate_threshold)
+    
+    if len(current_graph.nodes) > lod_node_threshold:
+        draw_aggregated(current_graph, pos)
+    else:
+        draw_detailed(current_graph, pos,
+                      show_edge_labels=current_graph.weighted and len(current_graph.edges) <= lod_label_threshold)
+    
+    # Добавляем легенду
+    plt.legend(loc='best', fontsize=12)
+    
+    # Проверяем, есть ли найденный путь для выделения
+    if path:
+        logger.debug("Найденный путь: %s", path)
+        draw_path(current_graph, pos, path)
+    
+    # Настраиваем отображение
+    plt.axis('off')
+    
+    # Сохраняем график в память
+    buffer = io.BytesIO()
+    plt.savefig(buffer, format='png', bbox_inches='tight', dpi=100)
+    plt.close()
+    
+    # Кодируем изображение в base64
+    return base64.b64encode(buffer.getvalue()).decode()
+
+
+def draw_detailed(current_graph, pos, show_edge_labels=True):
+    """Полная детализация: все вершины, все рёбра и (по желанию) подписи рёбер."""
+    # Конвертируем граф в NetworkX граф для визуализации
+    G = nx.MultiDiGraph()
+    
+    # Добавляем вершины и ребра в NetworkX граф
+    for node, node_type in current_graph.nodes.items():
+        G.add_node(node, node_type=node_type)
+    
+    for edge in current_graph.edges:
+        # Теперь edge содержит 4 элемента: from_vertex, to_vertex, cost, delivery_time
+        G.add_edge(edge[0], edge[1], cost=edge[2], delivery_time=edge[3])
+
+    warehouse_nodes = [node for node, attr in G.nodes(data=True) if attr.get('node_type') == 'warehouse']
+    client_nodes = [node for node, attr in G.nodes(data=True) if attr.get('node_type') == 'client']
+    
+    # Рисуем узлы разных типов разными цветами
+    if warehouse_nodes:
+        nx.draw_networkx_nodes(G, pos, nodelist=warehouse_nodes, node_color='lightblue', 
+                             node_size=500, label='Склады')
+    
+    if client_nodes:
+        nx.draw_networkx_nodes(G, pos, nodelist=client_nodes, node_color='lightgreen', 
+                             node_size=500, label='Клиенты')
+    
+    # Рисуем рёбра и их веса пакетно
+    draw_edges(G, pos)
+    if show_edge_labels:
+        draw_edge_labels(G, pos)
+    
+    # Рисуем метки узлов
+    nx.draw_networkx_labels(G, pos, font_size=8, font_weight="bold")
+
+
+def draw_aggregated(current_graph, pos):
+    """
+    Обобщённая детализация для больших графов: каждый клиент объединяется с ближайшим
+    складом (по стоимости доставки, а если склад недостижим - по расстоянию на рисунке),
+    рисуются только склады размером по числу клиентов и рёбра между их кластерами
+    """
+    owner = cluster_by_warehouse(current_graph, pos)
+    sizes = {}
+    for warehouse in owner.values():
+        sizes[warehouse] = sizes.get(warehouse, 0) + 1
+
+    C = nx.DiGraph()
+    C.add_nodes_from(sizes)
+    C.add_edges_from({
+        (owner[edge[0]], owner[edge[1]])
+        for edge in current_graph.edges
+        if owner[edge[0]] != owner[edge[1]]
+    })
+
+    nodelist = list(C.nodes)
+    # Площадь кружка растёт с числом вершин кластера, но не заслоняет соседей
+    node_sizes = [min(60 + 15 * math.sqrt(sizes[node]), 600) for node in nodelist]
+    draw_edges(C, pos, width=0.3, arrowsize=6, node_size=100)
+    has_warehouses = any(node_type == 'warehouse' for node_type in current_graph.nodes.values())
+    nx.draw_networkx_nodes(C, pos, nodelist=nodelist, node_size=node_sizes, node_color='lightblue',
+                           label='Склады (вместе с клиентами)' if has_warehouses else 'Вершины')
+    if len(nodelist) <= _AGGREGATED_LABEL_LIMIT:
+        labels = {node: f"{node} (+{sizes[node] - 1})" for node in nodelist}
+        nx.draw_networkx_labels(C, pos, labels=labels, font_size=7, font_weight="bold")
+
+
+def cluster_by_warehouse(current_graph, pos):
+    """Сопоставляет каждой вершине ближайший склад; без складов каждая вершина - свой кластер."""
+    owner = current_graph.nearest_warehouses()
+    warehouses = [node for node, node_type in current_graph.nodes.items() if node_type == 'warehouse']
+    rest = [node for node in current_graph.nodes if node not in owner]
+    if not warehouses:
+        return {node: node for node in rest}
+
+    # Недостижимые от складов вершины прикрепляются к ближайшему складу на рисунке
+    anchors = np.array([pos[node] for node in warehouses], dtype=float)
+    chunk = max(1, _CHUNK_PAIRS // len(warehouses))
+    for start in range(0, len(rest), chunk):
+        block = rest[start:start + chunk]
+        points = np.array([pos[node] for node in block], dtype=float)
+        nearest = np.argmin(((points[:, None, :] - anchors[None, :, :]) ** 2).sum(axis=-1), axis=1)
+        owner.update((node, warehouses[i]) for node, i in zip(block, nearest))
+    return owner
+
+
+def draw_path(current_graph, pos, path):
+    """Выделяет путь красным с подписями рёбер, независимо от уровня детализации."""
+    path_edges = [(u, v) for u, v in zip(path, path[1:]) if current_graph.has_edge(u, v)]
+    logger.debug("Рёбра пути: %s", path_edges)
+    P = nx.MultiDiGraph()
+    P.add_nodes_from(node for node in path if node in pos)
+    for u, v in path_edges:
+        cost, delivery_time = current_graph.get_edge(u, v)
+        P.add_edge(u, v, cost=cost, delivery_time=delivery_time)
+
+    # Выделяем вершины найденного пути красным
+    nx.draw_networkx_nodes(P, pos, nodelist=list(P.nodes), node_color='red', node_size=600, label='Путь')
+    
+    # Выделяем рёбра найденного пути красным
+    nx.draw_networkx_edges(P, pos, edgelist=path_edges, edge_color='red', arrows=True, arrowsize=25, width=2)
+    nx.draw_networkx_labels(P, pos, font_size=8, font_weight="bold")
+    if current_graph.weighted and path_edges:
+        draw_edge_labels(P, pos)
+
+
+def draw_edges(G, pos, ax=None, edge_color='gray', width=1, arrowsize=20, node_size=500):
+    """
+    Рисует все рёбра тремя коллекциями: прямые, изогнутые вправо и изогнутые влево
+
+    nx.draw_networkx_edges со стрелками создаёт отдельный FancyArrowPatch на каждое ребро,
+    поэтому здесь геометрия (дуги arc3, укорачивание на радиус вершины, наконечники)
+    считается векторно, а каждая группа рёбер вместе с наконечниками становится одной
+    PathCollection. Встречные рёбра, как и раньше, рисуются дугами в обе стороны,
+    а петли (их обычно единицы) рисует сам networkx.
+    """
+    ax = ax or plt.gca()
+    straight, curved, loops = [], [], []
+    for u, v in G.edges():
+        if u == v:
+            loops.append((u, v))
+            continue
+        # Проверяем, есть ли обратное ребро
+        (curved if G.has_edge(v, u) else straight).append((u, v))
+
+    # Геометрия считается в пикселях, поэтому пределы осей фиксируются до построения
+    ax.update_datalim(np.array([pos[node] for node in G], dtype=float).reshape(-1, 2))
+    ax.autoscale_view()
+
+    style = dict(edge_color=edge_color, width=width, arrowsize=arrowsize, node_size=node_size)
+    for edgelist, rad in ((straight, 0.0), (curved, 0.2), (curved, -0.2)):  # Прямые, изгиб вправо, изгиб влево
+        if edgelist:
+            ax.add_collection(_edge_collection(ax, pos, edgelist, rad, **style), autolim=False)
+    if loops:
+        nx.draw_networkx_edges(G, pos, edgelist=loops, ax=ax, arrows=True, **style)
+
+
+def _edge_collection(ax, pos, edgelist, rad, edge_color, width, arrowsize, node_size):
+    """Строит PathCollection из рёбер edgelist (дуги arc3 с изгибом rad) и их наконечников."""
+    to_pixels = ax.transData.transform
+    to_data = ax.transData.inverted().transform
+    source = to_pixels(np.array([pos[u] for u, _ in edgelist], dtype=float))
+    target = to_pixels(np.array([pos[v] for _, v in edgelist], dtype=float))
+
+    # Контрольная точка квадратичной кривой Безье - так же, как в ConnectionStyle.Arc3
+    delta = target - source
+    control = (source + target) / 2 + rad * np.stack([delta[:, 1], -delta[:, 0]], axis=1)
+
+    points = ax.figure.dpi / 72
+    radius = math.sqrt(node_size) / 2 * points
+    head_length, head_half_width = 0.4 * arrowsize * points, 0.2 * arrowsize * points
+    start = source + _unit(control - source) * radius
+    tip = target + _unit(control - target) * radius
+    direction = _unit(tip - control)
+    base = tip - direction * head_length
+    normal = np.stack([-direction[:, 1], direction[:, 0]], axis=1) * head_half_width
+
+    if rad:
+        lines = np.stack([start, control, base], axis=1)
+        line_codes = [Path.MOVETO, Path.CURVE3, Path.CURVE3]
+    else:
+        lines = np.stack([start, base], axis=1)
+        line_codes = [Path.MOVETO, Path.LINETO]
+    heads = np.stack([tip, base + normal, base - normal, tip], axis=1)
+    head_codes = [Path.MOVETO, Path.LINETO, Path.LINETO, Path.CLOSEPOLY]
+
+    lines = to_data(lines.reshape(-1, 2)).reshape(lines.shape)
+    heads = to_data(heads.reshape(-1, 2)).reshape(heads.shape)
+    paths = [Path(line, line_codes) for line in lines] + [Path(head, head_codes) for head in heads]
+    return PathCollection(paths,
+                          facecolors=['none'] * len(lines) + [edge_color] * len(heads),
+                          edgecolors=edge_color,
+                          linewidths=width,
+                          transform=ax.transData)
+
+
+def _unit(vectors):
+    length = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(length == 0, 1, length)
+
+
+def draw_edge_labels(G, pos):
+    """Рисует стоимость и время доставки всех рёбер одним вызовом."""
+    edge_labels = {
+        (u, v): f"{data['cost']} руб.\n{data['delivery_time']} ч."
+        for u, v, data in G.edges(data=True)
+    }
+    nx.draw_networkx_edge_labels(G, pos,
+                                 edge_labels=edge_labels,
+                                 label_pos=0.7,
+                                 font_size=6,
+                                 font_color='dimgray',
+                                 bbox=dict(facecolor='white', edgecolor='none', alpha=0.5))
@@ -0,0 +1,217 @@
+"""
+Двоичный снимок графа.
+
+Снимок хранит смежность графа упакованными массивами CSR: он записывается за один проход
+и отображается обратно в память (mmap) без разбора текста. Этим же модулем снимки читает
+консольная программа (tg/graph.py), она заменяет ошибки чтения своими сообщениями.
+Все числа little-endian, каждая секция выровнена на 8 байт.
+
+    заголовок        магия b'GRAPHSNP', u16 версия формата, u16 флаги
+                     (1 - ориентированный, 2 - взвешенный, 4 - есть типы вершин),
+                     u16 число столбцов весов, u16 резерв,
+                     u64 число вершин, u64 число рёбер, u64 размер блока имён
+    типы столбцов    u8 на столбец весов: 0 - int64, 1 - float64
+    смещения имён    u64[число вершин + 1] в блоке имён
+    имена            имена вершин в UTF-8 подряд
+    типы вершин      u8[число вершин] (только с флагом 4): 0 - клиент, 1 - склад
+    смещения строк   u64[число вершин + 1] в массиве концов рёбер
+    концы рёбер      u32[число рёбер], номера вершин
+    веса             int64 или float64 [число рёбер] на каждый столбец
+
+Рёбра хранятся так же, как в списках смежности: неориентированное ребро записано
+в обе стороны. У графа логистики два столбца весов - стоимость и время доставки, а если
+у рёбер заданы пропускные способности, то и третий с ними (-1 - без ограничения).
+"""
+from array import array
+import mmap
+import os
+import struct
+import sys
+import tempfile
+
+# Общие снимки пишутся сюда: файловая система в памяти, поэтому их отображение - разделяемая память
+SHARED_DIR = '/dev/shm' if os.path.isdir('/dev/shm') else None
+
+# Файлы с этим расширением загружаются и скачиваются как снимки
+EXTENSION = '.gsnap'
+
+MAGIC = b'GRAPHSNP'
+FORMAT_VERSION = 1
+
+DIRECTED = 1
+WEIGHTED = 2
+NODE_TYPES = 4
+
+INT64 = 0
+FLOAT64 = 1
+
+_HEADER = struct.Struct('<8sHHHHQQQ')
+_COLUMN_TYPECODES = {INT64: 'q', FLOAT64: 'd'}
+
+
+def _padding(size):
+    return -size % 8
+
+
+def _write_array(file, typecode, values):
+    data = values if isinstance(values, array) else array(typecode, values)
+    if sys.byteorder == 'big':
+        data = array(typecode, data)
+        data.byteswap()
+    raw = data.tobytes()
+    file.write(raw)
+    file.write(b'\0' * _padding(len(raw)))
+
+
+def column_kind(values):
+    """INT64, если все значения - целые числа (не bool), иначе FLOAT64."""
+    return INT64 if all(type(value) is int for value in values) else FLOAT64
+
+
+def write_snapshot(file, names, row_offsets, targets, columns=(), node_types=None,
+                   directed=True, weighted=True):
+    """Записывает снимок в двоичный файловый объект; columns - список пар (тип столбца, значения)."""
+    encoded = [name.encode('utf-8') for name in names]
+    name_offsets = [0]
+    for name in encoded:
+        name_offsets.append(name_offsets[-1] + len(name))
+    blob = b''.join(encoded)
+
+    flags = (DIRECTED if directed else 0) | (WEIGHTED if weighted else 0)
+    if node_types is not None:
+        flags |= NODE_TYPES
+    file.write(_HEADER.pack(MAGIC, FORMAT_VERSION, flags, len(columns), 0,
+                            len(encoded), len(targets), len(blob)))
+    kinds = bytes(kind for kind, _ in columns)
+    file.write(kinds + b'\0' * _padding(len(kinds)))
+
+    _write_array(file, 'Q', name_offsets)
+    file.write(blob + b'\0' * _padding(len(blob)))
+    if node_types is not None:
+        types = bytes(node_types)
+        file.write(types + b'\0' * _padding(len(types)))
+    _write_array(file, 'Q', row_offsets)
+    _write_array(file, 'I', targets)
+    for kind, values in columns:
+        _write_array(file, _COLUMN_TYPECODES[kind], values)
+
+
+class GraphSnapshot:
+    """
+    Снимок, открытый только для чтения
+
+    Массивы - memoryview поверх отображённого в память файла (на big-endian машинах - копии).
+    После использования снимок нужно закрыть (close() или with).
+    """
+
+    def __init__(self, source):
+        self._file = None
+        self._mmap = None
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            buffer = memoryview(source)
+        else:
+            self._file = open(source, 'rb')
+            try:
+                self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # Пустой файл нельзя отобразить в память
+                self._mmap = b''
+            buffer = memoryview(self._mmap)
+        self._views = [buffer]
+        try:
+            self._parse(buffer)
+        except Exception:
+            self.close()
+            raise
+
+    def _parse(self, buffer):
+        if len(buffer) < _HEADER.size or bytes(buffer[:8]) != MAGIC:
+            raise ValueError("Файл не является снимком графа")
+        (_, version, flags, column_count, _, node_count,
+         edge_count, names_size) = _HEADER.unpack_from(buffer)
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Неподдерживаемая версия снимка графа: {version}")
+        self.directed = bool(flags & DIRECTED)
+        self.weighted = bool(flags & WEIGHTED)
+        self.node_count = node_count
+        self.edge_count = edge_count
+
+        position = _HEADER.size
+        kinds = bytes(buffer[position:position + column_count])
+        position += column_count + _padding(column_count)
+
+        def take(typecode, count):
+            nonlocal position
+            size = count * array(typecode).itemsize
+            if position + size > len(buffer):
+                raise ValueError("Снимок графа обрезан")
+            view = buffer[position:position + size]
+            position += size + _padding(size)
+            if sys.byteorder == 'big' and typecode != 'B':
+                data = array(typecode, view.tobytes())
+                data.byteswap()
+                return memoryview(data)
+            view = view.cast(typecode)
+            self._views.append(view)
+            return view
+
+        self.name_offsets = take('Q', node_count + 1)
+        self.name_blob = take('B', names_size)
+        self.node_types = take('B', node_count) if flags & NODE_TYPES else None
+        self.row_offsets = take('Q', node_count + 1)
+        self.targets = take('I', edge_count)
+        self.columns = []
+        for kind in kinds:
+            if kind not in _COLUMN_TYPECODES:
+                raise ValueError(f"Неизвестный тип столбца весов в снимке графа: {kind}")
+            self.columns.append(take(_COLUMN_TYPECODES[kind], edge_count))
+        if self.row_offsets[node_count] != edge_count or self.name_offsets[node_count] != names_size:
+            raise ValueError("Снимок графа повреждён")
+
+    @property
+    def names(self):
+        """Имена вершин в порядке снимка."""
+        offsets = self.name_offsets.tolist()
+        blob = self.name_blob.tobytes()
+        text = blob.decode('utf-8')
+        if len(text) == len(blob):
+            # Имена только из ASCII: смещения в байтах совпадают со смещениями в символах
+            return [text[start:end] for start, end in zip(offsets, offsets[1:])]
+        return [blob[start:end].decode('utf-8') for start, end in zip(offsets, offsets[1:])]
+
+    def close(self):
+        for view in reversed(self._views):
+            view.release()
+        self._views = []
+        if isinstance(self._mmap, mmap.mmap):
+            self._mmap.close()
+        if self._file is not None:
+            self._file.close()
+        self._mmap = self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def read_snapshot(source):
+    """Открывает снимок по пути к файлу или из байтов."""
+    return GraphSnapshot(source)
+
+
+def write_shared(data):
+    """
+    Записывает байты снимка в новый файл в SHARED_DIR (или во временный каталог, если его нет)
+
+    Все процессы, открывшие этот путь через read_snapshot, отображают одни и те же страницы.
+    Файл удаляет вызывающий; процессы, уже отобразившие его, продолжают работать.
+
+    :param data: байты снимка
+    :return: путь к файлу
+    """
+    fd, path = tempfile.mkstemp(prefix='graph-', suffix=EXTENSION, dir=SHARED_DIR)
+    with os.fdopen(fd, 'wb') as file:
+        file.write(data)
+    return path
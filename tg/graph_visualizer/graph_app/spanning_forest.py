@@ -0,0 +1,95 @@
+"""
+Минимальный остовный лес по смежности в форме CSR.
+
+Вершины - номера 0..n-1, рёбра вершины node - targets[offsets[node]:offsets[node + 1]]
+с весами на тех же местах; неориентированное ребро записано в обе стороны. Лес
+возвращается списком рёбер (u, v, вес) по номерам вершин. Им пользуются и веб-приложение,
+и консольная программа (tg/graph.py).
+"""
+import heapq
+from itertools import repeat
+
+# minimum_spanning_forest(method='auto') выбирает алгоритм Прима, если на вершину приходится
+# не меньше стольких записей смежности, иначе - Краскала (см. benchmarks.py mst)
+PRIM_MIN_DEGREE = 150
+
+
+def minimum_spanning_forest(n, offsets, targets, weights, method='auto'):
+    """
+    Остовный лес минимального веса алгоритмом Прима или Краскала
+
+    :param method: 'prim', 'kruskal' или 'auto' - Прим, если записей смежности не меньше
+        PRIM_MIN_DEGREE * n; другие значения вызывающий отсекает заранее
+    :return: рёбра леса (u, v, вес) по номерам вершин
+    """
+    if method == 'auto':
+        method = 'prim' if len(targets) >= PRIM_MIN_DEGREE * n else 'kruskal'
+    return (prim_forest if method == 'prim' else kruskal_forest)(n, offsets, targets, weights)
+
+
+def prim_forest(n, offsets, targets, weights):
+    """
+    Алгоритм Прима, запускаемый от каждой ещё не покрытой вершины
+
+    best[вершина] - самое лёгкое известное ребро из дерева в вершину; в кучу запись
+    добавляется при каждом его улучшении, устаревшие записи пропускаются.
+
+    :return: рёбра леса (u, v, вес) по номерам вершин
+    """
+    in_tree = [False] * n
+    best = [None] * n
+    parent = [-1] * n
+    forest = []
+    for root in range(n):
+        if in_tree[root]:
+            continue
+        heap = [(0, root)]
+        while heap:
+            weight, node = heapq.heappop(heap)
+            if in_tree[node]:
+                continue
+            in_tree[node] = True
+            if parent[node] >= 0:
+                forest.append((parent[node], node, weight))
+            for edge in range(offsets[node], offsets[node + 1]):
+                target = targets[edge]
+                if not in_tree[target]:
+                    edge_weight = weights[edge]
+                    if best[target] is None or edge_weight < best[target]:
+                        best[target] = edge_weight
+                        parent[target] = node
+                        heapq.heappush(heap, (edge_weight, target))
+    return forest
+
+
+def kruskal_forest(n, offsets, targets, weights):
+    """
+    Алгоритм Краскала: номера рёбер (каждое неориентированное ребро один раз) сортируются
+    по весу, компоненты хранятся в системе непересекающихся множеств с объединением по
+    размеру и сокращением путей вдвое
+
+    :return: рёбра леса (u, v, вес) по номерам вершин
+    """
+    tails = []
+    for node in range(n):
+        tails.extend(repeat(node, offsets[node + 1] - offsets[node]))
+    order = [edge for edge in range(len(targets)) if tails[edge] < targets[edge]]
+    order.sort(key=weights.__getitem__)
+    parent = list(range(n))
+    size = [1] * n
+    forest = []
+    for edge in order:
+        a, b = tails[edge], targets[edge]
+        while parent[a] != a:
+            parent[a] = a = parent[parent[a]]
+        while parent[b] != b:
+            parent[b] = b = parent[parent[b]]
+        if a != b:
+            if size[a] < size[b]:
+                a, b = b, a
+            parent[b] = a
+            size[a] += size[b]
+            forest.append((tails[edge], targets[edge], weights[edge]))
+            if len(forest) == n - 1:
+                break
+    return forest
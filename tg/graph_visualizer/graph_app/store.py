@@ -0,0 +1,262 @@
+"""
+Хранилище рабочих графов.
+
+Каждая сессия работает со своим графом (идентификатор хранится в сессии). Постоянная копия
+лежит в базе данных (модель StoredGraph), а перед ней стоит LRU-кэш графов в памяти процесса.
+Поэтому все процессы WSGI/ASGI-сервера видят один и тот же граф, а в памяти остаются только
+недавно использованные графы.
+
+Изменения выполняются под блокировкой графа внутри процесса, а между процессами - с
+оптимистической проверкой версии: запись проходит, только если версия в базе не изменилась
+с момента чтения.
+
+Граф целиком сериализуется только при добавлении и при сжатии журнала. Каждое изменение
+записывается в базу как строка журнала (GraphChange), а процесс с устаревшей копией графа
+догоняет её, повторяя изменения из журнала, вместо того чтобы перечитывать граф целиком.
+Когда журнал становится длиннее compact_after изменений, граф сохраняется заново, а журнал
+очищается. Раскладка после отрисовки хранится отдельно от графа.
+"""
+from collections import OrderedDict
+from contextlib import contextmanager
+import json
+import threading
+import time
+
+from django.db import transaction
+from django.utils import timezone
+
+from .graph import Graph
+from .models import GraphChange, StoredGraph
+
+
+class _Entry:
+    """Граф в памяти процесса вместе с его блокировкой."""
+
+    def __init__(self):
+        self.graph = None
+        # Версия графа, сохранённого в StoredGraph.data: с неё начинается журнал изменений
+        self.base_version = 0
+        self.lock = threading.RLock()
+        self.last_used = time.monotonic()
+
+
+class GraphStore:
+    """
+    Графы по идентификатору: LRU-кэш в памяти поверх базы данных
+
+    :param max_size: сколько графов держать в памяти процесса
+    :param idle_timeout: через сколько секунд без обращений граф выгружается из памяти
+        (в базе он остаётся)
+    :param compact_after: после скольких изменений в журнале граф сохраняется целиком
+    """
+
+    def __init__(self, max_size=64, idle_timeout=1800, compact_after=500):
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.compact_after = compact_after
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, graph):
+        """Сохраняет новый граф (или перезаписывает граф с тем же graph_id) и возвращает его."""
+        with transaction.atomic():
+            StoredGraph.objects.update_or_create(
+                graph_id=graph.graph_id,
+                defaults={'version': graph.version, 'data': self._dump(graph), 'layout': ''},
+            )
+            GraphChange.objects.filter(graph_id=graph.graph_id).delete()
+        entry = self._entry(graph.graph_id)
+        with entry.lock:
+            entry.graph = graph
+            entry.base_version = graph.version
+        return graph
+
+    def create(self, directed=True, weighted=True):
+        """Создаёт и сохраняет пустой граф."""
+        return self.add(Graph(directed=directed, weighted=weighted))
+
+    def exists(self, graph_id):
+        return StoredGraph.objects.filter(graph_id=graph_id).exists()
+
+    def version(self, graph_id):
+        """Версия графа в базе или None, если такого графа нет."""
+        return StoredGraph.objects.filter(graph_id=graph_id).values_list('version', flat=True).first()
+
+    def delete(self, graph_id):
+        with self._lock:
+            self._entries.pop(graph_id, None)
+        StoredGraph.objects.filter(graph_id=graph_id).delete()
+
+    @contextmanager
+    def view(self, graph_id):
+        """
+        Граф для чтения под блокировкой
+
+        Изменять граф здесь нельзя; обновлённая при отрисовке раскладка сохраняется
+        в базу (без самого графа), чтобы после перезагрузки её не пересчитывать заново.
+        """
+        entry = self._entry(graph_id)
+        with entry.lock:
+            graph = self._refresh(entry, graph_id)
+            layout_state = (len(graph.positions), len(graph.layout_dirty))
+            yield graph
+            if (len(graph.positions), len(graph.layout_dirty)) != layout_state:
+                self._save_layout(graph)
+
+    @contextmanager
+    def edit(self, graph_id):
+        """
+        Граф для изменения под блокировкой; при выходе новая версия сохраняется в базу
+
+        Если за это время граф изменил другой процесс, изменения отбрасываются
+        и выбрасывается ValueError.
+        """
+        entry = self._entry(graph_id)
+        with entry.lock:
+            graph = self._refresh(entry, graph_id)
+            loaded_version = graph.version
+            graph.changes = []
+            try:
+                yield graph
+            except BaseException:
+                if graph.version != loaded_version:
+                    # Граф мог измениться частично - перечитаем его из базы при следующем обращении
+                    entry.graph = None
+                raise
+            finally:
+                changes, graph.changes = graph.changes, None
+            if graph.version == loaded_version:
+                return
+            if not self._save_changes(graph, loaded_version, changes):
+                entry.graph = None
+                raise ValueError("Граф был изменён в другом окне, повторите действие")
+            if graph.version - entry.base_version >= self.compact_after:
+                self._compact(entry, graph)
+
+    def _entry(self, graph_id):
+        """Запись кэша для graph_id (создаётся при необходимости); заодно выгружает простаивающие графы."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(graph_id)
+            if entry is None:
+                entry = self._entries[graph_id] = _Entry()
+            entry.last_used = now
+            self._entries.move_to_end(graph_id)
+
+            while self._entries:
+                oldest_id, oldest = next(iter(self._entries.items()))
+                if len(self._entries) <= self.max_size and now - oldest.last_used <= self.idle_timeout:
+                    break
+                if oldest is entry:
+                    break
+                del self._entries[oldest_id]
+            return entry
+
+    def _refresh(self, entry, graph_id):
+        """
+        Возвращает актуальный граф записи
+
+        Если другой процесс изменил граф, копия в памяти догоняет его по журналу изменений;
+        граф перечитывается целиком, только если его нет в памяти или нужная часть журнала
+        уже сжата.
+        """
+        version = self.version(graph_id)
+        if version is None:
+            entry.graph = None
+            raise ValueError(f"Граф {graph_id} не найден")
+        graph = entry.graph
+        if graph is not None and graph.version == version:
+            return graph
+        if graph is not None and graph.version < version:
+            changes = self._changes(graph_id, graph.version, version)
+            if changes is not None:
+                try:
+                    for change in changes:
+                        graph.apply_change(change)
+                except ValueError:
+                    # Копия разошлась с журналом - перечитаем граф целиком
+                    pass
+                else:
+                    return graph
+        entry.graph = None
+        entry.graph, entry.base_version = self._load(graph_id)
+        return entry.graph
+
+    def _load(self, graph_id):
+        """Читает граф из базы: сохранённый граф, затем изменения из журнала и раскладку."""
+        for _ in range(3):
+            stored = StoredGraph.objects.filter(graph_id=graph_id).first()
+            if stored is None:
+                raise ValueError(f"Граф {graph_id} не найден")
+            graph = Graph.from_dict(json.loads(stored.data))
+            base_version = graph.version
+            changes = self._changes(graph_id, base_version, stored.version)
+            if changes is None:
+                # Журнал сжали между запросами - граф в базе уже новее прочитанного
+                continue
+            layout = json.loads(stored.layout) if stored.layout else None
+            for change in changes:
+                if layout is not None and layout['version'] == graph.version:
+                    self._apply_layout(graph, layout)
+                graph.apply_change(change)
+            if layout is not None and layout['version'] == graph.version:
+                self._apply_layout(graph, layout)
+            return graph, base_version
+        raise ValueError(f"Журнал изменений графа {graph_id} повреждён")
+
+    @staticmethod
+    def _changes(graph_id, from_version, to_version):
+        """Изменения из журнала от from_version до to_version или None, если части журнала уже нет."""
+        rows = list(GraphChange.objects.filter(graph_id=graph_id, version__gt=from_version,
+                                               version__lte=to_version)
+                    .order_by('version').values_list('version', 'change'))
+        if [version for version, _ in rows] != list(range(from_version + 1, to_version + 1)):
+            return None
+        return [json.loads(change) for _, change in rows]
+
+    @staticmethod
+    def _apply_layout(graph, layout):
+        graph.positions = {node: tuple(xy) for node, xy in layout['positions'].items()}
+        graph.layout_dirty = set(layout['layout_dirty'])
+
+    def _save_changes(self, graph, expected_version, changes):
+        """
+        Дописывает изменения в журнал, если версия в базе равна expected_version
+
+        :return: True при успехе
+        """
+        with transaction.atomic():
+            updated = StoredGraph.objects.filter(graph_id=graph.graph_id, version=expected_version).update(
+                version=graph.version, updated_at=timezone.now())
+            if updated != 1:
+                return False
+            GraphChange.objects.bulk_create(
+                GraphChange(graph_id=graph.graph_id, version=version, change=json.dumps(change, ensure_ascii=False))
+                for version, change in enumerate(changes, expected_version + 1))
+        return True
+
+    def _compact(self, entry, graph):
+        """Сохраняет граф целиком и удаляет из журнала изменения, которые в него вошли."""
+        with transaction.atomic():
+            updated = StoredGraph.objects.filter(graph_id=graph.graph_id, version=graph.version).update(
+                data=self._dump(graph), layout='', updated_at=timezone.now())
+            if updated == 1:
+                GraphChange.objects.filter(graph_id=graph.graph_id, version__lte=graph.version).delete()
+                entry.base_version = graph.version
+
+    def _save_layout(self, graph):
+        """Сохраняет только раскладку графа, если версия в базе не изменилась."""
+        layout = {
+            'version': graph.version,
+            'positions': {node: list(xy) for node, xy in graph.positions.items()},
+            'layout_dirty': list(graph.layout_dirty),
+        }
+        StoredGraph.objects.filter(graph_id=graph.graph_id, version=graph.version).update(
+            layout=json.dumps(layout, ensure_ascii=False))
+
+    @staticmethod
+    def _dump(graph):
+        return json.dumps(graph.to_dict(), ensure_ascii=False)
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,386 @@
+import io
+import json
+import random
+import threading
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+import matplotlib.pyplot as plt
+import networkx as nx
+
+from .graph import FrozenGraph, Graph
+from .loader import load_graph_json
+from .models import GraphChange, StoredGraph
+from .rendering import draw_edges
+from .store import GraphStore
+from . import flow, snapshot, views
+
+
+def _chunks(text, size):
+    data = text.encode('utf-8')
+    return [data[start:start + size] for start in range(0, len(data), size)]
+
+
+class LoaderTest(SimpleTestCase):
+    """Потоковый загрузчик JSON: результат и позиции ошибок не зависят от разбиения файла."""
+
+    def setUp(self):
+        edges = ',\n'.join(f'  {{"from": "Москва", "to": "Клиент{i % 3}", "cost": {i}, "delivery_time": 2}}'
+                           for i in range(40))
+        self.text = ('{"nodes": {"Москва": "warehouse", "Клиент0": "client", "Клиент1": "client", '
+                     '"Клиент2": "client"},\n "edges": [\n' + edges + '\n]}')
+
+    def test_chunked_load(self):
+        expected = json.loads(self.text)
+        for size in (7, 64, 1 << 16):
+            with self.subTest(size=size):
+                graph = load_graph_json(_chunks(self.text, size))
+                self.assertEqual(graph.nodes, expected['nodes'])
+                self.assertEqual(len(graph.edges), 3)
+                self.assertEqual(graph.out_edges['Москва']['Клиент0'], (39, 2))
+
+    def test_error_position(self):
+        # Пропущенная запятая в последнем ребре: строка и символ считаются от начала файла,
+        # как у json.loads, в каком бы фрагменте ни оказалась ошибка
+        broken = self.text.replace('"cost": 39,', '"cost": 39')
+        with self.assertRaises(json.JSONDecodeError) as expected:
+            json.loads(broken)
+        for size in (7, 64, 1 << 16):
+            with self.subTest(size=size):
+                with self.assertRaises(json.JSONDecodeError) as error:
+                    load_graph_json(_chunks(broken, size))
+                self.assertEqual((error.exception.lineno, error.exception.pos),
+                                 (expected.exception.lineno, expected.exception.pos))
+                self.assertIn(f"строка {expected.exception.lineno}, символ {expected.exception.pos}",
+                              str(error.exception))
+
+    def test_trailing_data(self):
+        with self.assertRaisesMessage(json.JSONDecodeError, "Лишние данные после конца документа"):
+            load_graph_json(_chunks(self.text + ' {}', 64))
+
+
+class SnapshotTest(SimpleTestCase):
+    """Двоичный снимок графа логистики: сохранение, загрузка и проверка повреждённых столбцов."""
+
+    def test_round_trip(self):
+        for directed in (True, False):
+            with self.subTest(directed=directed):
+                graph = Graph(directed=directed)
+                graph.add_node('Москва', 'warehouse')
+                graph.add_node('Клиент1', 'client')
+                graph.add_node('Клиент2', 'client')
+                graph.add_edge('Москва', 'Клиент1', 500, 24, capacity=10)
+                graph.add_edge('Клиент1', 'Клиент2', 2.5, 3)
+                buffer = io.BytesIO()
+                graph.save_snapshot(buffer)
+                loaded = Graph.load_snapshot(buffer.getvalue())
+                self.assertEqual(loaded.nodes, graph.nodes)
+                self.assertEqual(loaded.edges, graph.edges)
+                self.assertEqual(loaded.capacities, graph.capacities)
+                self.assertEqual(loaded.directed, directed)
+
+    @staticmethod
+    def _snapshot(offsets, targets, costs, capacities=None, directed=True):
+        # Снимок графа из трёх вершин a, b, c с временем доставки 1 у всех рёбер
+        columns = [(snapshot.column_kind(costs), costs), (snapshot.INT64, [1] * len(targets))]
+        if capacities is not None:
+            columns.append((snapshot.column_kind(capacities), capacities))
+        buffer = io.BytesIO()
+        snapshot.write_snapshot(buffer, ['a', 'b', 'c'], offsets, targets, columns, [1, 0, 0],
+                                directed=directed, weighted=True)
+        return buffer.getvalue()
+
+    def test_corrupted_columns(self):
+        cases = [
+            ("номер вершины вне диапазона", ([0, 1, 2, 2], [1, 3], [1, 2])),
+            ("смещения рёбер не упорядочены", ([0, 2, 1, 2], [1, 2], [1, 2])),
+            ("стоимость и время доставки должны быть неотрицательными", ([0, 1, 2, 2], [1, 2], [1, -2])),
+            ("стоимость и время доставки должны быть неотрицательными", ([0, 1, 2, 2], [1, 2], [float('nan'), 2.0])),
+            ("пропускная способность должна быть неотрицательной или -1", ([0, 1, 2, 2], [1, 2], [1, 2], [-2, 5])),
+            ("пропускная способность должна быть неотрицательной или -1",
+             ([0, 1, 2, 2], [1, 2], [1, 2], [float('nan'), 5.0])),
+            ("у вершины a повторяются рёбра", ([0, 2, 2, 2], [1, 1], [1, 2])),
+        ]
+        for message, args in cases:
+            with self.subTest(args=args):
+                with self.assertRaisesMessage(ValueError, "Снимок графа повреждён: " + message):
+                    Graph.load_snapshot(self._snapshot(*args))
+
+    def test_one_sided_undirected_edge(self):
+        with self.assertRaisesMessage(ValueError, "записано только в одном направлении"):
+            Graph.load_snapshot(self._snapshot([0, 1, 1, 1], [1], [5], directed=False))
+
+    def test_unlimited_capacity_sentinel(self):
+        graph = Graph.load_snapshot(self._snapshot([0, 1, 2, 2], [1, 2], [1, 2], [-1, 5]))
+        self.assertEqual(graph.capacities, {('b', 'c'): 5})
+
+    def test_not_a_snapshot(self):
+        with self.assertRaisesMessage(ValueError, "Файл не является снимком графа"):
+            Graph.load_snapshot(b'garbage')
+
+
+def _random_logistics_graph(rng, directed):
+    """Случайный граф логистики: первая треть вершин - склады, у части рёбер есть пропускная способность."""
+    graph = Graph(directed=directed)
+    node_count = rng.randint(2, 9)
+    for i in range(node_count):
+        graph.add_node(f'n{i}', 'warehouse' if i < max(1, node_count // 3) else 'client')
+    for _ in range(rng.randint(0, 4 * node_count)):
+        node1, node2 = rng.sample(range(node_count), 2)
+        graph.add_edge(f'n{node1}', f'n{node2}', rng.randint(0, 20), rng.randint(1, 5),
+                       rng.choice([None, rng.randint(0, 10)]))
+    return graph
+
+
+class MinCostFlowTest(SimpleTestCase):
+    """План поставок минимальной стоимости сверяется с networkx.max_flow_min_cost."""
+
+    def test_matches_networkx(self):
+        rng = random.Random(11)
+        for case in range(60):
+            graph = _random_logistics_graph(rng, directed=case % 4 != 0)
+            warehouses = [node for node, node_type in graph.nodes.items() if node_type == 'warehouse']
+            demands = {node: rng.randint(0, 15) for node, node_type in graph.nodes.items() if node_type == 'client'}
+            supplies = None if case % 2 else {node: rng.choice([None, rng.randint(0, 20)]) for node in warehouses}
+
+            # Рёбра без пропускной способности в min_cost_flow не ограничены
+            unlimited = sum(demands.values())
+            reference = nx.DiGraph()
+            reference.add_nodes_from(['source', 'sink', *graph.nodes])
+            for node1, node2, cost, _ in graph.edges:
+                reference.add_edge(node1, node2, capacity=graph.capacities.get((node1, node2), unlimited), weight=cost)
+            for node in warehouses:
+                supply = None if supplies is None else supplies[node]
+                reference.add_edge('source', node, capacity=unlimited if supply is None else supply, weight=0)
+            for node, demand in demands.items():
+                reference.add_edge(node, 'sink', capacity=demand, weight=0)
+            reference_flow = nx.max_flow_min_cost(reference, 'source', 'sink')
+            expected = (sum(reference_flow['source'].values()), nx.cost_of_flow(reference, reference_flow))
+
+            for method in ('successive_shortest_paths', 'cost_scaling'):
+                with self.subTest(case=case, method=method):
+                    delivered, cost, flows = graph.min_cost_flow(demands, supplies, method)
+                    self.assertEqual((delivered, cost), expected)
+                    self._check_plan(graph, demands, supplies, delivered, cost, flows)
+
+    def _check_plan(self, graph, demands, supplies, delivered, cost, flows):
+        balance = dict.fromkeys(graph.nodes, 0)
+        total_cost = 0
+        for node1, targets in flows.items():
+            for node2, amount in targets.items():
+                self.assertLessEqual(amount, graph.capacities.get((node1, node2), amount))
+                total_cost += amount * graph.out_edges[node1][node2][0]
+                balance[node1] -= amount
+                balance[node2] += amount
+        self.assertEqual(total_cost, cost)
+        for node, amount in balance.items():
+            if graph.nodes[node] == 'client':
+                self.assertTrue(0 <= amount <= demands[node], node)
+            else:
+                supply = None if supplies is None else supplies.get(node)
+                self.assertTrue(amount <= 0 and (supply is None or -amount <= supply), node)
+        self.assertEqual(sum(amount for amount in balance.values() if amount > 0), delivered)
+
+    def test_invalid_amounts(self):
+        graph = Graph()
+        graph.add_node('Склад', 'warehouse')
+        graph.add_node('Клиент', 'client')
+        graph.add_edge('Склад', 'Клиент', 10, 1)
+        for demands, supplies in (({'Клиент': None}, None), ({'Клиент': -1}, None),
+                                  ({'Клиент': 1}, {'Склад': True}), ({'Нет': 1}, None)):
+            with self.subTest(demands=demands, supplies=supplies):
+                with self.assertRaises(ValueError):
+                    graph.min_cost_flow(demands, supplies)
+        self.assertEqual(graph.min_cost_flow({'Клиент': 3}, {'Склад': None}), (3, 30, {'Склад': {'Клиент': 3}}))
+
+
+class SpanningForestTest(SimpleTestCase):
+    """Минимальный остовный лес сверяется с networkx.minimum_spanning_tree."""
+
+    def test_matches_networkx(self):
+        rng = random.Random(4)
+        for case in range(40):
+            graph = _random_logistics_graph(rng, directed=False)
+            reference = nx.Graph()
+            reference.add_nodes_from(graph.nodes)
+            reference.add_weighted_edges_from((node1, node2, cost) for node1, node2, cost, _ in graph.edges)
+            expected = nx.minimum_spanning_tree(reference).size(weight='weight')
+            for method in ('prim', 'kruskal', 'auto'):
+                with self.subTest(case=case, method=method):
+                    forest, total = graph.minimum_spanning_forest(method)
+                    self.assertEqual(total, expected)
+                    tree = nx.Graph()
+                    tree.add_nodes_from(graph.nodes)
+                    tree.add_edges_from((node1, node2) for node1, node2, _ in forest)
+                    self.assertTrue(nx.is_forest(tree))
+                    self.assertEqual(nx.number_connected_components(tree), nx.number_connected_components(reference))
+                    for node1, node2, cost in forest:
+                        self.assertEqual(graph.out_edges[node1][node2][0], cost)
+
+    def test_directed_graph(self):
+        with self.assertRaisesMessage(ValueError, "только для неориентированных"):
+            Graph(directed=True).minimum_spanning_forest()
+
+
+class FlowSessionTest(SimpleTestCase):
+    """Поток сессии после каждой правки совпадает с потоком, посчитанным заново."""
+
+    def test_edits_match_recomputed_flow(self):
+        rng = random.Random(5)
+        for case in range(40):
+            graph = _random_logistics_graph(rng, directed=case % 3 != 0)
+            names = list(graph.nodes)
+            source, sink = names[0], names[-1]
+            session = graph.flow_session(source, sink, flow.METHODS[case % len(flow.METHODS)])
+            for step in range(20):
+                node1, node2 = rng.sample(names, 2)
+                action = rng.random()
+                if action < 0.4:
+                    session.add_edge(node1, node2, rng.randint(0, 10), 1, rng.choice([None, rng.randint(0, 10)]))
+                elif action < 0.65 and graph.edges:
+                    session.remove_edge(*rng.choice(graph.edges)[:2])
+                elif action < 0.9 and graph.edges:
+                    session.set_capacity(*rng.choice(graph.edges)[:2], rng.choice([None, rng.randint(0, 10)]))
+                else:
+                    # Правка в обход сессии: поток строится заново
+                    graph.add_edge(node1, node2, rng.randint(0, 10), 1)
+                with self.subTest(case=case, step=step):
+                    self.assertEqual(session.value, graph.max_flow(source, sink)[0])
+                    self._check_flow(graph, session)
+
+    def _check_flow(self, graph, session):
+        balance = dict.fromkeys(graph.nodes, 0)
+        for node1, targets in session.flows().items():
+            for node2, amount in targets.items():
+                capacity = graph.capacities.get((node1, node2), graph.out_edges[node1][node2][0])
+                self.assertLessEqual(amount, capacity)
+                balance[node1] -= amount
+                balance[node2] += amount
+        self.assertEqual(balance.pop(session.sink), session.value)
+        self.assertEqual(balance.pop(session.source), -session.value)
+        self.assertEqual(set(balance.values()) - {0}, set())
+
+    def test_source_is_sink(self):
+        graph = Graph()
+        for node in ('Склад', 'Клиент'):
+            graph.add_node(node, 'client')
+        graph.add_edge('Склад', 'Клиент', 10, 1)
+        graph.add_edge('Клиент', 'Склад', 10, 1)
+        for method in flow.METHODS:
+            with self.subTest(method=method):
+                self.assertEqual(graph.max_flow('Склад', 'Склад', method), (0, {}))
+                session = graph.flow_session('Склад', 'Склад', method)
+                self.assertEqual(session.set_capacity('Склад', 'Клиент', 20), 0)
+                self.assertEqual(session.remove_edge('Клиент', 'Склад'), 0)
+                self.assertEqual(session.flows(), {})
+                graph.add_edge('Клиент', 'Склад', 10, 1)
+
+
+class GraphStoreTest(TestCase):
+    """Хранилище графов: два экземпляра GraphStore изображают два процесса сервера."""
+
+    def setUp(self):
+        self.first = GraphStore()
+        self.second = GraphStore()
+        self.graph_id = self.first.create().graph_id
+        with self.first.edit(self.graph_id) as graph:
+            graph.add_node('Склад', 'warehouse')
+            graph.add_node('Клиент', 'client')
+
+    def test_edit_conflict(self):
+        with self.assertRaisesMessage(ValueError, "Граф был изменён в другом окне"):
+            with self.first.edit(self.graph_id) as graph:
+                with self.second.edit(self.graph_id) as other:
+                    other.add_edge('Склад', 'Клиент', 100, 5)
+                graph.remove_node('Клиент')
+        # Изменение, которое записалось первым, сохранилось, а проигравшее - отброшено
+        with self.first.view(self.graph_id) as graph:
+            self.assertEqual(graph.edges, [('Склад', 'Клиент', 100, 5)])
+            self.assertEqual(graph.version, StoredGraph.objects.get(pk=self.graph_id).version)
+
+    def test_edit_is_journaled(self):
+        stored = StoredGraph.objects.get(pk=self.graph_id)
+        with self.first.edit(self.graph_id) as graph:
+            graph.add_edge('Склад', 'Клиент', 100, 5, capacity=7)
+        self.assertEqual(StoredGraph.objects.get(pk=self.graph_id).data, stored.data)
+        self.assertEqual(GraphChange.objects.filter(graph_id=self.graph_id).count(), 3)
+
+    def test_stale_copy_replays_journal(self):
+        with self.second.view(self.graph_id):
+            pass
+        with self.first.edit(self.graph_id) as graph:
+            graph.add_edge('Склад', 'Клиент', 100, 5, capacity=7)
+            graph.set_capacity('Склад', 'Клиент', None)
+        with mock.patch.object(Graph, 'from_dict', side_effect=AssertionError("граф перечитан целиком")):
+            with self.second.view(self.graph_id) as graph:
+                self.assertEqual(graph.edges, [('Склад', 'Клиент', 100, 5)])
+                self.assertEqual(graph.capacities, {})
+
+    def test_compaction(self):
+        store = GraphStore(compact_after=3)
+        with store.edit(self.graph_id) as graph:
+            graph.add_node('Клиент2', 'client')
+            graph.add_edge('Склад', 'Клиент2', 10, 1)
+        self.assertFalse(GraphChange.objects.filter(graph_id=self.graph_id).exists())
+        with GraphStore().view(self.graph_id) as graph:
+            self.assertEqual(sorted(graph.nodes), ['Клиент', 'Клиент2', 'Склад'])
+            self.assertEqual(graph.edges, [('Склад', 'Клиент2', 10, 1)])
+
+    def test_layout_is_saved_separately(self):
+        stored = StoredGraph.objects.get(pk=self.graph_id)
+        with self.first.view(self.graph_id) as graph:
+            graph.positions = {'Склад': (0.0, 1.0), 'Клиент': (1.0, 0.0)}
+            graph.layout_dirty.clear()
+        self.assertEqual(StoredGraph.objects.get(pk=self.graph_id).data, stored.data)
+        with GraphStore().view(self.graph_id) as graph:
+            self.assertEqual(graph.positions, {'Склад': (0.0, 1.0), 'Клиент': (1.0, 0.0)})
+            self.assertEqual(graph.layout_dirty, set())
+
+    def test_missing_graph(self):
+        self.first.delete(self.graph_id)
+        with self.assertRaisesMessage(ValueError, "не найден"):
+            with self.second.view(self.graph_id):
+                pass
+
+
+class DrawEdgesTest(SimpleTestCase):
+    def test_self_loops_are_drawn(self):
+        G = nx.MultiDiGraph()
+        G.add_edges_from([('a', 'b'), ('b', 'a'), ('a', 'c'), ('c', 'c')])
+        figure = plt.figure()
+        self.addCleanup(plt.close, figure)
+        draw_edges(G, {'a': (0.0, 0.0), 'b': (1.0, 0.0), 'c': (0.0, 1.0)})
+        ax = figure.gca()
+        # Прямые рёбра, дуги в обе стороны и петля c - c
+        self.assertEqual(len(ax.collections), 3)
+        self.assertEqual(len(ax.patches), 1)
+
+
+class VisualizeGraphTest(TestCase):
+    def test_render_does_not_hold_graph_lock(self):
+        rendered = []
+
+        def render_graph(graph, path, **options):
+            # Другой поток (другой запрос) должен получить граф, пока рисуется изображение
+            lock = views.graph_store._entry(graph.graph_id).lock
+            acquired = []
+
+            def try_lock():
+                acquired.append(lock.acquire(blocking=False))
+                if acquired[0]:
+                    lock.release()
+
+            thread = threading.Thread(target=try_lock)
+            thread.start()
+            thread.join()
+            rendered.append((type(graph), acquired[0], sorted(options['pos'])))
+            return ''
+
+        with mock.patch.object(views, 'render_graph', side_effect=render_graph):
+            self.client.get(reverse('visualize_graph'))
+            graph_id = self.client.session['graph_id']
+            with views.graph_store.edit(graph_id) as graph:
+                graph.add_node('Склад', 'warehouse')
+            self.client.get(reverse('visualize_graph'))
+        self.assertEqual(rendered, [(FrozenGraph, True, []), (FrozenGraph, True, ['Склад'])])
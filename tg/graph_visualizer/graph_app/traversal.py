@@ -0,0 +1,56 @@
+"""
+Обход графа в глубину без рекурсии.
+
+depth_first хранит путь от стартовой вершины и итераторы соседей его вершин в явных
+стеках, поэтому глубина обхода не ограничена стеком вызовов Python: цепочка из миллиона
+вершин проходится так же, как из десяти. Обход - генератор событий, и вызывающий код
+может остановить его, просто перестав читать.
+"""
+
+# События обхода
+ENTER = 'enter'  # вершина пройдена впервые (прямой порядок)
+LEAVE = 'leave'  # все соседи вершины обработаны (обратный порядок)
+SKIP = 'skip'    # ребро из последней вершины пути в уже пройденную вершину
+
+
+def depth_first(start, neighbors, visited=None, simple_paths=False):
+    """
+    Обход в глубину из start
+
+    События - кортежи (событие, вершина, путь). path - список вершин от start до текущей:
+    при ENTER и LEAVE он заканчивается самой вершиной, при SKIP - вершиной, из которой
+    ведёт ребро. Это один и тот же изменяемый список, его нужно копировать, если он
+    нужен после следующего события.
+
+    :param neighbors: функция вершина -> соседи в порядке обхода; вызывается один раз
+        при каждом входе в вершину
+    :param visited: множество уже пройденных вершин (в них обход не заходит), пополняется
+        при обходе; можно передать одно множество в несколько обходов
+    :param simple_paths: если True, вершина убирается из visited при LEAVE, и обход проходит
+        все простые пути из start (их число может расти экспоненциально)
+    :return: генератор событий
+    """
+    if visited is None:
+        visited = set()
+    visited.add(start)
+    path = [start]
+    iterators = [iter(neighbors(start))]
+    yield ENTER, start, path
+    while iterators:
+        for neighbor in iterators[-1]:
+            if neighbor in visited:
+                yield SKIP, neighbor, path
+            else:
+                visited.add(neighbor)
+                path.append(neighbor)
+                iterators.append(iter(neighbors(neighbor)))
+                yield ENTER, neighbor, path
+                break
+        else:
+            # Соседи последней вершины пути закончились
+            iterators.pop()
+            node = path[-1]
+            yield LEAVE, node, path
+            path.pop()
+            if simple_paths:
+                visited.discard(node)
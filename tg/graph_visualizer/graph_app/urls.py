@@ -8,6 +8,8 @@ urlpatterns = [
     path('add_edge/', views.add_edge, name='add_edge'),
     path('remove_edge/', views.remove_edge, name='remove_edge'),
     path('load_graph/', views.load_graph, name='load_graph'),
+    path('download_graph/', views.download_graph, name='download_graph'),
     path('create_empty_graph/', views.create_empty_graph, name='create_empty_graph'),
     path('find_shortest_path/', views.find_shortest_path, name='find_shortest_path'),
+    path('graph_data/', views.graph_data, name='graph_data'),
 ]
@@ -1,14 +1,27 @@
 from django.shortcuts import render, redirect
 from django.contrib import messages
-import networkx as nx
-import matplotlib.pyplot as plt
-import io
-import base64
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+from django.views.decorators.http import condition, require_GET
+from .cache import RenderCache
 from .graph import Graph
+from .layout import update_layout
+from .loader import load_graph_json
+from .rendering import render_graph
+from . import snapshot
+from .store import GraphStore
+import io
 import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Графы сессий: LRU-кэш в памяти процесса поверх базы данных
+graph_store = GraphStore(max_size=getattr(settings, 'GRAPH_STORE_MAX_GRAPHS', 64),
+                         idle_timeout=getattr(settings, 'GRAPH_STORE_IDLE_SECONDS', 1800))
 
-# Глобальная переменная для хранения текущего графа
-current_graph = None
+# Кэш отрисованных изображений по (граф, версия, выделенный путь)
+render_cache = RenderCache(max_size=getattr(settings, 'GRAPH_RENDER_CACHE_SIZE', 32))
 
 def index(request):
     return render(request, 'graph_app/index.html')
@@ -43,141 +56,95 @@ def validate_edge_input(from_vertex, to_vertex, weight, is_weighted):
     return errors
 
 def visualize_graph(request):
-    global current_graph
-    if current_graph is None:
-        # Создаем пустой граф при первом открытии
-        current_graph = Graph(directed=True, weighted=True)
-
-    # Отладочная печать
-    print("Визуализация графа:")
-    print("Вершины:", current_graph.nodes)
-    print("Ребра:", current_graph.edges)
-
-    # Конвертируем граф в NetworkX граф для визуализации
-    G = nx.MultiDiGraph()
-    
-    # Добавляем вершины и ребра в NetworkX граф
-    for node, node_type in current_graph.nodes.items():
-        G.add_node(node, node_type=node_type)
-    
-    for edge in current_graph.edges:
-        # Теперь edge содержит 4 элемента: from_vertex, to_vertex, cost, delivery_time
-        G.add_edge(edge[0], edge[1], cost=edge[2], delivery_time=edge[3])
+    # Создаем пустой граф при первом открытии
+    path = request.session.get('shortest_path')
+    with graph_store.view(get_graph_id(request)) as current_graph:
+        cache_key = RenderCache.make_key(current_graph, path)
+        graphic = render_cache.get(cache_key)
+        if graphic is None:
+            # Под блокировкой только раскладка и неизменяемая копия,
+            # а рисование идёт уже без блокировки графа
+            pos = dict(update_layout(
+                current_graph, approximate_threshold=getattr(settings, 'GRAPH_LAYOUT_APPROXIMATE_THRESHOLD', 2000)))
+            current_graph = current_graph.freeze()
+    if graphic is None:
+        graphic = render_graph(current_graph, path, pos=pos,
+                               lod_node_threshold=getattr(settings, 'GRAPH_LOD_NODE_THRESHOLD', 500),
+                               lod_label_threshold=getattr(settings, 'GRAPH_LOD_LABEL_THRESHOLD', 300))
+        render_cache.put(cache_key, graphic)
 
-    # Создаем визуализацию
-    plt.figure(figsize=(16, 12), dpi=100)
-    
-    # Улучшенное размещение вершин с несколькими стратегиями
-    warehouse_nodes = [node for node, attr in G.nodes(data=True) if attr.get('node_type') == 'warehouse']
-    client_nodes = [node for node, attr in G.nodes(data=True) if attr.get('node_type') == 'client']
-    
-    # Используем spring_layout с параметрами для лучшего разделения вершин
-    pos = nx.spring_layout(G, k=4, iterations=50, seed=42)
-    
-    # Рисуем узлы разных типов разными цветами
-    if warehouse_nodes:
-        nx.draw_networkx_nodes(G, pos, nodelist=warehouse_nodes, node_color='lightblue', 
-                             node_size=500, label='Склады')
-    
-    if client_nodes:
-        nx.draw_networkx_nodes(G, pos, nodelist=client_nodes, node_color='lightgreen', 
-                             node_size=500, label='Клиенты')
-    
-    # Рисуем веса рёбер
-    if current_graph.weighted:
-        # Добавляем метки стоимости
-        edge_labels_cost = {(edge[0], edge[1]): f"{edge[2]} руб." for edge in current_graph.edges}
-        nx.draw_networkx_edge_labels(G, pos, 
-                                     edge_labels=edge_labels_cost, 
-                                     label_pos=0.8,  
-                                     font_size=6, 
-                                     font_color='red',
-                                     bbox=dict(facecolor='white', edgecolor='none', alpha=0.5))
-        
-        # Добавляем метки времени доставки
-        edge_labels_time = {(edge[0], edge[1]): f"{edge[3]} ч." for edge in current_graph.edges}
-        nx.draw_networkx_edge_labels(G, pos, 
-                                     edge_labels=edge_labels_time, 
-                                     label_pos=0.2,  
-                                     font_size=6, 
-                                     font_color='blue',
-                                     bbox=dict(facecolor='white', edgecolor='none', alpha=0.5))
-    
-    # Рисуем рёбра с изогнутыми линиями для встречных направлений
-    for u, v, data in G.edges(data=True):
-        # Проверяем, есть ли обратное ребро
-        if G.has_edge(v, u):
-            # Рисуем изогнутые рёбра для встречных направлений
-            nx.draw_networkx_edges(G, pos, 
-                                   edgelist=[(u, v)], 
-                                   edge_color='gray', 
-                                   arrows=True, 
-                                   arrowsize=20,
-                                   connectionstyle=f'arc3,rad=0.2',  # Изгиб вправо
-                                   width=1)
-            nx.draw_networkx_edges(G, pos, 
-                                   edgelist=[(v, u)], 
-                                   edge_color='gray', 
-                                   arrows=True, 
-                                   arrowsize=20,
-                                   connectionstyle=f'arc3,rad=-0.2',  # Изгиб влево
-                                   width=1)
-        else:
-            # Для однонаправленных рёбер - обычная стрелка
-            nx.draw_networkx_edges(G, pos, 
-                                   edgelist=[(u, v)], 
-                                   edge_color='gray', 
-                                   arrows=True, 
-                                   arrowsize=20,
-                                   width=1)
-    
-    # Рисуем метки узлов
-    nx.draw_networkx_labels(G, pos, font_size=8, font_weight="bold")
-    
-    # Добавляем легенду
-    plt.legend(loc='best', fontsize=12)
-    
-    # Проверяем, есть ли найденный путь для выделения
-    if 'shortest_path' in request.session:
-        path = request.session['shortest_path']
-        print("Найденный путь:", path)  # Отладочная печать
-        
-        # Выделяем вершины найденного пути красным
-        path_nodes = nx.draw_networkx_nodes(G, pos, 
-                                            nodelist=path, 
-                                            node_color='red', 
-                                            node_size=600, 
-                                            label='Путь')
-        
-        # Выделяем рёбра найденного пути красным
-        path_edges = list(zip(path, path[1:]))
-        print("Рёбра пути:", path_edges)  # Отладочная печать
-        nx.draw_networkx_edges(G, pos, 
-                               edgelist=path_edges, 
-                               edge_color='red', 
-                               arrows=True, 
-                               arrowsize=25,
-                               width=2)
-    
-    # Настраиваем отображение
-    plt.axis('off')
-    
-    # Сохраняем график в память
-    buffer = io.BytesIO()
-    plt.savefig(buffer, format='png', bbox_inches='tight', dpi=100)
-    plt.close()
-    
-    # Кодируем изображение в base64
-    graphic = base64.b64encode(buffer.getvalue()).decode()
-    
     return render(request, 'graph_app/visualize.html', {
         'graphic': graphic,
         'current_graph': current_graph
     })
 
+def get_graph_id(request):
+    """Возвращает идентификатор графа сессии, создавая пустой граф при первом обращении."""
+    graph_id = request.session.get('graph_id')
+    if graph_id is None or not graph_store.exists(graph_id):
+        graph_id = graph_store.create(directed=True, weighted=True).graph_id
+        request.session['graph_id'] = graph_id
+    return graph_id
+
+def replace_session_graph(request, graph):
+    """Делает graph графом сессии; прежний граф удаляется из хранилища."""
+    previous_id = request.session.get('graph_id')
+    graph_store.add(graph)
+    request.session['graph_id'] = graph.graph_id
+    request.session.pop('shortest_path', None)
+    if previous_id and previous_id != graph.graph_id:
+        graph_store.delete(previous_id)
+
+def graph_etag(request):
+    graph_id = get_graph_id(request)
+    return f'"{graph_id}-{graph_store.version(graph_id)}"'
+
+@require_GET
+@condition(etag_func=graph_etag)
+def graph_data(request):
+    """
+    Отдаёт граф в JSON для отрисовки на стороне браузера: вершины с типами и координатами
+    раскладки, рёбра со стоимостью и временем доставки
+
+    ETag строится по (graph_id, version), поэтому повторный запрос с If-None-Match
+    к неизменённому графу получает 304 без тела. Ответ формируется потоково, пачками.
+    """
+    with graph_store.view(get_graph_id(request)) as graph:
+        positions = dict(update_layout(
+            graph, approximate_threshold=getattr(settings, 'GRAPH_LAYOUT_APPROXIMATE_THRESHOLD', 2000)))
+        # Снимок состояния: последующие изменения графа не затрагивают уже начатый ответ
+        nodes = list(graph.nodes.items())
+        edges = graph.edges
+        header = {
+            'graph_id': graph.graph_id,
+            'version': graph.version,
+            'directed': graph.directed,
+            'weighted': graph.weighted,
+        }
+    return StreamingHttpResponse(stream_graph_json(header, nodes, edges, positions),
+                                 content_type='application/json; charset=utf-8')
+
+def stream_graph_json(header, nodes, edges, positions, batch_size=1000):
+    """Генерирует JSON-документ графа по частям."""
+    yield json.dumps(header, ensure_ascii=False)[:-1] + ', "nodes": ['
+    for start in range(0, len(nodes), batch_size):
+        items = []
+        for node, node_type in nodes[start:start + batch_size]:
+            x, y = positions.get(node, (None, None))
+            items.append(json.dumps({'id': node, 'type': node_type, 'x': x, 'y': y}, ensure_ascii=False))
+        yield (',' if start else '') + ','.join(items)
+    yield '], "edges": ['
+    for start in range(0, len(edges), batch_size):
+        items = [
+            json.dumps({'from': edge[0], 'to': edge[1], 'cost': edge[2], 'delivery_time': edge[3]},
+                       ensure_ascii=False)
+            for edge in edges[start:start + batch_size]
+        ]
+        yield (',' if start else '') + ','.join(items)
+    yield ']}'
+
 def add_vertex(request):
-    global current_graph
-    if request.method == 'POST' and current_graph is not None:
+    if request.method == 'POST':
         try:
             vertex_name = request.POST.get('vertex_name')
             vertex_type = request.POST.get('vertex_type')
@@ -190,7 +157,8 @@ def add_vertex(request):
                 messages.error(request, 'Необходимо указать корректный тип вершины (склад или клиент)')
                 return redirect('visualize_graph')
             
-            current_graph.add_node(vertex_name, vertex_type)
+            with graph_store.edit(get_graph_id(request)) as current_graph:
+                current_graph.add_node(vertex_name, vertex_type)
             messages.success(request, f'Вершина {vertex_name} ({vertex_type}) успешно добавлена!')
         except ValueError as e:
             messages.error(request, str(e))
@@ -199,13 +167,13 @@ def add_vertex(request):
     return redirect('visualize_graph')
 
 def add_edge(request):
-    global current_graph
-    if request.method == 'POST' and current_graph is not None:
+    if request.method == 'POST':
         try:
             from_vertex = request.POST.get('from_vertex')
             to_vertex = request.POST.get('to_vertex')
             cost = request.POST.get('cost')
             delivery_time = request.POST.get('delivery_time')
+            capacity = request.POST.get('capacity') or None
             
             if not from_vertex or not to_vertex:
                 messages.error(request, 'Необходимо указать начальную и конечную вершины')
@@ -214,11 +182,14 @@ def add_edge(request):
             try:
                 cost = float(cost)
                 delivery_time = float(delivery_time)
+                if capacity is not None:
+                    capacity = int(capacity)
             except (ValueError, TypeError):
-                messages.error(request, 'Стоимость и время доставки должны быть числами')
+                messages.error(request, 'Стоимость, время доставки и пропускная способность должны быть числами')
                 return redirect('visualize_graph')
             
-            current_graph.add_edge(from_vertex, to_vertex, cost, delivery_time)
+            with graph_store.edit(get_graph_id(request)) as current_graph:
+                current_graph.add_edge(from_vertex, to_vertex, cost, delivery_time, capacity)
             messages.success(request, f'Ребро от {from_vertex} к {to_vertex} добавлено: {cost} руб., {delivery_time} ч.')
         except ValueError as e:
             messages.error(request, str(e))
@@ -227,8 +198,7 @@ def add_edge(request):
     return redirect('visualize_graph')
 
 def delete_vertex(request):
-    global current_graph
-    if request.method == 'POST' and current_graph is not None:
+    if request.method == 'POST':
         try:
             vertex_name = request.POST.get('vertex_name')
             
@@ -236,11 +206,12 @@ def delete_vertex(request):
                 messages.error(request, 'Необходимо указать значение вершины')
                 return redirect('visualize_graph')
                 
-            if vertex_name not in current_graph.nodes:
-                messages.error(request, f'Вершина {vertex_name} не существует')
-                return redirect('visualize_graph')
+            with graph_store.edit(get_graph_id(request)) as current_graph:
+                if vertex_name not in current_graph.nodes:
+                    messages.error(request, f'Вершина {vertex_name} не существует')
+                    return redirect('visualize_graph')
                 
-            current_graph.remove_node(vertex_name)
+                current_graph.remove_node(vertex_name)
             messages.success(request, f'Вершина {vertex_name} успешно удалена!')
         except ValueError as e:
             messages.error(request, str(e))
@@ -249,8 +220,7 @@ def delete_vertex(request):
     return redirect('visualize_graph')
 
 def remove_edge(request):
-    global current_graph
-    if request.method == 'POST' and current_graph is not None:
+    if request.method == 'POST':
         try:
             from_vertex = request.POST.get('from_vertex')
             to_vertex = request.POST.get('to_vertex')
@@ -259,15 +229,14 @@ def remove_edge(request):
                 messages.error(request, 'Необходимо указать начальную и конечную вершины')
                 return redirect('visualize_graph')
             
-            # Проверяем существование ребра
-            edge_exists = any(edge[0] == from_vertex and edge[1] == to_vertex for edge in current_graph.edges)
-            
-            if not edge_exists:
-                messages.error(request, f'Ребро от {from_vertex} к {to_vertex} не существует')
-                return redirect('visualize_graph')
-            
-            # Удаляем ребро
-            current_graph.edges = [edge for edge in current_graph.edges if not (edge[0] == from_vertex and edge[1] == to_vertex)]
+            with graph_store.edit(get_graph_id(request)) as current_graph:
+                # Проверяем существование ребра
+                if not current_graph.has_edge(from_vertex, to_vertex):
+                    messages.error(request, f'Ребро от {from_vertex} к {to_vertex} не существует')
+                    return redirect('visualize_graph')
+                
+                # Удаляем ребро
+                current_graph.remove_edge(from_vertex, to_vertex)
             
             messages.success(request, f'Ребро {from_vertex} -> {to_vertex} успешно удалено!')
         except Exception as e:
@@ -275,74 +244,57 @@ def remove_edge(request):
     return redirect('visualize_graph')
 
 def create_empty_graph(request):
-    global current_graph
-    current_graph = Graph(directed=True, weighted=True)
+    replace_session_graph(request, Graph(directed=True, weighted=True))
     messages.success(request, 'Создан новый пустой граф!')
     return redirect('visualize_graph')
 
 def load_graph(request):
-    global current_graph
     if request.method == 'POST' and 'graph_file' in request.FILES:
         try:
             # Читаем загруженный файл
             graph_file = request.FILES['graph_file']
             
             # Проверяем расширение файла
-            if not graph_file.name.endswith('.json'):
-                messages.error(request, 'Пожалуйста, загрузите JSON-файл')
+            if graph_file.name.endswith(snapshot.EXTENSION):
+                # Большие загрузки Django хранит во временном файле - его можно отобразить в память
+                if hasattr(graph_file, 'temporary_file_path'):
+                    current_graph = Graph.load_snapshot(graph_file.temporary_file_path())
+                else:
+                    current_graph = Graph.load_snapshot(graph_file.read())
+            elif graph_file.name.endswith('.json'):
+                # Разбираем JSON по частям и строим граф одним проходом
+                current_graph = load_graph_json(graph_file.chunks(), directed=True, weighted=True)
+            else:
+                messages.error(request, f'Пожалуйста, загрузите JSON-файл или снимок графа ({snapshot.EXTENSION})')
                 return redirect('visualize_graph')
+            logger.debug("Загружен граф %s: %d вершин, %d рёбер",
+                         graph_file.name, len(current_graph.nodes), len(current_graph.edges))
             
-            # Декодируем и парсим JSON
-            file_content = graph_file.read().decode('utf-8')
-            print("Содержимое файла:", file_content)  # Отладочная печать
-            
-            graph_data = json.loads(file_content)
-            print("Распарсенные данные:", graph_data)  # Отладочная печать
-            
-            # Создаем новый граф
-            current_graph = Graph(directed=True, weighted=True)
-            
-            # Добавляем вершины
-            nodes = graph_data.get('nodes', {})
-            print("Вершины для добавления:", nodes)  # Отладочная печать
-            
-            for node_name, node_type in nodes.items():
-                print(f"Добавление вершины: {node_name}, тип: {node_type}")  # Отладочная печать
-                current_graph.add_node(node_name, node_type)
-            
-            # Добавляем ребра
-            edges = graph_data.get('edges', [])
-            print("Ребра для добавления:", edges)  # Отладочная печать
-            
-            for edge in edges:
-                from_vertex = edge.get('from')
-                to_vertex = edge.get('to')
-                cost = edge.get('cost', 0)
-                delivery_time = edge.get('delivery_time', 0)
-                
-                print(f"Добавление ребра: {from_vertex} -> {to_vertex}, стоимость: {cost}, время: {delivery_time}")  # Отладочная печать
-                current_graph.add_edge(from_vertex, to_vertex, cost, delivery_time)
-            
-            # Отладочная печать
-            print("Загруженный граф:")
-            print("Вершины:", current_graph.nodes)
-            print("Ребра:", current_graph.edges)
-            
+            replace_session_graph(request, current_graph)
             messages.success(request, 'Граф успешно загружен!')
         except json.JSONDecodeError as e:
-            print("Ошибка декодирования JSON:", e)  # Отладочная печать
+            logger.debug("Ошибка декодирования JSON: %s", e)
             messages.error(request, f'Ошибка при чтении JSON-файла: {e}')
         except ValueError as e:
-            print("Ошибка значения:", e)  # Отладочная печать
+            logger.debug("Ошибка значения: %s", e)
             messages.error(request, str(e))
         except Exception as e:
-            print("Неизвестная ошибка:", e)  # Отладочная печать
+            logger.exception("Ошибка при загрузке графа")
             messages.error(request, f'Ошибка при загрузке графа: {str(e)}')
     
     return redirect('visualize_graph')
 
+@require_GET
+def download_graph(request):
+    """Отдаёт текущий граф двоичным снимком (его можно загрузить обратно)."""
+    with graph_store.view(get_graph_id(request)) as current_graph:
+        buffer = io.BytesIO()
+        current_graph.save_snapshot(buffer)
+    response = HttpResponse(buffer.getvalue(), content_type='application/octet-stream')
+    response['Content-Disposition'] = f'attachment; filename="graph{snapshot.EXTENSION}"'
+    return response
+
 def find_shortest_path(request):
-    global current_graph
     if request.method == 'POST':
         try:
             start_vertex = request.POST.get('start_vertex')
@@ -353,16 +305,27 @@ def find_shortest_path(request):
                 messages.error(request, 'Укажите начальную и конечную вершины')
                 return redirect('visualize_graph')
 
+            with graph_store.view(get_graph_id(request)) as current_graph:
+                # Неизменяемая копия кэшируется до следующего изменения графа,
+                # а сам поиск идёт уже без блокировки графа
+                frozen_graph = current_graph.freeze()
             if path_type == 'optimal':
-                path, total_cost, total_time = current_graph.find_optimal_path(start_vertex, end_vertex)
-                message = (
-                    f"📍 Оптимальный путь:\n"
-                    f"   {' → '.join(path)}\n\n"
-                    f"💰 Общая стоимость: {total_cost} руб.\n"
-                    f"⏱️ Общее время доставки: {total_time} часов"
-                )
+                routes = frozen_graph.find_pareto_paths(start_vertex, end_vertex)
+            else:
+                path, total_weight = frozen_graph.find_shortest_path(start_vertex, end_vertex, path_type)
+
+            if path_type == 'optimal':
+                if not routes:
+                    messages.error(request, f'Путь от {start_vertex} к {end_vertex} не найден')
+                    return redirect('visualize_graph')
+                path = routes[0][0]
+                message = "📍 Парето-оптимальные пути:\n"
+                for route, total_cost, total_time in routes:
+                    message += (
+                        f"   {' → '.join(route)}\n"
+                        f"   💰 {total_cost} руб., ⏱️ {total_time} часов\n\n"
+                    )
             else:
-                path, total_weight = current_graph.find_shortest_path(start_vertex, end_vertex, path_type)
                 weight_name = 'стоимость' if path_type == 'cost' else 'время доставки'
                 message = (
                     f"📍 Кратчайший путь по {weight_name}:\n"
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -118,6 +119,40 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Number of rendered graph images kept in the per-process LRU cache
+GRAPH_RENDER_CACHE_SIZE = 32
+
+# Working graphs kept in memory per process (the rest are reloaded from the database on demand)
+GRAPH_STORE_MAX_GRAPHS = 64
+
+# Graphs not used for this many seconds are dropped from process memory
+GRAPH_STORE_IDLE_SECONDS = 1800
+
+# Above this many vertices the initial layout uses the grid-based approximate force layout
+GRAPH_LAYOUT_APPROXIMATE_THRESHOLD = 2000
+
+# Level of detail: above this many vertices clients are merged into their nearest warehouse
+GRAPH_LOD_NODE_THRESHOLD = 500
+
+# Level of detail: above this many edges per-edge cost/time labels are not drawn
+GRAPH_LOD_LABEL_THRESHOLD = 300
+
+# Debug output of graph_app (loaded graphs, rendered paths) is logged at DEBUG level;
+# set GRAPH_APP_LOG_LEVEL=DEBUG in the environment to see it
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'graph_app': {
+            'handlers': ['console'],
+            'level': os.environ.get('GRAPH_APP_LOG_LEVEL', 'INFO'),
+        },
+    },
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
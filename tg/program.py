@@ -1,4 +1,10 @@
+from itertools import islice
+
 from graph import Graph
+from graph_visualizer.graph_app import snapshot
+
+# Option 15 prints at most this many shortest paths to the chosen node
+SHOWN_PATHS = 20
 
 def print_menu():
     print("\nMenu:")
@@ -16,7 +22,7 @@ def print_menu():
     print("11. Task 4: Remove edges between same degree nodes")
     print("12. Task 5 (BFS): Define if graph a tree or a forest")
     print("13. Task 6 (DFS): Find a node with 2 equal distances")
-    print("14. Task 7: Find minimum spanning tree using Prim's algorithm")
+    print("14. Task 7: Find minimum spanning tree (Prim's or Kruskal's algorithm)")
     print("15. Task 8: Find the number of shortest paths from a node")
     print("16. Task 9: Find k shortest paths between u and v")
     print("17. Task 10: Find pairs with negative cycles")
@@ -43,7 +49,10 @@ def main():
         try:
             if choice == '1':
                 filename = input("Enter the filename to load the graph from: ")
-                graph = Graph.from_file(filename)
+                if filename.endswith(snapshot.EXTENSION):
+                    graph = Graph.load_snapshot(filename)
+                else:
+                    graph = Graph.from_file(filename)
                 print(f"Graph loaded successfully from '{filename}'.")
 
 
@@ -124,7 +133,10 @@ def main():
                     continue
                 filename = input("Enter the filename to save the graph to: ")
                 try:
-                    graph.save_to_file(filename)
+                    if filename.endswith(snapshot.EXTENSION):
+                        graph.save_snapshot(filename)
+                    else:
+                        graph.save_to_file(filename)
                     print(f"Graph saved successfully to '{filename}'.")
                 except IOError as e:
                     print(f"Error: {e}")
@@ -197,7 +209,10 @@ def main():
                     print("No graph loaded. Please load or create a graph first.")
                 else:
                     try:
-                        mst_edges, total_weight = graph.prim_mst()
+                        method = input("Enter the method (prim, kruskal; empty for auto): ").strip()
+                        mst_edges, total_weight = graph.minimum_spanning_forest(method or 'auto')
+                        if len(mst_edges) < len(graph.nodes) - 1:
+                            print("The graph is not connected, showing a minimum spanning forest.")
                         print("Minimum Spanning Tree edges:")
                         for edge in mst_edges:
                             print(f"({edge[0]}, {edge[1]}) weight: {edge[2]}")
@@ -216,12 +231,20 @@ def main():
             elif choice == "15":
                 try:
                     u = input("Enter the start node: ")
-                    distances, path_counts, paths = graph.dijkstra(u)
+                    distances, path_counts, predecessors = graph.dijkstra(u)
                     print(f"Distances from {u}: {distances}")
                     print(f"Number of shortest paths: {path_counts}")
-                    print("Shortest paths:")
-                    for node, node_paths in paths.items():
-                        print(f"To {node} - {len(node_paths)}: {node_paths}")
+                    v = input("Enter a node to list the shortest paths to (empty to skip): ").strip()
+                    if v:
+                        paths = graph.iter_shortest_paths(u, v, predecessors)
+                        shown = 0
+                        for path in islice(paths, SHOWN_PATHS):
+                            print(f"Path: {path}")
+                            shown += 1
+                        if path_counts[v] == float('inf'):
+                            print("... and infinitely many more (the shortest paths go around a zero-weight cycle)")
+                        elif path_counts[v] > shown:
+                            print(f"... and {path_counts[v] - shown} more")
                 except ValueError as e:
                     print(f"Error: {e}")
 
@@ -240,7 +263,7 @@ def main():
 
             elif choice == "17":
                 try:
-                    pairs = graph.floyd_warshall()
+                    pairs = graph.negative_cycle_pairs()
                     if pairs:
                         print("Pairs of nodes with paths of arbitrarily small length:")
                         for pair in pairs:
@@ -253,13 +276,13 @@ def main():
                 try:
                     source = input("Enter the source: ").strip()
                     sink = input("Enter the sink: ").strip()
-                    max_flow, flow = graph.edmonds_karp(source, sink)
+                    method = input("Enter the method (dinic, push_relabel, edmonds_karp; empty for dinic): ").strip()
+                    max_flow, flow = graph.max_flow(source, sink, method or 'dinic')
                     print(f"Максимальный поток из '{source}' в '{sink}'= {max_flow}")
                     print("Flow distribution:")
                     for u in flow:
                         for v, f in flow[u].items():
-                            if f > 0:
-                                print(f"  {u} -> {v}: {f}")
+                            print(f"  {u} -> {v}: {f}")
                 except ValueError as e:
                     print(f"Error: {e}")
             else:
@@ -0,0 +1,96 @@
+from itertools import combinations
+import random
+import unittest
+
+from graph import Graph
+from graph_visualizer.graph_app import flow
+
+
+def _min_cut(graph, source, sink):
+    # Smallest total capacity of the edges leaving a node set with source and without sink
+    others = [node for node in graph.nodes if node not in (source, sink)]
+    best = None
+    for size in range(len(others) + 1):
+        for chosen in combinations(others, size):
+            side = {source, *chosen}
+            cut = sum(max(weight, 0) for node1, node2, weight in graph.get_edges()
+                      if node1 in side and node2 not in side)
+            if not graph.directed:
+                cut += sum(max(weight, 0) for node1, node2, weight in graph.get_edges()
+                           if node2 in side and node1 not in side)
+            best = cut if best is None else min(best, cut)
+    return best
+
+
+class MaxFlowTest(unittest.TestCase):
+    def random_graph(self, rng, directed, storage='objects'):
+        graph = Graph(directed, True, storage=storage)
+        for node in range(7):
+            graph.add_node(str(node))
+        for _ in range(16):
+            node1, node2 = rng.sample(range(7), 2)
+            graph.add_edge(str(node1), str(node2), rng.randint(-2, 9))
+        return graph
+
+    def check_flow(self, graph, source, sink, value, flows):
+        capacities = {}
+        for node1, node2, weight in graph.get_edges():
+            capacities[node1, node2] = max(weight, 0)
+            if not graph.directed:
+                capacities[node2, node1] = max(weight, 0)
+        balance = dict.fromkeys(graph.nodes, 0)
+        for node1, targets in flows.items():
+            for node2, amount in targets.items():
+                self.assertGreater(amount, 0)
+                self.assertLessEqual(amount, capacities[node1, node2])
+                balance[node1] -= amount
+                balance[node2] += amount
+        self.assertEqual(balance.pop(source), -value)
+        self.assertEqual(balance.pop(sink), value)
+        self.assertEqual(set(balance.values()), {0})
+
+    def test_value_equals_min_cut(self):
+        rng = random.Random(3)
+        for case in range(30):
+            directed = case % 2 == 0
+            graph = self.random_graph(rng, directed, storage='compact' if case % 3 == 0 else 'objects')
+            expected = _min_cut(graph, '0', '6')
+            for method in flow.METHODS:
+                with self.subTest(case=case, method=method):
+                    value, flows = graph.max_flow('0', '6', method)
+                    self.assertEqual(value, expected)
+                    self.check_flow(graph, '0', '6', value, flows)
+
+    def test_unweighted_edges_have_capacity_one(self):
+        graph = Graph(True, False)
+        for node1, node2 in (('s', 'a'), ('s', 'b'), ('a', 't'), ('b', 't'), ('a', 'b')):
+            graph.add_edge(node1, node2)
+        self.assertEqual(graph.edmonds_karp('s', 't')[0], 2)
+
+    def test_invalid_arguments(self):
+        graph = Graph(True, True)
+        graph.add_edge('s', 't', 1)
+        with self.assertRaisesRegex(ValueError, "does not exist"):
+            graph.max_flow('s', 'x')
+        with self.assertRaisesRegex(ValueError, "Unknown max flow method"):
+            graph.max_flow('s', 't', 'simplex')
+
+    def test_source_is_sink(self):
+        graph = Graph(True, True)
+        for node1, node2 in (('s', 'a'), ('a', 's'), ('a', 't')):
+            graph.add_edge(node1, node2, 5)
+        for method in flow.METHODS:
+            with self.subTest(method=method):
+                self.assertEqual(graph.max_flow('s', 's', method), (0, {}))
+
+    def test_push_flow_limit(self):
+        network = flow.FlowNetwork(3)
+        network.add_arc(0, 1, 5)
+        network.add_arc(1, 2, 4)
+        self.assertEqual(flow.push_flow(network, 0, 2, limit=3), 3)
+        self.assertEqual(flow.push_flow(network, 0, 2), 1)
+        self.assertEqual(flow.max_flow(network, 0, 2), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+from itertools import islice
+import random
+import unittest
+
+from graph import Graph
+
+
+def _simple_paths(graph, u, v):
+    # Every simple path from u to v with its cost, by exhaustive depth-first search
+    weights = {(node1, node2): weight for node1, node2, weight in graph.get_edges()}
+    if not graph.directed:
+        weights.update({(node2, node1): weight for (node1, node2), weight in list(weights.items())})
+    paths = []
+
+    def extend(path, cost):
+        if path[-1] == v:
+            paths.append((cost, list(path)))
+            return
+        for (node1, node2), weight in weights.items():
+            if node1 == path[-1] and node2 not in path:
+                path.append(node2)
+                extend(path, cost + weight)
+                path.pop()
+
+    extend([u], 0)
+    return paths
+
+
+def _walk_costs(graph, u, v, max_cost):
+    # Costs of all walks from u to v that cost at most max_cost (weights must be positive)
+    weights = [(node1, node2, weight) for node1, node2, weight in graph.get_edges()]
+    costs = []
+
+    def extend(node, cost):
+        if node == v:
+            costs.append(cost)
+        for node1, node2, weight in weights:
+            if node1 == node and cost + weight <= max_cost:
+                extend(node2, cost + weight)
+
+    extend(u, 0)
+    return sorted(costs)
+
+
+class KShortestPathsTest(unittest.TestCase):
+    def random_graph(self, rng, directed, min_weight, storage='objects'):
+        graph = Graph(directed, True, storage=storage)
+        for node in range(6):
+            graph.add_node(str(node))
+        for _ in range(12):
+            node1, node2 = rng.sample(range(6), 2)
+            graph.add_edge(str(node1), str(node2), rng.randint(min_weight, 9))
+        return graph
+
+    def assertValidWalk(self, graph, path, cost):
+        weights = {(node1, node2): weight for node1, node2, weight in graph.get_edges()}
+        self.assertEqual(sum(weights[edge] for edge in zip(path, path[1:])), cost)
+
+    def test_simple_paths_in_cost_order(self):
+        rng = random.Random(1)
+        for case in range(40):
+            graph = self.random_graph(rng, directed=case % 2 == 0, min_weight=0,
+                                      storage='compact' if case % 4 == 1 else 'objects')
+            expected = _simple_paths(graph, '0', '5')
+            found = list(graph.k_shortest_paths('0', '5'))
+            with self.subTest(case=case):
+                self.assertEqual([cost for cost, _ in found], sorted(cost for cost, _ in expected))
+                self.assertEqual(sorted(map(tuple, (path for _, path in found))),
+                                 sorted(tuple(path) for _, path in expected))
+                for k in (1, 3):
+                    self.assertEqual(list(graph.k_shortest_paths('0', '5', k)), found[:k])
+
+    def test_walks_in_cost_order(self):
+        rng = random.Random(2)
+        for case in range(30):
+            graph = self.random_graph(rng, directed=True, min_weight=1)
+            walks = list(islice(graph.k_shortest_paths('0', '5', loopless=False), 8))
+            with self.subTest(case=case):
+                if not walks:
+                    self.assertEqual(_walk_costs(graph, '0', '5', 30), [])
+                    continue
+                max_cost = walks[-1][0]
+                expected = _walk_costs(graph, '0', '5', max_cost)
+                self.assertEqual([cost for cost, _ in walks], expected[:len(walks)])
+                self.assertEqual(len({tuple(path) for _, path in walks}), len(walks))
+                for cost, path in walks:
+                    self.assertEqual((path[0], path[-1]), ('0', '5'))
+                    self.assertValidWalk(graph, path, cost)
+                short_walks = [(cost, path) for cost, path in walks if len(path) <= len(graph.nodes)]
+                self.assertEqual(graph.bellman_ford('0', '5', 3), short_walks[:3])
+
+    def test_bellman_ford_walks_have_at_most_v_minus_1_edges(self):
+        # 1.txt: the only way back to 3 is the 3 - 5 - 3 cycle
+        graph = Graph(True, True)
+        for node1, node2, weight in (('1', '1', 2), ('1', '2', 5), ('1', '4', 3), ('3', '5', 3),
+                                     ('4', '6', 4), ('5', '3', 2), ('5', '8', 1), ('6', '6', 7),
+                                     ('7', '6', 2), ('8', '6', 1)):
+            graph.add_edge(node1, node2, weight)
+        self.assertEqual(graph.bellman_ford('3', '3', 5),
+                         [(0, ['3']), (5, ['3', '5', '3']), (10, ['3', '5', '3', '5', '3']),
+                          (15, ['3', '5', '3', '5', '3', '5', '3'])])
+        self.assertEqual(len(list(islice(graph.k_shortest_paths('3', '3', loopless=False), 5))), 5)
+
+    def test_negative_weights(self):
+        graph = Graph(True, True)
+        for node1, node2, weight in (('s', 'a', 4), ('s', 'b', 1), ('b', 'a', -3), ('a', 't', 1), ('b', 't', 5)):
+            graph.add_edge(node1, node2, weight)
+        self.assertEqual(list(graph.k_shortest_paths('s', 't')),
+                         [(-1, ['s', 'b', 'a', 't']), (5, ['s', 'a', 't']), (6, ['s', 'b', 't'])])
+
+    def test_unweighted_edges_cost_one(self):
+        graph = Graph(True, False)
+        for node1, node2 in (('s', 'a'), ('a', 't'), ('s', 't')):
+            graph.add_edge(node1, node2)
+        self.assertEqual(list(graph.k_shortest_paths('s', 't')), [(1, ['s', 't']), (2, ['s', 'a', 't'])])
+
+    def test_invalid_arguments(self):
+        graph = Graph(True, True)
+        graph.add_edge('s', 't', 1)
+        with self.assertRaisesRegex(ValueError, "do not exist"):
+            graph.k_shortest_paths('s', 'x')
+        with self.assertRaisesRegex(ValueError, "must be positive"):
+            graph.k_shortest_paths('s', 't', 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
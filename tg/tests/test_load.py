@@ -0,0 +1,60 @@
+import os
+import random
+import tempfile
+import unittest
+from unittest import mock
+
+import graph as graph_module
+from graph import Graph
+
+
+class ParallelLoadTest(unittest.TestCase):
+    # from_file(workers > 1) only splits files larger than PARALLEL_LOAD_MIN_BYTES, so the
+    # tests lower it to 0 to run the parallel path on small files
+
+    def setUp(self):
+        rng = random.Random(7)
+        lines = ["True\n", "True\n"]
+        for node in range(40):
+            if node % 10 == 0:
+                lines.append(f"lonely{node}\n")
+            for _ in range(5):
+                lines.append(f"{node} {rng.randrange(50)} {rng.randint(1, 9)}\n")
+        with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as file:
+            file.writelines(lines)
+        self.filename = file.name
+        self.line_count = len(lines)
+
+    def tearDown(self):
+        os.unlink(self.filename)
+
+    def load(self, **kwargs):
+        with mock.patch.object(graph_module, 'PARALLEL_LOAD_MIN_BYTES', 0):
+            return Graph.from_file(self.filename, **kwargs)
+
+    def test_parallel_load_matches_sequential(self):
+        expected = Graph.from_file(self.filename)
+        for storage in ('objects', 'compact'):
+            with self.subTest(storage=storage):
+                loaded = self.load(workers=3, storage=storage)
+                self.assertEqual(list(loaded.nodes), list(expected.nodes))
+                self.assertEqual(loaded.get_edges(), expected.get_edges())
+
+    def test_parallel_load_reports_the_file_line(self):
+        with open(self.filename, 'a') as file:
+            file.write("1 2 3 4\n")
+        message = f"line {self.line_count + 1}:"
+        with self.assertRaisesRegex(ValueError, message):
+            Graph.from_file(self.filename)
+        with self.assertRaisesRegex(ValueError, message):
+            self.load(workers=3)
+
+    def test_parallel_load_rejects_repeated_node(self):
+        with open(self.filename, 'a') as file:
+            file.write("lonely0\n")
+        with self.assertRaisesRegex(ValueError, f"line {self.line_count + 1}: Node lonely0 already exists"):
+            self.load(workers=3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+import os
+import struct
+import tempfile
+import unittest
+
+from graph import FrozenGraph, Graph
+from graph_visualizer.graph_app import snapshot
+
+
+class SnapshotTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.filename = os.path.join(directory.name, 'graph' + snapshot.EXTENSION)
+
+    def build(self, directed, weighted, storage='objects'):
+        graph = Graph(directed, weighted, storage=storage)
+        graph.add_node('одинокая')
+        for value1, value2, weight in (('a', 'b', 3), ('b', 'c', -2), ('c', 'a', 7), ('a', 'd', 0)):
+            graph.add_edge(value1, value2, weight if weighted else None)
+        return graph
+
+    def test_round_trip(self):
+        for directed in (True, False):
+            for weighted in (True, False):
+                for storage in ('objects', 'compact'):
+                    with self.subTest(directed=directed, weighted=weighted, storage=storage):
+                        graph = self.build(directed, weighted, storage)
+                        graph.save_snapshot(self.filename)
+                        loaded = Graph.load_snapshot(self.filename, storage=storage)
+                        self.assertEqual((loaded.directed, loaded.weighted), (directed, weighted))
+                        self.assertEqual(list(loaded.nodes), list(graph.nodes))
+                        self.assertEqual(loaded.get_edges(), graph.get_edges())
+
+    def test_frozen_graph_matches(self):
+        graph = self.build(True, True)
+        frozen = graph.freeze()
+        self.assertEqual(list(frozen.nodes), list(graph.nodes))
+        self.assertEqual(frozen.get_edges(), graph.get_edges())
+
+    def test_attach_rejects_other_files(self):
+        with open(self.filename, 'wb') as file:
+            file.write(b'NOTGRAPH' + bytes(64))
+        with self.assertRaisesRegex(ValueError, "Invalid shared graph"):
+            FrozenGraph.attach(self.filename)
+
+    def write_corrupted(self, corrupt):
+        self.build(True, True).save_snapshot(self.filename)
+        with open(self.filename, 'rb') as file:
+            data = bytearray(file.read())
+        corrupt(data)
+        with open(self.filename, 'wb') as file:
+            file.write(data)
+
+    def assertRejected(self):
+        with self.assertRaisesRegex(ValueError, "Invalid graph snapshot file"):
+            Graph.load_snapshot(self.filename)
+        with self.assertRaisesRegex(ValueError, "Invalid graph snapshot file"):
+            Graph.load_snapshot(self.filename, storage='compact')
+
+    def test_not_a_snapshot(self):
+        self.write_corrupted(lambda data: data.__setitem__(slice(0, 8), b'NOTGRAPH'))
+        self.assertRejected()
+
+    def test_truncated(self):
+        self.write_corrupted(lambda data: data.__delitem__(slice(len(data) // 2, None)))
+        self.assertRejected()
+
+    def test_empty_file(self):
+        self.write_corrupted(lambda data: data.clear())
+        self.assertRejected()
+
+    def test_edge_count_mismatch(self):
+        # u64 edge count in the header no longer matches the last row offset
+        def corrupt(data):
+            offset = snapshot._HEADER.size - 16
+            edge_count, = struct.unpack_from('<Q', data, offset)
+            struct.pack_into('<Q', data, offset, edge_count - 1)
+        self.write_corrupted(corrupt)
+        self.assertRejected()
+
+    def test_target_out_of_range(self):
+        def corrupt(data):
+            # Targets are followed by the weight column, both end on 8-byte boundaries here
+            with snapshot.read_snapshot(bytes(data)) as snap:
+                first_target = len(data) - snap.targets.nbytes - sum(column.nbytes for column in snap.columns)
+            struct.pack_into('<I', data, first_target, 1000)
+        self.write_corrupted(corrupt)
+        self.assertRejected()
+
+    def test_row_offsets_out_of_order(self):
+        def corrupt(data):
+            with snapshot.read_snapshot(bytes(data)) as snap:
+                node_count = len(snap.names)
+                row_offsets = (len(data) - snap.targets.nbytes - sum(column.nbytes for column in snap.columns)
+                               - 8 * (node_count + 1))
+            # Second row ends after the third one starts
+            struct.pack_into('<Q', data, row_offsets + 16, 4)
+        self.write_corrupted(corrupt)
+        self.assertRejected()
+
+
+if __name__ == '__main__':
+    unittest.main()
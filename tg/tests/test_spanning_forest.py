@@ -0,0 +1,87 @@
+import random
+import unittest
+
+from graph import Graph
+
+
+def _components(nodes, edges):
+    # Connected components as a set of frozensets, merging labels edge by edge
+    label = {node: node for node in nodes}
+    for node1, node2, _ in edges:
+        old, new = label[node1], label[node2]
+        if old != new:
+            for node, current in label.items():
+                if current == old:
+                    label[node] = new
+    members = {}
+    for node, current in label.items():
+        members.setdefault(current, set()).add(node)
+    return {frozenset(component) for component in members.values()}
+
+
+def _forest_weight(nodes, edges):
+    # Reference Kruskal without union-find: O(V * E), fine for the small graphs here
+    label = {node: node for node in nodes}
+    total = 0
+    for node1, node2, weight in sorted(edges, key=lambda edge: edge[2]):
+        old, new = label[node1], label[node2]
+        if old != new:
+            total += weight
+            for node, current in label.items():
+                if current == old:
+                    label[node] = new
+    return total
+
+
+class SpanningForestTest(unittest.TestCase):
+    def random_graph(self, rng, storage):
+        graph = Graph(False, True, storage=storage)
+        node_count = rng.randint(1, 12)
+        for node in range(node_count):
+            graph.add_node(str(node))
+        for _ in range(rng.randint(0, 3 * node_count)):
+            if node_count > 1:
+                node1, node2 = rng.sample(range(node_count), 2)
+                graph.add_edge(str(node1), str(node2), rng.randint(-5, 20))
+        return graph
+
+    def test_forest_is_minimal_and_spanning(self):
+        rng = random.Random(9)
+        for case in range(80):
+            graph = self.random_graph(rng, 'compact' if case % 2 else 'objects')
+            edges = graph.get_edges()
+            weights = {frozenset((node1, node2)): weight for node1, node2, weight in edges}
+            expected_weight = _forest_weight(graph.nodes, edges)
+            components = _components(graph.nodes, edges)
+            for method in ('prim', 'kruskal', 'auto'):
+                with self.subTest(case=case, method=method):
+                    forest, total = graph.minimum_spanning_forest(method)
+                    self.assertEqual(total, expected_weight)
+                    self.assertEqual(len(forest), len(graph.nodes) - len(components))
+                    for node1, node2, weight in forest:
+                        self.assertEqual(weights[frozenset((node1, node2))], weight)
+                    # n - c edges that connect every component are acyclic
+                    self.assertEqual(_components(graph.nodes, forest), components)
+
+    def test_edgeless_graph(self):
+        for storage in ('objects', 'compact'):
+            graph = Graph(False, True, storage=storage)
+            graph.add_node('a')
+            graph.add_node('b')
+            self.assertEqual(graph.minimum_spanning_forest(), ([], 0))
+
+    def test_invalid_graphs(self):
+        with self.assertRaisesRegex(ValueError, "empty"):
+            Graph(False, True).minimum_spanning_forest()
+        directed = Graph(True, True)
+        directed.add_edge('a', 'b', 1)
+        with self.assertRaisesRegex(ValueError, "undirected"):
+            directed.prim_mst()
+        graph = Graph(False, True)
+        graph.add_edge('a', 'b', 1)
+        with self.assertRaisesRegex(ValueError, "Unknown MST method"):
+            graph.minimum_spanning_forest('boruvka')
+
+
+if __name__ == '__main__':
+    unittest.main()